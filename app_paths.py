@@ -0,0 +1,58 @@
+import os
+import sys
+
+APP_NAME = 'yt-dlp-gui'
+
+
+def user_data_dir():
+    """Return the per-user directory for logs, caches and databases, creating it if needed.
+
+    Set YT_DLP_GUI_HOME to keep everything under one directory instead (handy for portable installs).
+    """
+    override = os.environ.get('YT_DLP_GUI_HOME')
+    if override:
+        path = override
+    elif sys.platform == 'win32':
+        path = os.path.join(os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~'),
+                            APP_NAME)
+    elif sys.platform == 'darwin':
+        path = os.path.join(os.path.expanduser('~/Library/Application Support'), APP_NAME)
+    else:
+        path = os.path.join(os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share'), APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def user_config_dir():
+    """Return the per-user directory that holds config.json, creating it if needed."""
+    override = os.environ.get('YT_DLP_GUI_HOME')
+    if override:
+        path = override
+    elif sys.platform == 'win32':
+        path = os.path.join(os.environ.get('APPDATA') or os.path.expanduser('~'), APP_NAME)
+    elif sys.platform == 'darwin':
+        path = os.path.join(os.path.expanduser('~/Library/Application Support'), APP_NAME)
+    else:
+        path = os.path.join(os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config'), APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def config_file_path():
+    return os.path.join(user_config_dir(), 'config.json')
+
+
+def legacy_config_paths():
+    """Places older versions wrote config.json to; read once if the per-user file does not exist yet."""
+    return [os.path.abspath('config.json'),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')]
+
+
+def data_file_path(name):
+    return os.path.join(user_data_dir(), name)
+
+
+def log_file_path():
+    path = os.path.join(user_data_dir(), 'logs')
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, 'download.log')
@@ -0,0 +1,169 @@
+import re
+import threading
+import time
+from collections import deque
+
+RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate(text):
+    """Parse a rate such as '500K', '2.5M' or '1048576' (bytes per second); '' or '0' mean unlimited."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*', text or '0', re.IGNORECASE)
+    if not match:
+        raise ValueError(f'invalid rate: {text!r}')
+    return int(float(match.group(1)) * RATE_UNITS[match.group(2).upper()])
+
+
+def parse_weight(text):
+    """Parse 'youtube.com=2' into ('youtube.com', 2.0), the bandwidth weight of a site and its subdomains."""
+    host, sep, weight = (text or '').partition('=')
+    host = host.strip().lower()
+    try:
+        value = float(weight)
+    except ValueError:
+        value = 0
+    if not sep or not host or not 0 < value < float('inf'):
+        raise ValueError(f'invalid weight: {text!r}')
+    return host[4:] if host.startswith('www.') else host, value
+
+
+def config_weights(value):
+    """The valid {site: weight} entries of the host_weights setting; anything else in it is left out."""
+    weights = {}
+    for host, weight in (value.items() if isinstance(value, dict) else ()):
+        try:
+            host, weight = parse_weight(f'{host}={weight}')
+        except ValueError:
+            print(f"Ignoring invalid host weight {host!r}: {weight!r}")
+            continue
+        weights[host] = weight
+    return weights
+
+
+def host_weight(weights, host):
+    """The weight in weights ({site: weight}) of host, which may be the site or one of its subdomains, or None."""
+    while host:
+        if host in weights:
+            return float(weights[host])
+        host = host.partition('.')[2]
+    return None
+
+
+class BandwidthGovernor:
+    """Token bucket that every active download draws from, to cap the total bandwidth of the app.
+
+    The rate (bytes per second, 0 = unlimited) is split between the registered jobs in proportion to their
+    weights, so a job of weight 2 gets twice the share of a job of weight 1. A job takes part from the first
+    bytes it reads until release(), when it hands its share to the others. Both the rate and the weights can be
+    changed while downloads are running. consume() is called from the download threads and blocks until the job
+    may continue.
+    """
+
+    # A job may get ahead of its share by this many seconds of data (e.g. after a pause in the connection).
+    BURST_SECONDS = 1.0
+    # Achieved throughput is measured over this window.
+    WINDOW_SECONDS = 5.0
+
+    def __init__(self, rate=0):
+        self.rate = max(0, int(rate or 0))
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._weights = {}
+        self._samples = deque()
+        self._total_bytes = 0
+        self._active_since = None
+        self._active_seconds = 0.0
+        self._refilled = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = max(0, int(rate or 0))
+            self._cond.notify_all()
+
+    def release(self, job_id):
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._jobs.pop(job_id, None) is not None and not self._jobs:
+                self._active_seconds += now - self._active_since
+                self._active_since = None
+            self._cond.notify_all()
+
+    def weight(self, job_id):
+        with self._cond:
+            return self._weights.get(job_id, 1.0)
+
+    def set_weight(self, job_id, weight):
+        with self._cond:
+            self._weights[job_id] = max(0.01, float(weight))
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._refill(time.monotonic())
+                job['weight'] = self._weights[job_id]
+                self._cond.notify_all()
+
+    def consume(self, job_id, nbytes, should_stop=None):
+        """Account nbytes read by job_id and wait until they fit in its share; returns early once should_stop()."""
+        if nbytes <= 0:
+            return
+        with self._cond:
+            now = time.monotonic()
+            self._record(now, nbytes)
+            self._refill(now)
+            job = self._jobs.get(job_id)
+            if job is None:
+                if not self._jobs:
+                    self._active_since = now
+                job = self._jobs[job_id] = {'weight': self._weights.get(job_id, 1.0), 'tokens': 0.0, 'bytes': 0}
+            job['bytes'] += nbytes
+            if not self.rate:
+                return
+            job['tokens'] -= nbytes
+            while job['tokens'] < 0 and self.rate and job_id in self._jobs:
+                if should_stop is not None and should_stop():
+                    return
+                # Wake up regularly: the rate, the weights and the stop flag may change meanwhile.
+                self._cond.wait(min(0.25, -job['tokens'] / self._share(job)))
+                self._refill(time.monotonic())
+
+    def stats(self):
+        """Return {'target', 'achieved', 'average', 'jobs'} in bytes per second ('target' 0 = unlimited).
+
+        'achieved' is measured over the last few seconds, 'average' over the time any download was active and
+        'jobs' has the bytes each registered job has read so far.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._expire(now)
+            window = min(self.WINDOW_SECONDS, now - self._samples[0][0]) if self._samples else 0.0
+            achieved = sum(n for _, n in self._samples) / window if window > 0.05 else 0.0
+            active = self._active_seconds + (now - self._active_since if self._active_since is not None else 0.0)
+            return {
+                'target': self.rate,
+                'achieved': achieved,
+                'average': self._total_bytes / active if active > 0 else 0.0,
+                'jobs': {job_id: job['bytes'] for job_id, job in self._jobs.items()},
+            }
+
+    def _share(self, job):
+        total_weight = sum(j['weight'] for j in self._jobs.values())
+        return self.rate * job['weight'] / total_weight
+
+    def _refill(self, now):
+        elapsed = now - self._refilled
+        self._refilled = now
+        if not self.rate or elapsed <= 0 or not self._jobs:
+            return
+        for job in self._jobs.values():
+            share = self._share(job)
+            job['tokens'] = min(job['tokens'] + share * elapsed, share * self.BURST_SECONDS)
+
+    def _record(self, now, nbytes):
+        self._total_bytes += nbytes
+        self._samples.append((now, nbytes))
+        self._expire(now)
+
+    def _expire(self, now):
+        while self._samples and now - self._samples[0][0] > self.WINDOW_SECONDS:
+            self._samples.popleft()
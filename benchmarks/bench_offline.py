@@ -0,0 +1,239 @@
+"""Offline benchmarks: downloads from a local media server through the real DownloadThread, plus GUI costs.
+
+Runs on Qt's offscreen platform with an empty, temporary data directory, and measures:
+
+    direct     - a batch of progressive downloads (throughput, progress events delivered to the GUI thread)
+    hls        - a batch of native HLS downloads with many small fragments
+    proxies    - a batch spread over local stand-in proxies: a fast, a slow, a dead one and one that dies mid-batch
+    progress   - cost of one progress hook call in the engine, and of YTDLPApp.on_progress per event
+    log        - cost of LogView.append per line, including the batched flush
+    startup    - time until the YTDLPApp window is shown (see bench_startup.py)
+
+Each run appends one JSON line with the results, the git revision and the yt-dlp version to the output file,
+so results can be compared over time:
+
+    python benchmarks/bench_offline.py
+    python benchmarks/bench_offline.py --quick --only direct hls
+    python benchmarks/bench_offline.py --quick --only proxies
+    python benchmarks/bench_offline.py --output /tmp/bench.jsonl --latency 0.02 --bandwidth 4M
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+SCENARIOS = ('direct', 'hls', 'proxies', 'progress', 'log', 'startup')
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file()) if os.path.isdir(path) else 0
+
+
+def run_batch(app, urls, out_dir, workers, extractors, **settings):
+    """Download urls with a DownloadThread and wait for it in the Qt event loop; return the measurements."""
+    from yt_dlp_gui import DownloadThread
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    events = []
+    settings.setdefault('proxy', '')
+    thread = DownloadThread(
+        lambda key, **kwargs: key, urls=urls, path=out_dir, download_mode='video', video_format='mp4',
+        audio_format='', prefix='', ffmpeg_path='', video_quality='best', audio_quality='',
+        extra_params='--quiet --no-progress', max_workers=workers, use_archive=False, extractors=extractors,
+        **settings)
+    thread.progress_signal.connect(events.append)
+    thread.finished.connect(app.quit)
+    start = time.perf_counter()
+    thread.start()
+    app.exec()
+    seconds = time.perf_counter() - start
+    thread.wait()
+    nbytes = directory_size(out_dir)
+    summary = thread.engine.metrics.summary()
+    return {
+        'seconds': seconds, 'bytes': nbytes, 'throughput': nbytes / seconds, 'jobs': summary['states'],
+        'progress_events': len(events), 'ttfb_median': summary['phases']['ttfb']['median'],
+        'retries': summary['retries'], 'proxies': thread.engine.proxy_stats(),
+    }
+
+
+def bench_direct(app, server, work_dir, quick, extractors):
+    count, size = (8, 4 * 1024 * 1024) if quick else (16, 16 * 1024 * 1024)
+    host = server.base_url.split('//', 1)[1]
+    urls = [f'bench://{host}/video/clip{i}?size={size}' for i in range(count)]
+    result = run_batch(app, urls, os.path.join(work_dir, 'direct'), 4, extractors)
+    result.update(files=count, file_size=size, workers=4)
+    return result
+
+
+def bench_hls(app, server, work_dir, quick, extractors):
+    count, fragments, size = (2, 100, 32 * 1024) if quick else (4, 400, 64 * 1024)
+    host = server.base_url.split('//', 1)[1]
+    urls = [f'bench://{host}/hls/stream{i}?count={fragments}&size={size}' for i in range(count)]
+    result = run_batch(app, urls, os.path.join(work_dir, 'hls'), 2, extractors)
+    result.update(streams=count, fragments=fragments, fragment_size=size, workers=2)
+    return result
+
+
+def bench_proxies(app, server, work_dir, quick, extractors):
+    from proxy_server import ProxyServer
+
+    count, size = (12, 2 * 1024 * 1024) if quick else (32, 8 * 1024 * 1024)
+    host = server.base_url.split('//', 1)[1]
+    urls = [f'bench://{host}/video/proxied{i}?size={size}' for i in range(count)]
+    proxies = {
+        'fast': ProxyServer(),
+        'slow': ProxyServer(latency=0.05, bandwidth=2 * 1024 * 1024),
+        'dead': ProxyServer(down=True),
+        # Goes down after serving a few downloads, in the middle of the batch.
+        'dying': ProxyServer(fail_after=count // 4),
+    }
+    for proxy in proxies.values():
+        proxy.__enter__()
+    try:
+        names = {proxy.url: name for name, proxy in proxies.items()}
+        result = run_batch(app, urls, os.path.join(work_dir, 'proxies'), 4, extractors,
+                           proxy=', '.join(names), proxy_check_url=f'{server.base_url}/media/check.mp4?size=1',
+                           proxy_check_interval=1)
+    finally:
+        for proxy in proxies.values():
+            proxy.__exit__(None, None, None)
+    result['proxies'] = {names[stats['proxy']]: {key: stats[key] for key in ('healthy', 'jobs', 'failures', 'bytes')}
+                         for stats in result['proxies']}
+    result.update(files=count, file_size=size, workers=4)
+    return result
+
+
+def bench_progress(app, quick):
+    from download_engine import DownloadEngine
+    from progress_events import ProgressEvent
+    from yt_dlp_gui import YTDLPApp
+
+    calls = 20000 if quick else 100000
+    engine = DownloadEngine([], '', 'video', 'mp4', '', '', '', '', '', '', '', lambda key, **kwargs: key,
+                            progress=lambda event: None)
+    engine.metrics.job(1, 'bench://')
+    hook = {'status': 'downloading', 'tmpfilename': 'x.part', 'filename': 'x', 'total_bytes': calls * 1024,
+            'speed': 1e6, 'eta': 10}
+    start = time.perf_counter()
+    for i in range(calls):
+        hook['downloaded_bytes'] = i * 1024
+        engine.progress_hook(1, hook)
+    hook_us = (time.perf_counter() - start) / calls * 1e6
+
+    window = YTDLPApp()
+    events = [ProgressEvent(i % 8, 'downloading', i * 1024, calls * 1024, 1e6, 10) for i in range(calls // 10)]
+    start = time.perf_counter()
+    for event in events:
+        window.on_progress(event)
+    window.refresh_progress_label()
+    app.processEvents()
+    gui_us = (time.perf_counter() - start) / len(events) * 1e6
+    window.close()
+    return {'hook_us': hook_us, 'hook_calls': calls, 'gui_event_us': gui_us, 'gui_events': len(events)}
+
+
+def bench_log(app, work_dir, quick):
+    from log_view import LogView
+
+    lines = 20000 if quick else 100000
+    view = LogView(max_lines=5000, log_file=os.path.join(work_dir, 'bench.log'))
+    view.show()
+    start = time.perf_counter()
+    for i in range(lines):
+        view.append(f'[{i % 8}] Downloading: {i % 100}.0% Speed: 1.2MiB/s ETA: 00:10')
+        if i % 500 == 499:
+            # Roughly one flush per frame while a busy batch is logging.
+            app.processEvents()
+    view.flush()
+    app.processEvents()
+    seconds = time.perf_counter() - start
+    view.close()
+    return {'append_us': seconds / lines * 1e6, 'lines': lines}
+
+
+def bench_startup(runs):
+    import bench_startup as startup
+
+    with tempfile.TemporaryDirectory() as home:
+        startup.run_once(home)
+        results = [startup.run_once(home) for _ in range(runs)]
+    return {key: statistics.median(r[key] for r in results) * 1000 for key in ('import', 'window', 'total')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the offline benchmarks and record the results.')
+    parser.add_argument('--only', nargs='+', choices=SCENARIOS, help='run only these scenarios')
+    parser.add_argument('--quick', action='store_true', help='smaller batches, for a quick check')
+    parser.add_argument('--runs', type=int, default=3, help='start-up runs')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency per request in seconds')
+    parser.add_argument('--bandwidth', default='0', help='server bandwidth per connection, e.g. 4M (0 = unlimited)')
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'results.jsonl'),
+                        help='JSON lines file the results are appended to')
+    args = parser.parse_args(argv)
+    scenarios = args.only or SCENARIOS
+
+    work_dir = tempfile.mkdtemp(prefix='yt-dlp-gui-bench-')
+    os.environ['YT_DLP_GUI_HOME'] = work_dir
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, REPO_DIR)
+    from PyQt6.QtWidgets import QApplication
+    from bandwidth import parse_rate
+    from download_engine import load_yt_dlp
+    from media_server import MediaServer
+    from stub_extractor import BenchIE
+
+    app = QApplication(sys.argv[:1])
+    results = {}
+    try:
+        with MediaServer(latency=args.latency, bandwidth=parse_rate(args.bandwidth)) as server:
+            if 'direct' in scenarios:
+                results['direct'] = bench_direct(app, server, work_dir, args.quick, [BenchIE])
+            if 'hls' in scenarios:
+                results['hls'] = bench_hls(app, server, work_dir, args.quick, [BenchIE])
+            if 'proxies' in scenarios:
+                results['proxies'] = bench_proxies(app, server, work_dir, args.quick, [BenchIE])
+        if 'progress' in scenarios:
+            results['progress'] = bench_progress(app, args.quick)
+        if 'log' in scenarios:
+            results['log'] = bench_log(app, work_dir, args.quick)
+        if 'startup' in scenarios:
+            results['startup_ms'] = bench_startup(args.runs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    record = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': git_revision(), 'quick': args.quick,
+        'python': platform.python_version(), 'platform': platform.platform(),
+        'yt_dlp': load_yt_dlp().version.__version__, 'latency': args.latency, 'bandwidth': args.bandwidth,
+        'results': results,
+    }
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+
+    for name, values in results.items():
+        print(f'{name}:')
+        for key, value in values.items():
+            print(f'  {key:<16} {value:.3f}' if isinstance(value, float) else f'  {key:<16} {value}')
+    print(f'results appended to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
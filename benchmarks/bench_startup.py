@@ -0,0 +1,99 @@
+"""Measure how long the GUI takes to start.
+
+Every run starts a fresh interpreter that builds the main window on Qt's offscreen platform, with an empty
+configuration directory, and reports:
+
+    import   - importing yt_dlp_gui (PyQt6 and the app modules)
+    window   - creating YTDLPApp, showing it and processing the first events
+    total    - process start until the window is up, interpreter start-up included
+    yt-dlp   - until the background warm-up has loaded yt-dlp (time after the window was up)
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --max-window-ms 800   # exits with 1 when the median is slower
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from PyQt6.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+import yt_dlp_gui
+import download_engine
+t_import = time.perf_counter()
+window = yt_dlp_gui.YTDLPApp()
+window.show()
+app.processEvents()
+t_window = time.perf_counter()
+loaded_early = 'yt_dlp' in sys.modules
+deadline = t_window + 30
+while download_engine._yt_dlp is None and time.perf_counter() < deadline:
+    app.processEvents()
+    time.sleep(0.005)
+t_ready = time.perf_counter()
+print(json.dumps({
+    'import': t_import - t0, 'window': t_window - t_import, 'yt_dlp_ready': t_ready - t_window,
+    'yt_dlp_loaded_before_window': loaded_early,
+}))
+window.close()
+'''
+
+
+def run_once(home):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', YT_DLP_GUI_HOME=home)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', CHILD, REPO_DIR], env=env, capture_output=True, text=True,
+                         timeout=120, check=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    # The child's own clock starts after interpreter start-up; subtract what follows the window.
+    result['total'] = time.perf_counter() - start - result['yt_dlp_ready']
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the start-up time of yt_dlp_gui.py.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-window-ms', type=float, help='fail when the median time to the window is higher')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as home:
+        run_once(home)  # warm the OS file cache and write the compiled .pyc files
+        for _ in range(args.runs):
+            results.append(run_once(home))
+
+    summary = {}
+    for key in ('import', 'window', 'total', 'yt_dlp_ready'):
+        values = [r[key] * 1000 for r in results]
+        summary[key] = {'median_ms': statistics.median(values), 'min_ms': min(values), 'max_ms': max(values)}
+    summary['yt_dlp_loaded_before_window'] = any(r['yt_dlp_loaded_before_window'] for r in results)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f'{args.runs} runs, Python {sys.version.split()[0]}')
+        for key, label in (('import', 'import'), ('window', 'window'), ('total', 'total'), ('yt_dlp_ready', 'yt-dlp')):
+            s = summary[key]
+            print(f"  {label:<8} median {s['median_ms']:8.1f} ms   min {s['min_ms']:8.1f} ms   max {s['max_ms']:8.1f} ms")
+        if summary['yt_dlp_loaded_before_window']:
+            print('  warning: yt_dlp was imported before the window was shown')
+
+    window_ms = summary['import']['median_ms'] + summary['window']['median_ms']
+    if args.max_window_ms is not None and window_ms > args.max_window_ms:
+        print(f'FAIL: window after {window_ms:.1f} ms, limit {args.max_window_ms:.1f} ms', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""A local HTTP server with synthetic media for the offline benchmarks.
+
+    /media/<name>.mp4?size=N            N bytes of deterministic data (Range requests are supported)
+    /hls/<name>/index.m3u8?count=N&size=M   an HLS media playlist of N fragments of M bytes each
+    /hls/<name>/<i>.ts?size=M           one fragment
+
+Every response can be slowed down with `latency` (seconds before the first byte) and `bandwidth` (bytes per
+second per connection), to imitate a remote server.
+"""
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CHUNK = 64 * 1024
+# Repeating a short pattern keeps payloads cheap to produce while still looking like binary data.
+PATTERN = bytes((i * 131 + 7) % 256 for i in range(CHUNK))
+
+
+def payload(size, offset=0):
+    """Yield `size` bytes of the synthetic data starting at `offset`, in chunks."""
+    position = offset
+    end = offset + size
+    while position < end:
+        start = position % CHUNK
+        chunk = PATTERN[start:start + min(CHUNK - start, end - position)]
+        position += len(chunk)
+        yield chunk
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def handle_request(self, send_body):
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        self.server.count_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        match = re.fullmatch(r'/hls/([\w-]+)/index\.m3u8', parts.path)
+        if match:
+            count, size = int(query.get('count', 100)), int(query.get('size', 64 * 1024))
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0',
+                     '#EXT-X-PLAYLIST-TYPE:VOD']
+            for i in range(count):
+                lines += ['#EXTINF:2.0,', f'{i}.ts?size={size}']
+            lines.append('#EXT-X-ENDLIST')
+            return self.send_bytes('application/vnd.apple.mpegurl', ('\n'.join(lines) + '\n').encode(), send_body)
+        if re.fullmatch(r'/hls/[\w-]+/\d+\.ts', parts.path):
+            return self.send_media('video/mp2t', int(query.get('size', 64 * 1024)), send_body)
+        if re.fullmatch(r'/media/[\w-]+\.mp4', parts.path):
+            return self.send_media('video/mp4', int(query.get('size', 1024 * 1024)), send_body)
+        self.send_error(404)
+
+    def send_bytes(self, content_type, body, send_body):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_media(self, content_type, size, send_body):
+        start, end = 0, size - 1
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if not send_body:
+            return
+        started = time.monotonic()
+        sent = 0
+        try:
+            for chunk in payload(end - start + 1, start):
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                if self.server.bandwidth:
+                    delay = sent / self.server.bandwidth - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MediaServer(ThreadingHTTPServer):
+    """Serve synthetic media on 127.0.0.1 from a background thread; use as a context manager."""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, bandwidth=0):
+        super().__init__(('127.0.0.1', 0), MediaHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='media-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,155 @@
+"""A local HTTP proxy for the offline benchmarks, standing in for the proxies a batch is spread over.
+
+It forwards plain HTTP requests (absolute URLs, as clients send them to a proxy) and tunnels CONNECT requests.
+Like media_server.MediaServer, every response can be slowed down with `latency` and `bandwidth`, and the proxy
+can be taken down: with `down` set, or once it has served `fail_after` requests, it drops every connection, as a
+dead or overloaded proxy would.
+"""
+import http.client
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+CHUNK = 64 * 1024
+# Headers that belong to one connection and are not passed on.
+HOP_HEADERS = ('connection', 'keep-alive', 'proxy-connection', 'proxy-authorization', 'te', 'trailers',
+               'transfer-encoding', 'upgrade')
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.forward()
+
+    def do_HEAD(self):
+        self.forward()
+
+    def do_CONNECT(self):
+        if not self.server.accept_request():
+            return self.drop()
+        host, _, port = self.path.rpartition(':')
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=30)
+        except OSError:
+            return self.send_error(502)
+        self.send_response(200, 'Connection established')
+        self.end_headers()
+        self.close_connection = True
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 30)
+                if not readable:
+                    break
+                for sock in readable:
+                    data = sock.recv(CHUNK)
+                    if not data:
+                        return
+                    (upstream if sock is self.connection else self.connection).sendall(data)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+    def forward(self):
+        if not self.server.accept_request():
+            return self.drop()
+        parts = urlsplit(self.path)
+        if parts.scheme != 'http' or not parts.hostname:
+            return self.send_error(400)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        headers = {key: value for key, value in self.headers.items() if key.lower() not in HOP_HEADERS}
+        upstream = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        try:
+            upstream.request(self.command, parts.path + (f'?{parts.query}' if parts.query else ''), headers=headers)
+            response = upstream.getresponse()
+        except OSError:
+            upstream.close()
+            return self.send_error(502)
+        try:
+            self.send_response(response.status, response.reason)
+            for key, value in response.getheaders():
+                if key.lower() not in HOP_HEADERS:
+                    self.send_header(key, value)
+            self.end_headers()
+            if self.command == 'HEAD':
+                return
+            started = time.monotonic()
+            sent = 0
+            while not self.server.down:
+                chunk = response.read(CHUNK)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                self.server.count_bytes(len(chunk))
+                if self.server.bandwidth:
+                    delay = sent / self.server.bandwidth - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+            else:
+                # Taken down in the middle of a response.
+                self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            upstream.close()
+
+    def drop(self):
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProxyServer(ThreadingHTTPServer):
+    """Proxy on 127.0.0.1 from a background thread; use as a context manager."""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, bandwidth=0, down=False, fail_after=None):
+        super().__init__(('127.0.0.1', 0), ProxyHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.down = down
+        self.fail_after = fail_after
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def accept_request(self):
+        """Count a request; False if the proxy is (or has just gone) down."""
+        with self._lock:
+            if self.fail_after is not None and self.requests >= self.fail_after:
+                self.down = True
+            if self.down:
+                return False
+            self.requests += 1
+            return True
+
+    def count_bytes(self, nbytes):
+        with self._lock:
+            self.bytes += nbytes
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='proxy-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,26 @@
+"""A yt-dlp extractor for media served by media_server.MediaServer, so benchmarks need no real site.
+
+    bench://127.0.0.1:PORT/video/<name>?size=N              one progressive mp4 format
+    bench://127.0.0.1:PORT/hls/<name>?count=N&size=M        one native HLS format with N fragments
+"""
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class BenchIE(InfoExtractor):
+    IE_NAME = 'bench'
+    _VALID_URL = r'bench://(?P<host>[\w.-]+:\d+)/(?P<kind>video|hls)/(?P<id>[\w-]+)(?:\?(?P<query>[^#]*))?'
+
+    def _real_extract(self, url):
+        host, kind, video_id, query = self._match_valid_url(url).group('host', 'kind', 'id', 'query')
+        query = query or ''
+        if kind == 'video':
+            fmt = {'url': f'http://{host}/media/{video_id}.mp4?{query}'}
+        else:
+            fmt = {'url': f'http://{host}/hls/{video_id}/index.m3u8?{query}', 'protocol': 'm3u8_native'}
+        fmt.update({'format_id': kind, 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a.40.2'})
+        return {
+            'id': video_id,
+            'title': f'bench {video_id}',
+            'duration': 60,
+            'formats': [fmt],
+        }
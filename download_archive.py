@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+# Host name labels too common to tell which extractor a URL pattern is for.
+COMMON_HOST_LABELS = frozenset({'www', 'm', 'mobile', 'com', 'co', 'org', 'net', 'tv'})
+
+
+class DownloadArchive:
+    """SQLite record of completed downloads, keyed by (extractor, video id, format).
+
+    Each thread gets its own connection, so workers can check and record downloads concurrently; lookups go
+    through the primary key index and stay fast with hundreds of thousands of entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS downloads ('
+            'extractor TEXT NOT NULL, video_id TEXT NOT NULL, format TEXT NOT NULL, path TEXT, '
+            'completed REAL NOT NULL, PRIMARY KEY (extractor, video_id, format)) WITHOUT ROWID')
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def contains(self, extractor, video_id, fmt):
+        row = self._connection().execute(
+            'SELECT 1 FROM downloads WHERE extractor = ? AND video_id = ? AND format = ?',
+            (extractor.lower(), video_id, fmt)).fetchone()
+        return row is not None
+
+    def add(self, extractor, video_id, fmt, path=None):
+        """Record a completed download; recording it again only fills in a missing path."""
+        conn = self._connection()
+        conn.execute(
+            'INSERT INTO downloads (extractor, video_id, format, path, completed) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (extractor, video_id, format) DO UPDATE SET path = COALESCE(excluded.path, path)',
+            (extractor.lower(), video_id, fmt, path, time.time()))
+        conn.commit()
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM downloads').fetchone()[0]
+
+    def view(self, fmt, record=True):
+        return ArchiveView(self, fmt, record)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+class ArchiveView:
+    """The archive for one output format, in the form yt-dlp expects for its 'download_archive' option.
+
+    yt-dlp checks `'<extractor> <id>' in archive` before extracting playlist entries and downloading, and
+    calls archive.add('<extractor> <id>') once a download has finished. With record=False that call does nothing,
+    for callers that record downloads themselves once their files are really finished.
+    """
+
+    def __init__(self, archive, fmt, record=True):
+        self.archive = archive
+        self.fmt = fmt
+        self.record = record
+
+    def __bool__(self):
+        return True
+
+    def __contains__(self, archive_id):
+        extractor, _, video_id = archive_id.partition(' ')
+        return bool(video_id) and self.archive.contains(extractor, video_id, self.fmt)
+
+    def add(self, archive_id):
+        extractor, _, video_id = archive_id.partition(' ')
+        if video_id and self.record:
+            self.archive.add(extractor, video_id, self.fmt)
+
+
+@lru_cache(maxsize=4096)
+def archive_key_for_url(url):
+    """Return 'extractor:id' for a URL without any network access, or None if it cannot be told from the URL."""
+    from yt_dlp.extractor import gen_extractor_classes
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic':
+            continue
+        if ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            return f'{ie.ie_key().lower()}:{temp_id}' if temp_id else None
+    return None
+
+
+@lru_cache(maxsize=1)
+def _extractor_patterns():
+    """(extractor, lower-cased _VALID_URL text) for every extractor that can match a URL."""
+    from yt_dlp.extractor import gen_extractor_classes
+    patterns = []
+    for ie in gen_extractor_classes():
+        valid_url = getattr(ie, '_VALID_URL', None)
+        if ie.ie_key() == 'Generic' or not valid_url:
+            continue
+        text = valid_url if isinstance(valid_url, str) else ' '.join(valid_url)
+        patterns.append((ie, text.lower()))
+    return patterns
+
+
+@lru_cache(maxsize=1024)
+def _extractors_for_host(host):
+    labels = [label for label in host.split('.')[:-1] if label and label not in COMMON_HOST_LABELS]
+    return tuple(ie for ie, text in _extractor_patterns() if any(label in text for label in labels))
+
+
+@lru_cache(maxsize=16384)
+def site_archive_key(url):
+    """Like archive_key_for_url, but only tries the extractors whose URL pattern names the URL's host.
+
+    That takes microseconds instead of milliseconds for URLs of sites without an extractor. Extractors that
+    accept any host (e.g. for self-hosted platforms) are not tried, so their URLs get no key.
+    """
+    host = (urlsplit(url).hostname or '').lower()
+    for ie in _extractors_for_host(host):
+        if ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            return f'{ie.ie_key().lower()}:{temp_id}' if temp_id else None
+    return None
@@ -0,0 +1,1166 @@
+import glob
+import optparse
+import os
+import shlex
+import sqlite3
+import threading
+import time
+
+from app_paths import data_file_path
+from bandwidth import BandwidthGovernor, host_weight
+from download_archive import DownloadArchive, archive_key_for_url
+from format_resolver import (FormatResolver, audio_codec_matches, audio_selector, is_selector, parse_bitrate,
+                             video_selector)
+from fragment_tuner import FragmentTuner
+from job_queue import JobQueue
+from job_scheduler import CancelToken, DownloadJob, JobScheduler, url_host
+from metrics import MAX_JSONL_BYTES, MetricsRecorder
+from metadata_cache import MetadataCache, is_cacheable, video_key
+from postprocess import AUDIO_CODECS, PostProcessStage, PostProcessTask, find_ffmpeg
+from preflight import flatten, run_preflight
+from progress_events import ProgressCoalescer, ProgressEvent, format_bytes, format_eta
+from proxy_pool import DEFAULT_CHECK_INTERVAL, DEFAULT_CHECK_URL, ProxyPool, parse_proxies
+from staging import deliver, space_shortfalls, staging_path
+from subtitles import DEFAULT_LANGUAGES, SubtitleTask, has_subtitle_info, parse_languages, select_tracks
+
+# Internal download modes, in the same order as the 'download_types' translation list.
+DOWNLOAD_MODES = ('video_audio', 'video', 'audio', 'subtitles')
+# Modes whose ffmpeg step (audio extraction, merging, remuxing) runs in the post-processing stage when ffmpeg is found.
+PIPELINED_MODES = ('audio', 'video', 'video_audio')
+# Extra parameters that change these options keep post-processing inside yt-dlp.
+PIPELINE_OPTIONS = ('format', 'outtmpl', 'merge_output_format', 'keepvideo', 'skip_download', 'postprocessors')
+# Read size of yt-dlp's HTTP downloader while a bandwidth limit is set: small reads keep the throttling smooth.
+THROTTLED_BUFFER_SIZE = 64 * 1024
+# Kinds of retries yt-dlp reports through its 'retry_sleep_functions' option.
+RETRY_KINDS = ('http', 'fragment', 'file_access', 'extractor')
+# Subtitle tracks fetched at once, across all the jobs of a batch.
+SUBTITLE_FETCH_WORKERS = 8
+# With several proxies, a download that fails on a connection error is tried through up to this many others.
+MAX_PROXY_FAILOVERS = 2
+PROXY_CHECK_TIMEOUT = 10
+
+_default_ydl_opts = None
+_yt_dlp = None
+_yt_dlp_lock = threading.Lock()
+
+
+def load_yt_dlp():
+    """Import yt-dlp and its extractor list on first use and return the module; later calls are free."""
+    global _yt_dlp
+    with _yt_dlp_lock:
+        if _yt_dlp is None:
+            import yt_dlp
+            from yt_dlp.extractor import gen_extractor_classes
+            gen_extractor_classes()
+            _yt_dlp = yt_dlp
+    return _yt_dlp
+
+
+def yt_dlp_loaded():
+    return _yt_dlp is not None
+
+
+def warm_up():
+    """Load yt-dlp on a background thread, so a user interface can show up first and a batch need not wait."""
+    if _yt_dlp is None:
+        threading.Thread(target=load_yt_dlp, name='yt-dlp-warm-up', daemon=True).start()
+
+
+class StopDownloadException(Exception):
+    """Custom exception to signal download interruption."""
+    pass
+
+
+class OptionsError(Exception):
+    """Raised when the batch settings cannot be turned into yt-dlp options."""
+    pass
+
+
+def is_connection_error(error):
+    """Whether an exception from yt-dlp was caused by the connection (and so may be the proxy's fault)."""
+    transport_error = load_yt_dlp().networking.exceptions.TransportError
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, transport_error):
+            return True
+        seen.add(id(error))
+        # yt-dlp wraps the original error in DownloadError.exc_info or ExtractorError.cause.
+        exc_info = getattr(error, 'exc_info', None)
+        error = ((exc_info[1] if exc_info else None) or getattr(error, 'cause', None) or error.__cause__ or
+                 error.__context__)
+    return False
+
+
+def parse_extra_params(extra_params):
+    """Parse extra yt-dlp command line parameters into the YoutubeDL options they change."""
+    global _default_ydl_opts
+    try:
+        argv = shlex.split(extra_params)
+    except ValueError as e:
+        raise OptionsError(str(e))
+    if not argv:
+        return {}
+    yt_dlp = load_yt_dlp()
+    try:
+        if _default_ydl_opts is None:
+            _default_ydl_opts = yt_dlp.parse_options([]).ydl_opts
+        parsed = yt_dlp.parse_options(argv)
+    except optparse.OptParseError as e:
+        raise OptionsError(str(e).strip().splitlines()[-1].split('error:', 1)[-1].strip())
+    except SystemExit:
+        # Older yt-dlp versions report bad options by exiting.
+        raise OptionsError(extra_params)
+    if parsed.urls:
+        raise OptionsError(' '.join(parsed.urls))
+    changed = {key: value for key, value in parsed.ydl_opts.items() if _default_ydl_opts.get(key) != value}
+    if 'postprocessors' in changed:
+        changed['postprocessors'] = [pp for pp in changed['postprocessors']
+                                     if pp not in _default_ydl_opts.get('postprocessors', [])]
+    return changed
+
+
+def build_ydl_options(path, download_mode, video_format, audio_format, prefix, proxy, ffmpeg_path,
+                      video_quality, audio_quality, extra_params, pipeline=False, on_format=None):
+    """Build the YoutubeDL options shared by every URL of a batch; raises OptionsError on bad extra parameters.
+
+    With pipeline, yt-dlp only downloads: the audio is not extracted and video and audio are saved as separate
+    files, for the post-processing stage to convert and merge.
+
+    Formats are chosen by a FormatResolver, which reads the quality labels as limits and prefers streams the
+    output format takes as they are; on_format(FormatChoice) is called with each of its choices. A format
+    selector typed into a quality field is passed to yt-dlp instead.
+    """
+    ydl_opts = {
+        'outtmpl': os.path.join(path, f'{prefix}%(title)s.%(ext)s'),
+    }
+
+    if proxy:
+        ydl_opts['proxy'] = proxy
+
+    if ffmpeg_path:
+        ydl_opts['ffmpeg_location'] = ffmpeg_path
+
+    custom = download_mode != 'audio' and (is_selector(video_quality) or is_selector(audio_quality))
+    resolver = FormatResolver(download_mode, video_format, audio_format, video_quality, audio_quality,
+                              split=pipeline, can_merge=pipeline or find_ffmpeg(ffmpeg_path) is not None,
+                              on_choice=on_format)
+    if download_mode == 'audio' and pipeline:
+        ydl_opts['format'] = audio_quality.strip() if is_selector(audio_quality) else resolver
+    elif download_mode == 'audio':
+        bitrate = parse_bitrate(audio_quality)
+        ydl_opts.update({
+            'format': audio_quality.strip() if is_selector(audio_quality) else resolver,
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': audio_format,
+                'preferredquality': f'{bitrate:g}' if bitrate else '192',
+            }],
+        })
+        ydl_opts['outtmpl'] = os.path.join(path, f'{prefix}%(title)s.{audio_format}')
+    elif download_mode == 'video' and pipeline:
+        ydl_opts['format'] = video_quality.strip() if is_selector(video_quality) else resolver
+        ydl_opts['outtmpl'] = os.path.join(path, f'{prefix}%(title)s.f%(format_id)s.%(ext)s')
+    elif download_mode == 'video':
+        ydl_opts['format'] = video_quality.strip() if is_selector(video_quality) else resolver
+        ydl_opts['outtmpl'] = os.path.join(path, f'{prefix}%(title)s.{video_format}')
+        ydl_opts['merge_output_format'] = video_format
+    elif download_mode == 'video_audio' and pipeline:
+        ydl_opts['format'] = (f'{video_selector(video_quality)}/best,{audio_selector(audio_quality)}' if custom
+                              else resolver)
+        ydl_opts['outtmpl'] = os.path.join(path, f'{prefix}%(title)s.f%(format_id)s.%(ext)s')
+    elif download_mode == 'video_audio':
+        ydl_opts['format'] = (f'{video_selector(video_quality)}+{audio_selector(audio_quality)}/best' if custom
+                              else resolver)
+        ydl_opts['merge_output_format'] = video_format
+    elif download_mode == 'subtitles':
+        # The engine picks and fetches the tracks itself; these only make every extractor list them.
+        ydl_opts.update({
+            'skip_download': True,
+            'writesubtitles': True,
+            'writeautomaticsub': True,
+        })
+
+    extra_opts = parse_extra_params(extra_params) if extra_params else {}
+    extra_postprocessors = extra_opts.pop('postprocessors', [])
+    ydl_opts.update(extra_opts)
+    if extra_postprocessors:
+        ydl_opts['postprocessors'] = ydl_opts.get('postprocessors', []) + extra_postprocessors
+    return ydl_opts, extra_opts
+
+
+def downloaded_videos(info):
+    """Yield the video info dicts of a processed extraction result, looking into playlists."""
+    if not info:
+        return
+    if info.get('_type', 'video') == 'video':
+        yield info
+    for entry in info.get('entries') or []:
+        yield from downloaded_videos(entry)
+
+
+def sidecar_files(info):
+    """The paths of the files other than the video itself that yt-dlp wrote for it and reported in info."""
+    paths = []
+    # yt-dlp reports some of them in the info of each downloaded format rather than in the video's.
+    for source in (info, *(info.get('requested_downloads') or ())):
+        paths += [subtitle.get('filepath') for subtitle in (source.get('requested_subtitles') or {}).values()]
+        paths += [thumbnail.get('filepath') for thumbnail in source.get('thumbnails') or ()]
+        paths.append(source.get('infojson_filename'))
+    return list(dict.fromkeys(path for path in paths if path))
+
+
+class DownloaderContext:
+    """A long-lived YoutubeDL used by one worker thread, and the job it is currently working on.
+
+    With a proxy pool, the worker keeps one YoutubeDL per proxy it has used (yt-dlp sets up its proxies when it
+    opens the first connection), and use_proxy() switches between them.
+    """
+
+    def __init__(self, ydl_opts, progress_hook, postprocessor_hook=None, retry_hook=None, extractors=()):
+        self.job_id = None
+        self.ydl_opts = ydl_opts
+        self.extractors = extractors
+        self.proxy = ydl_opts.get('proxy')
+        self._ydls = {}
+        # The hooks read job_id when they fire, so they also work from yt-dlp's fragment download threads.
+        hooks = {'progress_hooks': [lambda d: progress_hook(self.job_id, d)]}
+        if postprocessor_hook:
+            hooks['postprocessor_hooks'] = [lambda d: postprocessor_hook(self.job_id, d)]
+        if retry_hook:
+            # yt-dlp asks these how long to sleep before each retry, which makes them a retry hook.
+            sleep_functions = ydl_opts.get('retry_sleep_functions') or {}
+            hooks['retry_sleep_functions'] = {kind: self._retry_sleep(retry_hook, sleep_functions.get(kind))
+                                              for kind in RETRY_KINDS}
+        self.hooks = hooks
+        self.ydl = self._create(ydl_opts)
+
+    def _create(self, ydl_opts):
+        if not self.extractors:
+            return load_yt_dlp().YoutubeDL({**ydl_opts, **self.hooks})
+        # Extra extractors go first, so they are tried before yt-dlp's catch-all generic extractor.
+        ydl = load_yt_dlp().YoutubeDL({**ydl_opts, **self.hooks}, auto_init=False)
+        for extractor in self.extractors:
+            ydl.add_info_extractor(extractor())
+        ydl.add_default_info_extractors()
+        return ydl
+
+    def use_proxy(self, proxy):
+        if proxy == self.proxy:
+            return
+        self._ydls[self.proxy] = self.ydl
+        self.proxy = proxy
+        self.ydl = self._ydls.get(proxy) or self._create({**self.ydl_opts, 'proxy': proxy})
+
+    def _retry_sleep(self, retry_hook, sleep_function):
+        def sleep(n):
+            retry_hook(self.job_id)
+            return sleep_function(n=n) if callable(sleep_function) else sleep_function
+        return sleep
+
+    def close(self):
+        self._ydls[self.proxy] = self.ydl
+        for ydl in self._ydls.values():
+            ydl.close()
+
+
+class DownloaderPool:
+    """Give every worker thread its own DownloaderContext, kept for the whole batch.
+
+    Reusing the YoutubeDL keeps initialised extractors, the loaded cookie jar and open HTTP connections
+    between URLs instead of rebuilding them for every download.
+    """
+
+    def __init__(self, ydl_opts, progress_hook, postprocessor_hook=None, retry_hook=None, extractors=()):
+        self.ydl_opts = ydl_opts
+        self.progress_hook = progress_hook
+        self.postprocessor_hook = postprocessor_hook
+        self.retry_hook = retry_hook
+        self.extractors = extractors
+        self._local = threading.local()
+        self._contexts = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        context = getattr(self._local, 'context', None)
+        if context is None:
+            context = DownloaderContext(self.ydl_opts, self.progress_hook, self.postprocessor_hook, self.retry_hook,
+                                        self.extractors)
+            self._local.context = context
+            with self._lock:
+                self._contexts.append(context)
+        return context
+
+    def close(self):
+        with self._lock:
+            contexts, self._contexts = self._contexts, []
+        for context in contexts:
+            try:
+                context.close()
+            except Exception as e:
+                print(f"Error closing downloader: {e}")
+
+
+class DownloadEngine:
+    """Run one batch of downloads, independent of any user interface.
+
+    Messages are passed to log(text) already translated, progress is passed to progress(ProgressEvent) at
+    most `progress_rate` times per second and job, and job_update(job), if given, is called whenever a job
+    changes state; jobs_planned([(job_id, url), ...]), if given, is called once the jobs of the batch are known.
+    stage_update({'download': (running, waiting), 'postprocess': (running, waiting)}), if
+    given, is called whenever the queue depth of a pipeline stage changes. The callbacks are invoked from
+    worker threads. ydl_logger, if given, is passed to yt-dlp as its 'logger' option.
+
+    rate_limit caps the total bandwidth of all downloads of the batch (bytes per second, 0 = unlimited), which is
+    shared between the jobs by weight: host_weights ({site: weight}) gives the jobs of a site and its subdomains
+    their starting weight, and both can be changed while the batch runs with set_rate_limit() and
+    set_job_weight().
+    With adaptive_fragments, the fragment concurrency of HLS/DASH downloads is tuned per site by a
+    FragmentTuner, unless the extra parameters set it. Timings and counters of every job are collected in
+    `metrics` (a MetricsRecorder) and appended to metrics.jsonl and metrics.prom in the data directory.
+    extractors are InfoExtractor classes tried before yt-dlp's own (the offline benchmarks use a stub one).
+
+    Single jobs can be cancelled, paused and resumed with cancel_job(), pause_job() and resume_job(); each has
+    a CancelToken that interrupts its download at the next progress update and terminates its ffmpeg
+    post-processing. The partial files of cancelled jobs, and of the running jobs when the batch is stopped, are
+    kept for a later resume or deleted, depending on keep_partial.
+
+    In 'subtitles' mode no formats are resolved: the tracks of subtitle_languages (see subtitles.parse_languages)
+    are picked from the extraction result, uploaded ones before automatic captions (if auto_subtitles), and
+    fetched by a stage shared by the whole batch while the next URLs are extracted. With subtitle_format they
+    are converted to that format with ffmpeg.
+
+    With staging_dir, files are downloaded and converted in a directory of it (see staging.staging_path) and
+    only moved to `path` once finished. A batch whose size, as far as pre-flight could tell, does not fit on the
+    filesystems of the staging directory and of `path` is not started, and space_error says why.
+
+    `proxy` may list several proxies (see proxy_pool.parse_proxies). They are then checked in the background by
+    fetching proxy_check_url through each every proxy_check_interval seconds, every job goes through the best
+    working one, and a download that fails on a connection error continues through another; proxy_stats() tells
+    how each of them did.
+    """
+
+    def __init__(self, urls, path, download_mode, video_format, audio_format, prefix, proxy, ffmpeg_path,
+                 video_quality, audio_quality, extra_params, get_translation, max_workers=1, per_host_limit=0,
+                 metadata_cache_ttl=24 * 3600, preflight=True, use_archive=True, job_queue=None, batch_id=None,
+                 log=print, progress=None, job_update=None, progress_rate=10, ydl_logger=None, stage_update=None,
+                 rate_limit=0, adaptive_fragments=True, extractors=(), jobs_planned=None, keep_partial=True,
+                 subtitle_languages=DEFAULT_LANGUAGES, subtitle_format='', auto_subtitles=True, staging_dir='',
+                 proxy_check_url=DEFAULT_CHECK_URL, proxy_check_interval=DEFAULT_CHECK_INTERVAL, host_weights=None):
+        self.urls = urls
+        self.path = path
+        self.staging_dir = staging_dir
+        # Where yt-dlp and the post-processing stage write; finished files are moved from here to path.
+        self.work_path = staging_path(staging_dir, path) if staging_dir else path
+        self.download_mode = download_mode
+        self.video_format = video_format
+        self.audio_format = audio_format
+        self.prefix = prefix
+        self.proxy = proxy
+        self.proxies = parse_proxies(proxy)
+        self.proxy_check_url = proxy_check_url
+        self.proxy_check_interval = proxy_check_interval
+        self.proxy_pool = None
+        self._probe_ydl = None
+        self._job_proxies = {}
+        self.ffmpeg_path = ffmpeg_path
+        self.video_quality = video_quality
+        self.audio_quality = audio_quality
+        self.extra_params = extra_params
+        self.subtitle_languages = parse_languages(subtitle_languages) or parse_languages(DEFAULT_LANGUAGES)
+        self.subtitle_format = subtitle_format
+        self.auto_subtitles = auto_subtitles
+        self._stop_flag = False
+        self.get_translation = get_translation
+        self.scheduler = JobScheduler(max_workers, per_host_limit, on_change=self.report_stages)
+        self.log = log
+        self.job_update = job_update
+        self.jobs_planned = jobs_planned
+        self.ydl_logger = ydl_logger
+        self.stage_update = stage_update
+        self.ffmpeg = None
+        self.postprocess = None
+        self.output_template = os.path.join(self.work_path, f'{prefix}%(title)s.%(ext)s')
+        self._tasks_lock = threading.Lock()
+        self._pending_tasks = {}
+        self.governor = BandwidthGovernor(rate_limit)
+        self.host_weights = host_weights or {}
+        self._read_bytes = {}
+        self.adaptive_fragments = adaptive_fragments
+        self.fragment_tuner = None
+        self._fragments = {}
+        self.metrics = MetricsRecorder(batch_id)
+        self.extractors = extractors
+        self.progress = ProgressCoalescer(progress or (lambda event: None), rate=progress_rate)
+        self.pool = None
+        self.metadata_cache_ttl = metadata_cache_ttl
+        self.metadata_cache = None
+        self.preflight = preflight
+        self.use_archive = use_archive
+        self.archive = None
+        # Downloads of the same video in another mode, container or quality are archived separately.
+        self.archive_format = '/'.join((download_mode, video_format or audio_format,
+                                        video_quality if download_mode != 'audio' else audio_quality))
+        if download_mode == 'subtitles':
+            self.archive_format = '/'.join((download_mode, subtitle_format, 'auto' if auto_subtitles else 'manual',
+                                            ','.join('|'.join(entry) for entry in self.subtitle_languages)))
+        self.job_queue = job_queue
+        self.batch_id = batch_id
+        self.jobs_by_id = {}
+        self.options_error = None
+        self.space_error = None
+        self.keep_partial = keep_partial
+        self._tokens = {}
+        self._tokens_lock = threading.Lock()
+        self._part_paths = {}
+
+    def stop(self):
+        """Ask the batch to stop and return at once.
+
+        Running downloads are interrupted at their next progress update and running ffmpeg conversions are
+        terminated; run() returns once the workers have noticed.
+        """
+        self._stop_flag = True
+        self.scheduler.stop()
+        if self.postprocess is not None:
+            self.postprocess.terminate()
+
+    @property
+    def stopped(self):
+        return self._stop_flag
+
+    def set_rate_limit(self, rate):
+        """Change the total bandwidth cap (bytes per second, 0 = unlimited) of the running batch."""
+        self.governor.set_rate(rate)
+
+    def token(self, job_id):
+        with self._tokens_lock:
+            token = self._tokens.get(job_id)
+            if token is None:
+                token = self._tokens[job_id] = CancelToken()
+            return token
+
+    def interrupted(self, job_id):
+        if self._stop_flag:
+            return True
+        token = self._tokens.get(job_id)
+        return token is not None and token.interrupted
+
+    def cancel_job(self, job_id):
+        """Cancel one job, whether it is waiting, paused, downloading or being converted."""
+        job = self.jobs_by_id.get(job_id)
+        if job is None or job.state in ('done', 'failed', 'cancelled'):
+            return
+        self.token(job_id).cancel()
+        if self.scheduler.remove(job_id) is not None:
+            self.finish_interrupted(job, 'cancelled')
+
+    def pause_job(self, job_id):
+        """Pause one job; a running download is interrupted and continues from its partial file on resume."""
+        job = self.jobs_by_id.get(job_id)
+        if job is None or job.state not in ('pending', 'extracting', 'downloading'):
+            return
+        self.token(job_id).pause()
+        if self.scheduler.hold_pending(job_id):
+            self.finish_interrupted(job, 'paused')
+
+    def resume_job(self, job_id):
+        token = self._tokens.get(job_id)
+        if token is None:
+            return
+        token.resume()
+        job = self.jobs_by_id.get(job_id)
+        if job is not None and self.scheduler.release(job_id):
+            self.update_job(job, 'pending')
+            self.log(f'[{job_id}] ' + self.get_translation('job_resumed'))
+
+    def job_requeued(self, job):
+        """Record a job that was resumed before its pause took effect, and was queued again instead of held."""
+        if self._stop_flag:
+            self.finish_interrupted(job, 'pending')
+            return
+        self.update_job(job, 'pending')
+        self.log(f'[{job.job_id}] ' + self.get_translation('job_resumed'))
+
+    def finish_interrupted(self, job, state):
+        """Record a job that was cancelled, paused or stopped, and delete its partial files if asked to."""
+        if state != 'paused' and not self.keep_partial:
+            self.remove_partial_files(job.job_id)
+        self.update_job(job, state)
+        if state in ('cancelled', 'paused'):
+            self.log(f'[{job.job_id}] ' + self.get_translation(f'job_{state}'))
+
+    def remove_partial_files(self, job_id):
+        """Delete the .part files of a job, with yt-dlp's resume data and the fragments of segmented downloads."""
+        for part_path in self._part_paths.pop(job_id, ()):
+            paths = [part_path, part_path + '.ytdl', *glob.glob(glob.escape(part_path) + '-Frag*')]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Error removing partial file {path}: {e}")
+
+    def set_job_weight(self, job_id, weight):
+        """Give a job a larger (or smaller) share of the bandwidth; the default weight is 1."""
+        self.governor.set_weight(job_id, weight)
+
+    def job_weight(self, job_id):
+        return self.governor.weight(job_id)
+
+    def run(self):
+        try:
+            self.run_batch()
+        finally:
+            # A stopped batch stays unfinished in the queue; the caller decides whether it is resumed later.
+            if self.job_queue is not None and self.batch_id is not None and not self._stop_flag:
+                self.job_queue.finish_batch(self.batch_id)
+
+    def run_batch(self):
+        if self.download_mode in PIPELINED_MODES:
+            self.ffmpeg = find_ffmpeg(self.ffmpeg_path)
+        try:
+            ydl_opts, extra_opts = self.build_options(pipeline=self.ffmpeg is not None)
+            if self.ffmpeg is not None and (ydl_opts.get('postprocessors') or
+                                            any(key in extra_opts for key in PIPELINE_OPTIONS)):
+                self.ffmpeg = None
+                ydl_opts, extra_opts = self.build_options(pipeline=False)
+        except OptionsError as e:
+            self.options_error = str(e)
+            self.log(self.get_translation('extra_params_error', error=str(e)))
+            return
+        if extra_opts:
+            self.log(self.get_translation('extra_params_applied', params=str(extra_opts)))
+
+        self.metadata_cache = self.open_metadata_cache()
+        self.archive = self.open_archive()
+        if self.ydl_logger is not None:
+            ydl_opts['logger'] = self.ydl_logger
+        if self.archive is not None:
+            # yt-dlp archives a video as soon as it is downloaded; the post-processing stage may still fail to
+            # convert it, and the move out of the staging directory to deliver it, so with either of them videos
+            # are only archived once they are in the save path.
+            ydl_opts.setdefault('download_archive', self.archive.view(
+                self.archive_format, record=self.ffmpeg is None and not self.staging_dir))
+        if self.adaptive_fragments and 'concurrent_fragment_downloads' not in extra_opts:
+            self.fragment_tuner = self.open_fragment_tuner()
+        if self.governor.rate:
+            ydl_opts.setdefault('buffersize', THROTTLED_BUFFER_SIZE)
+            ydl_opts.setdefault('noresizebuffer', True)
+        self.metrics.yt_dlp_version = load_yt_dlp().version.__version__
+        self.pool = DownloaderPool(ydl_opts, self.progress_hook, self.postprocessor_hook, self.metrics.retry,
+                                   self.extractors)
+        if len(self.proxies) > 1 and 'proxy' not in extra_opts:
+            self.proxy_pool = self.open_proxy_pool(ydl_opts)
+        if self.download_mode == 'subtitles':
+            if self.subtitle_format:
+                self.ffmpeg = find_ffmpeg(self.ffmpeg_path)
+                if self.ffmpeg is None:
+                    self.log(self.get_translation('subtitle_no_ffmpeg', format=self.subtitle_format))
+            self.postprocess = PostProcessStage(workers=SUBTITLE_FETCH_WORKERS, on_change=self.report_stages)
+        elif self.ffmpeg is not None:
+            self.postprocess = PostProcessStage(on_change=self.report_stages)
+        try:
+            jobs = self.load_jobs()
+            self.jobs_by_id = {job.job_id: job for job in jobs}
+            for job in jobs:
+                weight = host_weight(self.host_weights, job.host)
+                if weight is not None:
+                    self.governor.set_weight(job.job_id, weight)
+            if self.jobs_planned is not None:
+                self.jobs_planned([(job.job_id, job.url) for job in jobs])
+            if self.check_space(jobs):
+                self.scheduler.run(jobs, self.run_job)
+        finally:
+            if self.postprocess is not None:
+                if self._stop_flag:
+                    self.postprocess.cancel_pending()
+                self.postprocess.shutdown()
+            self.pool.close()
+            if self.proxy_pool is not None:
+                self.close_proxy_pool()
+            if self.metadata_cache:
+                stats = self.metadata_cache.stats()
+                self.log(self.get_translation('metadata_cache_stats', hits=stats['hits'], misses=stats['misses']))
+                self.metadata_cache.close()
+            if self.archive is not None:
+                self.archive.close()
+            if self.fragment_tuner is not None:
+                self.fragment_tuner.close()
+            self.metrics.finish()
+            self.report_metrics()
+        stats = self.governor.stats()
+        if stats['target'] and stats['average']:
+            self.log(self.get_translation('bandwidth_summary', average=format_bytes(stats['average']) + '/s',
+                                          target=format_bytes(stats['target']) + '/s'))
+        if self._stop_flag:
+            self.log(self.get_translation('download_stopped'))
+
+    def open_proxy_pool(self, ydl_opts):
+        """Start checking the proxies of the batch; the checks share one YoutubeDL without any extractors."""
+        self._probe_ydl = load_yt_dlp().YoutubeDL({**ydl_opts, 'quiet': True, 'no_warnings': True}, auto_init=False)
+        pool = ProxyPool(self.proxies, self.probe_proxy, self.proxy_check_interval, on_change=self.proxy_changed)
+        pool.start()
+        return pool
+
+    def probe_proxy(self, proxy):
+        from yt_dlp.networking import Request
+        request = Request(self.proxy_check_url, proxies={'all': proxy}, extensions={'timeout': PROXY_CHECK_TIMEOUT})
+        with self._probe_ydl.urlopen(request) as response:
+            response.read()
+
+    def proxy_changed(self, stats):
+        if stats.healthy:
+            self.log(self.get_translation('proxy_up', proxy=stats.proxy, latency=f'{(stats.latency or 0) * 1000:.0f}'))
+        else:
+            self.log(self.get_translation('proxy_down', proxy=stats.proxy, error=stats.error))
+
+    def close_proxy_pool(self):
+        self.proxy_pool.close()
+        self._probe_ydl.close()
+        for stats in self.proxy_pool.stats():
+            self.log(self.get_translation(
+                'proxy_summary', proxy=stats['proxy'], jobs=stats['jobs'], failures=stats['failures'],
+                size=format_bytes(stats['bytes']), speed=format_bytes(stats['throughput']) + '/s',
+                latency=f"{stats['latency'] * 1000:.0f}" if stats['latency'] is not None else '?'))
+
+    def proxy_stats(self):
+        """How every proxy of the batch did (see ProxyStats.to_dict); empty without a proxy pool."""
+        return self.proxy_pool.stats() if self.proxy_pool is not None else []
+
+    def check_space(self, jobs):
+        """Tell whether the estimated size of the jobs fits on the staging and destination filesystems."""
+        needed = sum(job.filesize or 0 for job in jobs)
+        if not needed or self.download_mode == 'subtitles':
+            # Pre-flight was off or the batch was resumed, or the jobs are subtitles, whose size is not known.
+            return True
+        paths = [self.work_path, self.path] if self.staging_dir else [self.path]
+        for path, free in space_shortfalls(needed, paths):
+            self.space_error = self.get_translation('disk_space_error', path=path, needed=format_bytes(needed),
+                                                    free=format_bytes(free))
+            self.log(self.space_error)
+        return self.space_error is None
+
+    def report_metrics(self):
+        """Log a one-line summary of the batch and export the metrics to the data directory."""
+        summary = self.metrics.summary()
+        if not summary['jobs']:
+            return
+        phases = {phase: f"{values['total']:.1f}s" for phase, values in summary['phases'].items()}
+        self.log(self.get_translation(
+            'metrics_summary', jobs=summary['jobs'], seconds=f"{summary['seconds']:.1f}s", size=format_bytes(
+                summary['bytes']), speed=format_bytes(summary['average_speed']) + '/s', retries=summary['retries'],
+            **phases))
+        try:
+            self.metrics.write_jsonl(data_file_path('metrics.jsonl'), max_bytes=MAX_JSONL_BYTES)
+            self.metrics.write_prometheus(data_file_path('metrics.prom'))
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+    def build_options(self, pipeline):
+        # With several proxies, jobs switch to the one the pool assigns; the first one is only the default.
+        return build_ydl_options(
+            self.work_path, self.download_mode, self.video_format, self.audio_format, self.prefix,
+            self.proxies[0] if self.proxies else '',
+            self.ffmpeg_path, self.video_quality, self.audio_quality, self.extra_params, pipeline=pipeline,
+            on_format=self.format_chosen)
+
+    def format_chosen(self, choice):
+        """Report the streams of a download that could not be kept as they are and will be re-encoded."""
+        job_id = self.pool.acquire().job_id
+        for kind, codec, target in choice.transcodes:
+            self.log(f'[{job_id}] ' + self.get_translation(f'{kind}_transcode', codec=codec or '?', target=target))
+
+    def report_stages(self):
+        if self.stage_update is None:
+            return
+        running, waiting = self.scheduler.queue_depth()
+        postprocess = self.postprocess.depth() if self.postprocess is not None else (0, 0)
+        if self.download_mode == 'subtitles':
+            # Fetching subtitle tracks is downloading, whichever stage it runs in.
+            running, waiting, postprocess = running + postprocess[0], waiting + postprocess[1], (0, 0)
+        self.stage_update({'download': (running, waiting), 'postprocess': postprocess})
+
+    def load_jobs(self):
+        """Return the unfinished jobs of a resumed batch, or plan (and persist) the jobs of a new one."""
+        if self.job_queue is None or self.batch_id is None:
+            return self.plan_jobs()
+        jobs = self.job_queue.load_jobs(self.batch_id)
+        if jobs is not None:
+            self.log(self.get_translation('resume_jobs', count=len(jobs)))
+            return jobs
+        jobs = self.plan_jobs()
+        if self._stop_flag:
+            # Planning was cut short; leave the batch unplanned so a resume plans it again in full.
+            return []
+        self.job_queue.add_jobs(self.batch_id, jobs)
+        return jobs
+
+    def update_job(self, job, state, part_path=None, error=None):
+        job.error = error
+        self.metrics.job_finished(job.job_id, state)
+        if self.job_queue is not None:
+            self.job_queue.update(job, state, part_path=part_path, error=error)
+        else:
+            job.state = state
+            if part_path:
+                job.part_path = part_path
+        if self.job_update is not None:
+            self.job_update(job)
+
+    def plan_jobs(self):
+        """Turn the input URLs into jobs, expanding playlists and dropping duplicates when pre-flight is on."""
+        if not self.preflight:
+            return [DownloadJob(i, url) for i, url in enumerate(self.urls, 1)]
+        self.log(self.get_translation('preflight_start', count=len(self.urls)))
+        start = time.monotonic()
+        result = run_preflight(self.urls, self.preflight_extract, max_workers=min(8, self.scheduler.worker_count * 2),
+                               should_stop=lambda: self._stop_flag, archived=self.is_archived)
+        self.metrics.preflight = time.monotonic() - start
+        if result.archived:
+            self.log(self.get_translation('archive_skipped', count=result.archived))
+        for url, error in result.errors:
+            self.log(self.get_translation('preflight_error', url=url, error=str(error)))
+        self.log(self.get_translation(
+            'preflight_summary', count=len(result.jobs), duplicates=result.duplicates,
+            size=format_bytes(result.total_bytes), unknown=result.unknown_size,
+            duration=format_eta(result.total_duration)))
+        return result.jobs
+
+    def preflight_extract(self, url):
+        context = self.pool.acquire()
+        if self.proxy_pool is None:
+            return self.extract_info(context.ydl, url)
+        proxy = self.proxy_pool.acquire(job=False)
+        context.use_proxy(proxy)
+        try:
+            info = self.extract_info(context.ydl, url)
+        except Exception as e:
+            self.proxy_pool.release(proxy, error=str(e) if is_connection_error(e) else None)
+            raise
+        self.proxy_pool.release(proxy, succeeded=True)
+        return info
+
+    def run_job(self, job):
+        if self._stop_flag:
+            return
+        token = self._tokens.get(job.job_id)
+        if token is not None and token.interrupted:
+            # Cancelled or paused just as a worker took it.
+            if token.paused and not self.scheduler.hold(job, token):
+                self.job_requeued(job)
+            else:
+                self.finish_interrupted(job, token.state)
+            return
+        self.log(self.get_translation('download_start_single', index=job.job_id, url=job.url))
+        if job.part_path and os.path.exists(job.part_path):
+            self.log(f'[{job.job_id}] ' + self.get_translation(
+                'resume_partial', filename=job.part_path, size=format_bytes(os.path.getsize(job.part_path))))
+        self.metrics.job(job.job_id, job.url)
+        if job.part_path:
+            self._part_paths.setdefault(job.job_id, set()).add(job.part_path)
+        self.update_job(job, 'extracting')
+        state, error = 'pending', None
+        try:
+            state, error = self.download_single(job.url, job.job_id, key=job.video_key)
+        finally:
+            self.governor.release(job.job_id)
+            self._read_bytes.pop(job.job_id, None)
+            self._fragments.pop(job.job_id, None)
+            self._job_proxies.pop(job.job_id, None)
+            requeued = state == 'paused' and not self.scheduler.hold(job, self.token(job.job_id))
+            if requeued:
+                self.job_requeued(job)
+            elif state in ('cancelled', 'paused') or (state == 'pending' and self._stop_flag):
+                self.finish_interrupted(job, state)
+            elif state != 'post-processing':
+                # Jobs handed to the post-processing stage are finished by it.
+                self.update_job(job, state, error=error)
+            if state != 'paused':
+                self._part_paths.pop(job.job_id, None)
+            self.progress.submit(ProgressEvent(job.job_id, 'ended'))
+
+    def progress_hook(self, job_id, d):
+        if self.interrupted(job_id):
+            raise StopDownloadException("Download interrupted by user")
+        job = self.jobs_by_id.get(job_id)
+        if job is not None and d.get('status') == 'downloading':
+            part_path = d.get('tmpfilename')
+            if job.state != 'downloading' or (part_path and part_path != job.part_path):
+                self.update_job(job, 'downloading', part_path=part_path)
+                if part_path:
+                    self._part_paths.setdefault(job_id, set()).add(part_path)
+        if d.get('status') == 'downloading':
+            self.progress.submit(ProgressEvent.from_hook(job_id, d))
+            self.throttle(job_id, d)
+        else:
+            self.progress.submit(ProgressEvent.from_hook(job_id, d))
+        if self.fragment_tuner is not None:
+            self.measure_fragments(job_id, d)
+        if self.proxy_pool is not None and d.get('status') == 'finished':
+            nbytes = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            self.proxy_pool.record_transfer(self._job_proxies.get(job_id), nbytes, d.get('elapsed') or 0)
+        self.metrics.progress(job_id, d)
+
+    def measure_fragments(self, job_id, d):
+        """Report the throughput of each finished segmented download to the fragment tuner."""
+        measurement = self._fragments.get(job_id)
+        if measurement is None:
+            return
+        if d.get('status') == 'downloading' and d.get('fragment_count'):
+            measurement['fragments'] = d['fragment_count']
+        elif d.get('status') == 'finished' and measurement.get('fragments'):
+            nbytes = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            elapsed = d.get('elapsed') or 0
+            following = self.fragment_tuner.record(measurement['site'], measurement['concurrency'], nbytes, elapsed)
+            self.log(f'[{job_id}] ' + self.get_translation(
+                'fragment_tuning', fragments=measurement.pop('fragments'), concurrency=measurement['concurrency'],
+                speed=format_bytes(nbytes / elapsed if elapsed else None) + '/s', next=following))
+
+    def throttle(self, job_id, d):
+        """Charge the bytes read since the last progress update to the bandwidth governor, waiting if needed."""
+        name = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        last_name, last_downloaded = self._read_bytes.get(job_id, (None, 0))
+        if name != last_name:
+            # The first update of a file only sets the baseline: a resumed download starts at the partial size.
+            last_downloaded = downloaded
+        elif downloaded < last_downloaded:
+            last_downloaded = 0
+        self._read_bytes[job_id] = (name, downloaded)
+        self.governor.consume(job_id, downloaded - last_downloaded, should_stop=lambda: self.interrupted(job_id))
+
+    def postprocessor_hook(self, job_id, d):
+        # yt-dlp's own post-processors cannot be killed, but are not started any more once a job is interrupted.
+        if self.interrupted(job_id):
+            raise StopDownloadException("Download interrupted by user")
+        if d.get('status') == 'started':
+            self.metrics.postprocess_started(job_id)
+        elif d.get('status') == 'finished':
+            self.metrics.postprocess_finished(job_id)
+        job = self.jobs_by_id.get(job_id)
+        if job is not None and d.get('status') == 'started' and job.state != 'post-processing':
+            self.update_job(job, 'post-processing')
+
+    def open_fragment_tuner(self):
+        try:
+            return FragmentTuner(data_file_path('fragment_tuning.sqlite3'))
+        except sqlite3.Error as e:
+            print(f"Error opening fragment tuning data: {e}")
+            return None
+
+    def tune_fragments(self, ydl, job_id, url, info):
+        """Set the fragment concurrency for this download from what worked best for the site before."""
+        site = f"{info.get('extractor_key') or info.get('ie_key') or 'generic'}:{url_host(url)}".lower()
+        concurrency = self.fragment_tuner.concurrency(site)
+        # yt-dlp reads the option when a download starts, and every worker has its own YoutubeDL.
+        ydl.params['concurrent_fragment_downloads'] = concurrency
+        self._fragments[job_id] = {'site': site, 'concurrency': concurrency}
+
+    def open_archive(self):
+        if not self.use_archive:
+            return None
+        try:
+            return DownloadArchive(data_file_path('download_archive.sqlite3'))
+        except sqlite3.Error as e:
+            print(f"Error opening download archive: {e}")
+            return None
+
+    def is_archived(self, url, key=None):
+        """Tell from the archive alone, without any network access, whether url was already downloaded."""
+        if self.archive is None:
+            return False
+        key = key or archive_key_for_url(url)
+        if not key:
+            return False
+        extractor, _, video_id = key.partition(':')
+        return self.archive.contains(extractor, video_id, self.archive_format)
+
+    def record_download(self, info, path=None):
+        """Archive a finished video with its output path; yt-dlp may have added the entry without the path."""
+        if self.archive is None or not info or info.get('_type', 'video') != 'video':
+            return
+        key = video_key(info)
+        downloads = info.get('requested_downloads')
+        if key and (downloads or path):
+            extractor, _, video_id = key.partition(':')
+            self.archive.add(extractor, video_id, self.archive_format, path or downloads[0].get('filepath'))
+
+    def move_to_destination(self, path, related=()):
+        """Move a finished file out of the staging directory into the save path; return where it is now.
+
+        related are other files of its video (see sidecar_files), which are moved along with it.
+        """
+        if not self.staging_dir:
+            return path
+        return deliver(path, self.work_path, self.path, related)
+
+    def deliver_video(self, info):
+        """Move the downloaded files of a video into the save path, updating their paths in info."""
+        for download in info.get('requested_downloads') or []:
+            if download.get('filepath') and os.path.exists(download['filepath']):
+                download['filepath'] = self.move_to_destination(download['filepath'], sidecar_files(info))
+
+    def postprocess_task(self, job_id, ydl, info):
+        """Return the PostProcessTask that finishes a downloaded video, or None if it is already finished."""
+        sources = [d['filepath'] for d in info.get('requested_downloads') or []
+                   if d.get('filepath') and os.path.exists(d['filepath'])]
+        if not sources:
+            return None
+        if self.download_mode == 'audio':
+            source_ext = os.path.splitext(sources[0])[1][1:].lower()
+            copy = audio_codec_matches(info['requested_downloads'][0].get('acodec'), source_ext, self.audio_format)
+            if copy and source_ext == AUDIO_CODECS.get(self.audio_format, (None, self.audio_format))[1]:
+                return None
+            # A stream already in the right codec is only copied into the right container.
+            # A format selector in the quality field chooses the stream, not the bitrate of the conversion.
+            quality = '' if is_selector(self.audio_quality) else self.audio_quality
+            return PostProcessTask.extract_audio(self.ffmpeg, job_id, sources[0], self.audio_format, quality,
+                                                 copy=copy)
+        output = os.path.splitext(ydl.prepare_filename(info, outtmpl=self.output_template))[0]
+        output += '.' + self.video_format
+        if len(sources) == 1 and os.path.splitext(sources[0])[1][1:].lower() == self.video_format:
+            # A single file in the right container only needs its format id dropped from the name.
+            os.replace(sources[0], output)
+            info['requested_downloads'][0]['filepath'] = output
+            return None
+        return PostProcessTask.merge(self.ffmpeg, job_id, sources, output)
+
+    def queue_postprocessing(self, job_id, ydl, result):
+        """Hand the downloaded videos of a job to the post-processing stage; return the job's new state."""
+        job = self.jobs_by_id[job_id]
+        tasks = []
+        for info in downloaded_videos(result):
+            task = self.postprocess_task(job_id, ydl, info)
+            if task is None:
+                self.deliver_video(info)
+                self.record_download(info)
+            else:
+                tasks.append((task, info))
+        if not tasks:
+            return 'done'
+        self.update_job(job, 'post-processing')
+        self.submit_tasks(job, tasks, self.postprocess_done)
+        return 'post-processing'
+
+    def queue_subtitles(self, job_id, ydl, url, info):
+        """Hand the wanted subtitle tracks of a job's videos to the fetch stage; return the job's new state."""
+        job = self.jobs_by_id[job_id]
+        tasks = []
+        for video_url, video in flatten(url, info, lambda sub_url: self.extract_info(ydl, sub_url),
+                                        lambda: self.interrupted(job_id)):
+            if video.get('_type') in ('url', 'url_transparent'):
+                # A playlist entry that only has its URL yet.
+                video_url = video.get('url') or video_url
+                try:
+                    video = self.extract_info(ydl, video_url)
+                except load_yt_dlp().utils.DownloadError as e:
+                    self.log(f'[{job_id}] ' + self.get_translation('download_error', error=str(e)))
+                    continue
+            tracks = select_tracks(video, self.subtitle_languages, self.auto_subtitles, self.subtitle_format)
+            if not tracks:
+                self.log(f'[{job_id}] ' + self.get_translation('subtitles_not_found', url=video_url))
+                continue
+            path = os.path.splitext(ydl.prepare_filename(video, outtmpl=self.output_template))[0]
+            for language, track, is_automatic in tracks:
+                task = SubtitleTask(job_id, lambda track: self.fetch_subtitle(ydl, track), language, track,
+                                    f'{path}.{language}', is_automatic, self.ffmpeg, self.subtitle_format)
+                tasks.append((task, video))
+        if self.interrupted(job_id):
+            raise StopDownloadException("Download interrupted by user")
+        if not tasks:
+            return 'done'
+        self.update_job(job, 'downloading')
+        self.submit_tasks(job, tasks, self.subtitle_done)
+        return 'post-processing'
+
+    def fetch_subtitle(self, ydl, track):
+        from yt_dlp.networking import Request
+        with ydl.urlopen(Request(track['url'], headers=track.get('http_headers') or {})) as response:
+            return response.read()
+
+    def submit_tasks(self, job, tasks, done):
+        """Queue the (task, info) pairs of a job in the post-processing stage; the last one to finish ends the job."""
+        with self._tasks_lock:
+            # Tasks left, first error, whether any was cancelled, and (info, path) to archive once all succeeded.
+            self._pending_tasks[job.job_id] = [len(tasks), None, False, []]
+        token = self.token(job.job_id)
+        for task, info in tasks:
+            token.on_cancel(lambda task=task: self.postprocess.cancel(task))
+            self.postprocess.submit(task, lambda task, error, info=info: done(job, info, task, error))
+
+    def finished_output(self, task, error, related=()):
+        """Move the output of a successful task (and related files) into the save path; return (its path, error)."""
+        if error or task.cancelled:
+            return task.output, error
+        try:
+            return self.move_to_destination(task.output, related), None
+        except OSError as e:
+            return task.output, self.get_translation('move_error', filename=task.output, error=str(e))
+
+    def postprocess_done(self, job, info, task, error):
+        self.metrics.add_postprocess(job.job_id, task.seconds)
+        output, error = self.finished_output(task, error, sidecar_files(info))
+        if error and not task.cancelled:
+            self.log(f'[{task.job_id}] ' + self.get_translation('postprocess_error', error=error))
+        elif not task.cancelled:
+            self.log(f'[{task.job_id}] ' + self.get_translation('postprocess_completed', filename=output))
+            self.record_download(info, output)
+        self.task_finished(job, task, error)
+
+    def subtitle_done(self, job, info, task, error):
+        output, error = self.finished_output(task, error)
+        if error and not task.cancelled:
+            self.log(f'[{task.job_id}] ' + self.get_translation('subtitle_error', language=task.language, error=error))
+        elif not task.cancelled:
+            key = 'subtitle_saved_automatic' if task.is_automatic else 'subtitle_saved'
+            self.log(f'[{task.job_id}] ' + self.get_translation(key, language=task.language, filename=output))
+            # A video is archived only once all of its languages are there, so a later batch fetches the rest.
+            with self._tasks_lock:
+                self._pending_tasks[job.job_id][3].append((info, output))
+        self.task_finished(job, task, error)
+
+    def task_finished(self, job, task, error):
+        if task.cancelled:
+            error = None
+            if not self.keep_partial:
+                for path in task.inputs:
+                    task.remove(path)
+        with self._tasks_lock:
+            pending = self._pending_tasks[job.job_id]
+            pending[0] -= 1
+            pending[1] = pending[1] or error
+            pending[2] = pending[2] or task.cancelled
+            if pending[0]:
+                return
+            del self._pending_tasks[job.job_id]
+        if pending[2]:
+            token = self._tokens.get(job.job_id)
+            self.finish_interrupted(job, 'cancelled' if token is not None and token.cancelled else 'pending')
+            return
+        if not pending[1]:
+            for info, path in pending[3]:
+                self.record_download(info, path)
+        self.update_job(job, 'failed' if pending[1] else 'done', error=pending[1])
+
+    def open_metadata_cache(self):
+        if not self.metadata_cache_ttl:
+            return None
+        try:
+            return MetadataCache(data_file_path('metadata_cache.sqlite3'), ttl=self.metadata_cache_ttl)
+        except sqlite3.Error as e:
+            print(f"Error opening metadata cache: {e}")
+            return None
+
+    def extract_info(self, ydl, url):
+        """Run the extractor for url without resolving formats, and cache the result."""
+        info = ydl.extract_info(url, download=False, process=False)
+        if self.metadata_cache and is_cacheable(info):
+            self.metadata_cache.put(url, ydl.sanitize_info(info, remove_private_keys=True))
+        return info
+
+    def download_single(self, url, job_id=1, key=None):
+        """Download one URL and return (state, error).
+
+        The state is 'done', 'failed', 'pending' if the batch was stopped, 'cancelled' or 'paused' if the job was,
+        or 'post-processing' if the job was handed to the post-processing stage, which finishes it.
+        With a proxy pool, a download that fails on a connection error is tried again through the next best
+        proxy, continuing from its partial file, up to MAX_PROXY_FAILOVERS times.
+        """
+        if self.is_archived(url, key):
+            # Checked before a proxy is taken: nothing is fetched through it.
+            self.log(f'[{job_id}] ' + self.get_translation('archive_skipped_single', url=url))
+            return 'done', None
+        if self.proxy_pool is None:
+            return self.download_attempt(url, job_id, key)
+        tried = []
+        while True:
+            proxy = self.proxy_pool.acquire(exclude=tried)
+            tried.append(proxy)
+            self._job_proxies[job_id] = proxy
+            self.metrics.proxy_used(job_id, proxy)
+            try:
+                state, error = self.download_attempt(url, job_id, key, proxy)
+            except Exception as e:
+                connection_error = is_connection_error(e)
+                if not connection_error:
+                    # yt-dlp does not always keep the original error: have the proxy checked now, in the
+                    # background, and take it to be the cause if its last check already failed.
+                    self.proxy_pool.check_soon(proxy)
+                proxy_failed = connection_error or not self.proxy_pool.healthy(proxy)
+                self.proxy_pool.release(proxy, error=str(e) if proxy_failed else None)
+                if (not proxy_failed or len(tried) > MAX_PROXY_FAILOVERS or
+                        not self.proxy_pool.available(exclude=tried) or self.interrupted(job_id)):
+                    return self.download_failed(job_id, e)
+                self.log(f'[{job_id}] ' + self.get_translation('proxy_failover', proxy=proxy, error=str(e)))
+                self.metrics.retry(job_id)
+                continue
+            self.proxy_pool.release(proxy, succeeded=state in ('done', 'post-processing'))
+            return state, error
+
+    def download_attempt(self, url, job_id, key, proxy=None):
+        """Download one URL through proxy, if given; errors are then raised for the caller to decide on a failover."""
+        context = self.pool.acquire()
+        context.job_id = job_id
+        if proxy is not None:
+            context.use_proxy(proxy)
+        ydl = context.ydl
+        try:
+            self.metrics.extraction_started(job_id)
+            info = self.metadata_cache.get(url, key) if self.metadata_cache else None
+            from_cache = info is not None
+            if info is None:
+                info = self.extract_info(ydl, url)
+            self.metrics.extraction_finished(job_id)
+            if info is None:
+                return 'failed', None
+            if self.interrupted(job_id):
+                raise StopDownloadException("Download interrupted by user")
+            if self.download_mode == 'subtitles':
+                if from_cache and not has_subtitle_info(info):
+                    # Cached by a batch of another mode, for which the extractor did not list the tracks.
+                    info = self.extract_info(ydl, url)
+                return self.queue_subtitles(job_id, ydl, url, info), None
+            if self.fragment_tuner is not None:
+                self.tune_fragments(ydl, job_id, url, info)
+            self.metrics.download_started(job_id)
+            try:
+                result = ydl.process_ie_result(info, download=True)
+            except load_yt_dlp().utils.DownloadError:
+                if not from_cache:
+                    raise
+                # The cached format URLs may have been revoked early; extract once more and retry.
+                self.metrics.retry(job_id)
+                self.metadata_cache.invalidate(url)
+                result = ydl.process_ie_result(self.extract_info(ydl, url), download=True)
+            finally:
+                self.metrics.download_finished(job_id)
+            if self.postprocess is not None:
+                return self.queue_postprocessing(job_id, ydl, result), None
+            for video in downloaded_videos(result):
+                self.deliver_video(video)
+                self.record_download(video)
+        except StopDownloadException:
+            token = self._tokens.get(job_id)
+            return (token.state if token is not None and token.interrupted else 'pending'), None
+        except Exception as e:
+            if proxy is not None:
+                raise
+            return self.download_failed(job_id, e)
+        return 'done', None
+
+    def download_failed(self, job_id, error):
+        self.log(f'[{job_id}] ' + self.get_translation('download_error', error=str(error)))
+        measurement = self._fragments.get(job_id)
+        if measurement and measurement.get('fragments'):
+            # A segmented download that failed half-way: back off for this site.
+            self.fragment_tuner.record(measurement['site'], measurement['concurrency'], 0, 0, failed=True)
+        return 'failed', str(error)
+
+
+def open_job_queue():
+    try:
+        return JobQueue(data_file_path('job_queue.sqlite3'))
+    except sqlite3.Error as e:
+        print(f"Error opening job queue: {e}")
+        return None
@@ -0,0 +1,228 @@
+"""Choose the formats of a download from its extracted format list, preferring streams that need no re-encoding.
+
+The GUI's quality choices ('1080p', '4K', '320 kbps') are limits rather than yt-dlp format selectors, and the
+output container or audio format decides which codecs can be kept as they are: a stream in a codec the target
+already takes only needs a remux (or nothing), any other one has to be re-encoded by ffmpeg.
+"""
+import re
+
+HEIGHT_LABELS = {'8k': 4320, '4k': 2160, '2k': 1440}
+HEIGHT_PATTERN = re.compile(r'^\s*(\d{3,4})\s*p\d*\s*$', re.IGNORECASE)
+BITRATE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(?:k|kbps|kbit/s|kb/s)?\s*$', re.IGNORECASE)
+
+# Codecs (prefixes of yt-dlp's vcodec/acodec values) each container holds as they are; Matroska holds anything.
+CONTAINER_VIDEO_CODECS = {
+    'mp4': ('avc', 'h264', 'hev', 'hvc', 'h265', 'av01', 'vp09', 'vp9'),
+    'mov': ('avc', 'h264', 'hev', 'hvc', 'h265'),
+    'webm': ('vp8', 'vp09', 'vp9', 'av01'),
+    'flv': ('avc', 'h264'),
+}
+CONTAINER_AUDIO_CODECS = {
+    'mp4': ('mp4a', 'aac', 'mp3', 'opus', 'flac', 'ac-3', 'ec-3'),
+    'mov': ('mp4a', 'aac', 'mp3'),
+    'webm': ('opus', 'vorbis'),
+    'flv': ('mp4a', 'aac', 'mp3'),
+}
+# File extensions of streams whose codec yt-dlp does not report but which fit a container.
+CONTAINER_EXTS = {'mp4': ('mp4', 'm4a', 'm4v'), 'mov': ('mov', 'mp4', 'm4a'), 'webm': ('webm', 'weba'),
+                  'flv': ('flv',)}
+# Codecs that already are an audio format, so extracting the audio is a copy.
+AUDIO_FORMAT_CODECS = {
+    'mp3': ('mp3',), 'aac': ('mp4a', 'aac'), 'm4a': ('mp4a', 'aac'), 'opus': ('opus',), 'vorbis': ('vorbis',),
+    'flac': ('flac',), 'wav': ('pcm',),
+}
+AUDIO_FORMAT_EXTS = {'mp3': ('mp3',), 'aac': ('m4a', 'aac'), 'm4a': ('m4a',), 'opus': ('opus',), 'vorbis': ('ogg',),
+                     'flac': ('flac',), 'wav': ('wav',)}
+
+
+def parse_height(quality):
+    """'1080p' -> 1080, '4K' -> 2160; None for anything else."""
+    quality = (quality or '').strip().lower()
+    if quality in HEIGHT_LABELS:
+        return HEIGHT_LABELS[quality]
+    match = HEIGHT_PATTERN.match(quality)
+    return int(match.group(1)) if match else None
+
+
+def parse_bitrate(quality):
+    """'320 kbps' -> 320.0, '5' (a VBR level) -> 5.0; None for anything else."""
+    match = BITRATE_PATTERN.match(quality or '')
+    return float(match.group(1)) if match else None
+
+
+def is_selector(quality):
+    """Whether a quality is a yt-dlp format selector typed by the user rather than one of the GUI's labels."""
+    return bool((quality or '').strip()) and parse_height(quality) is None and parse_bitrate(quality) is None
+
+
+def video_selector(quality):
+    height = parse_height(quality)
+    if height:
+        return f'bestvideo[height<={height}]/bestvideo'
+    return quality.strip() if quality and quality.strip() else 'bestvideo'
+
+
+def audio_selector(quality):
+    bitrate = parse_bitrate(quality)
+    if bitrate:
+        return f'bestaudio[abr<={bitrate:g}]/bestaudio'
+    return quality.strip() if quality and quality.strip() else 'bestaudio'
+
+
+def _codec(f, kind):
+    return (f.get(kind) or '').lower()
+
+
+def _has(f, kind):
+    return _codec(f, kind) != 'none'
+
+
+def _fits(f, kind, codecs, exts):
+    """Whether the video or audio stream of f can be kept as it is; codecs None means anything fits."""
+    if codecs is None:
+        return True
+    codec = _codec(f, kind)
+    if not codec:
+        return (f.get('ext') or '').lower() in exts
+    return codec.startswith(codecs)
+
+
+def _note(transcodes, stream, f, kind, target):
+    # Only streams of a known codec are reported; the extension alone does not tell whether one can be kept.
+    if _codec(f, kind):
+        transcodes.append((stream, _codec(f, kind), target))
+
+
+def audio_codec_matches(acodec, ext, audio_format):
+    """Whether a downloaded audio stream already is in audio_format, going by its codec or else its extension."""
+    acodec = (acodec or '').lower()
+    if acodec and acodec != 'none':
+        return acodec.startswith(AUDIO_FORMAT_CODECS.get(audio_format, (audio_format,)))
+    return (ext or '').lower() in AUDIO_FORMAT_EXTS.get(audio_format, (audio_format,))
+
+
+class FormatChoice:
+    """The formats picked for one video, and the streams that will have to be re-encoded."""
+
+    def __init__(self, formats, transcodes):
+        self.formats = formats
+        # (kind, codec, target) for every stream that cannot be kept as it is, e.g. ('audio', 'opus', 'mp3').
+        self.transcodes = transcodes
+
+
+class FormatResolver:
+    """A yt-dlp format selector (the 'format' option can be a callable) for the GUI's download modes.
+
+    download_mode is one of download_engine.DOWNLOAD_MODES; container the output container (video modes) and
+    audio_format the output audio format (audio mode). video_quality and audio_quality are the GUI's labels
+    ('' for the best). With split, the video and audio of 'video_audio' are downloaded as separate files for
+    the post-processing stage; otherwise they are merged by yt-dlp, or, when can_merge is false (no ffmpeg),
+    a format that has both is preferred. on_choice(FormatChoice), if given, is called for every selection.
+    """
+
+    def __init__(self, download_mode, container='', audio_format='', video_quality='', audio_quality='',
+                 split=False, can_merge=True, on_choice=None):
+        self.download_mode = download_mode
+        self.container = (container or '').lower()
+        self.audio_format = (audio_format or '').lower()
+        self.height = parse_height(video_quality)
+        self.bitrate = parse_bitrate(audio_quality) if download_mode == 'video_audio' else None
+        self.split = split
+        self.can_merge = can_merge
+        self.on_choice = on_choice
+
+    def __call__(self, ctx):
+        choice = self.choose(ctx.get('formats') or [])
+        if choice.formats and self.on_choice is not None:
+            self.on_choice(choice)
+        yield from choice.formats
+
+    def choose(self, formats):
+        """Return the FormatChoice for a format list sorted worst to best, as yt-dlp passes it."""
+        video_only = [f for f in formats if _has(f, 'vcodec') and not _has(f, 'acodec')]
+        audio_only = [f for f in formats if _has(f, 'acodec') and not _has(f, 'vcodec')]
+        combined = [f for f in formats if _has(f, 'vcodec') and _has(f, 'acodec')]
+        transcodes = []
+        if self.download_mode == 'audio':
+            codecs = AUDIO_FORMAT_CODECS.get(self.audio_format, (self.audio_format,))
+            exts = AUDIO_FORMAT_EXTS.get(self.audio_format, ())
+            audio = self.pick(audio_only or combined, 'acodec', codecs, exts, transcodes, self.audio_format)
+            return FormatChoice([audio] if audio else [], transcodes)
+
+        video_codecs = CONTAINER_VIDEO_CODECS.get(self.container)
+        audio_codecs = CONTAINER_AUDIO_CODECS.get(self.container)
+        exts = CONTAINER_EXTS.get(self.container, ())
+        if self.download_mode == 'video' or (combined and not self.can_merge):
+            # Video only: video-only streams, or a format with both on sites that have nothing else.
+            candidates = (video_only or combined) if self.download_mode == 'video' else combined
+            video = self.pick(self.limit(candidates), 'vcodec', video_codecs, exts, transcodes, self.container)
+            if video and _has(video, 'acodec') and not _fits(video, 'acodec', audio_codecs, exts):
+                _note(transcodes, 'audio', video, 'acodec', self.container)
+            return FormatChoice([video] if video else [], transcodes)
+
+        video = self.pick(self.limit(video_only or combined), 'vcodec', video_codecs, exts, transcodes,
+                          self.container)
+        if video is None:
+            return FormatChoice([], transcodes)
+        if _has(video, 'acodec') or not audio_only:
+            if _has(video, 'acodec') and not _fits(video, 'acodec', audio_codecs, exts):
+                _note(transcodes, 'audio', video, 'acodec', self.container)
+            return FormatChoice([video], transcodes)
+        if not self.can_merge:
+            # The two files share a name but for the extension, so an audio stream of another one is taken.
+            audio_only = [f for f in audio_only if f.get('ext') != video.get('ext')] or audio_only
+        audio = self.pick(self.limit_bitrate(audio_only), 'acodec', audio_codecs, exts, transcodes, self.container,
+                          best_tier=False)
+        if self.split or not self.can_merge:
+            # Without ffmpeg, yt-dlp keeps the two streams as separate files, as it does for 'bestvideo+bestaudio'.
+            return FormatChoice([video, audio], transcodes)
+        return FormatChoice([self.merged(video, audio)], transcodes)
+
+    def limit(self, candidates):
+        """The candidates no taller than the chosen quality, or the smallest one if none is."""
+        if not self.height:
+            return candidates
+        return [f for f in candidates if (f.get('height') or 0) <= self.height] or candidates[:1]
+
+    def limit_bitrate(self, candidates):
+        if not self.bitrate:
+            return candidates
+        return [f for f in candidates if (f.get('abr') or f.get('tbr') or 0) <= self.bitrate] or candidates[:1]
+
+    @staticmethod
+    def pick(candidates, kind, codecs, exts, transcodes, target, best_tier=True):
+        """The best candidate that can be kept as it is, or the best one (noting the transcode) if none can.
+
+        For video, only streams of the best available height are considered for keeping, so a fitting codec never
+        costs resolution; audio streams differ little enough that any fitting one is taken. Among the fitting
+        ones, those already in the target container come first.
+        """
+        if not candidates:
+            return None
+        best = candidates[-1]
+        tier = [f for f in candidates if f.get('height') == best.get('height')] if best_tier else candidates
+        fitting = [f for f in tier if _fits(f, kind, codecs, exts)]
+        if fitting:
+            # A stream already in the target container needs not even a remux.
+            native = [f for f in fitting if (f.get('ext') or '').lower() in exts]
+            return (native or fitting)[-1]
+        _note(transcodes, 'video' if kind == 'vcodec' else 'audio', best, kind, target)
+        return best
+
+    def merged(self, video, audio):
+        """The format dict yt-dlp expects for a video and an audio stream to be downloaded and merged."""
+        return {
+            'requested_formats': [video, audio],
+            'format': f"{video.get('format')}+{audio.get('format')}",
+            'format_id': f"{video.get('format_id')}+{audio.get('format_id')}",
+            'ext': self.container or video.get('ext'),
+            'protocol': f"{video.get('protocol')}+{audio.get('protocol')}",
+            'width': video.get('width'),
+            'height': video.get('height'),
+            'fps': video.get('fps'),
+            'vcodec': video.get('vcodec'),
+            'acodec': audio.get('acodec'),
+            'tbr': (video.get('tbr') or 0) + (audio.get('tbr') or 0) or None,
+            'filesize_approx': ((video.get('filesize') or video.get('filesize_approx') or 0) +
+                                (audio.get('filesize') or audio.get('filesize_approx') or 0)) or None,
+        }
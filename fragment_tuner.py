@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class FragmentTuner:
+    """Pick yt-dlp's concurrent_fragment_downloads for HLS/DASH downloads by hill climbing, per site.
+
+    After every segmented download the achieved throughput is recorded for the concurrency that was used (as a
+    moving average, keyed by extractor and host). The next download of the same site tries one connection more
+    while that keeps paying off by at least `gain`, and otherwise settles on the smallest concurrency within
+    `gain` of the best one seen. A failed download halves the concurrency, as servers that throttle tend to
+    answer too many connections with errors. Measurements older than `max_age` seconds are forgotten, so a
+    changed connection is explored again.
+    """
+
+    def __init__(self, path, initial=4, maximum=16, gain=1.1, smoothing=0.5, max_age=14 * 24 * 3600):
+        self.path = path
+        self.initial = initial
+        self.maximum = maximum
+        self.gain = gain
+        self.smoothing = smoothing
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS fragment_tuning ('
+            'site TEXT PRIMARY KEY, concurrency INTEGER NOT NULL, rates TEXT NOT NULL, updated REAL NOT NULL)')
+        self._conn.commit()
+
+    def concurrency(self, site):
+        """Return the concurrency to use for the next segmented download from site."""
+        with self._lock:
+            row = self._load(site)
+        return row[0] if row else self.initial
+
+    def record(self, site, concurrency, nbytes, seconds, failed=False):
+        """Record a finished download and choose the concurrency of the next one; returns the new value."""
+        with self._lock:
+            row = self._load(site)
+            rates = row[1] if row else {}
+            if failed:
+                following = max(1, concurrency // 2)
+            elif seconds > 0 and nbytes > 0:
+                rate = nbytes / seconds
+                old = rates.get(concurrency)
+                rates[concurrency] = rate if old is None else old + self.smoothing * (rate - old)
+                following = self._next(concurrency, rates)
+            else:
+                return row[0] if row else self.initial
+            self._conn.execute(
+                'INSERT OR REPLACE INTO fragment_tuning (site, concurrency, rates, updated) VALUES (?, ?, ?, ?)',
+                (site, following, json.dumps({str(n): r for n, r in rates.items()}), time.time()))
+            self._conn.commit()
+            return following
+
+    def _next(self, current, rates):
+        above, below = current + 1, current - 1
+        if (above <= self.maximum and above not in rates and
+                (below not in rates or rates[current] >= rates[below] * self.gain)):
+            # Still climbing: more connections gave more throughput, or there is nothing to compare with yet.
+            return above
+        if below >= 1 and below not in rates and above in rates and rates[above] < rates[current] * self.gain:
+            return below
+        candidates = [n for n in (below, current, above) if n in rates]
+        best = max(rates[n] for n in candidates)
+        # Prefer fewer connections unless more are clearly faster.
+        return min(n for n in candidates if rates[n] * self.gain >= best)
+
+    def _load(self, site):
+        row = self._conn.execute(
+            'SELECT concurrency, rates, updated FROM fragment_tuning WHERE site = ?', (site,)).fetchone()
+        if row is None or time.time() - row[2] > self.max_age:
+            return None
+        try:
+            rates = {int(n): float(r) for n, r in json.loads(row[1]).items()}
+        except (ValueError, TypeError, AttributeError):
+            return None
+        return max(1, min(self.maximum, row[0])), rates
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,120 @@
+import json
+import sqlite3
+import threading
+import time
+
+from job_scheduler import DownloadJob
+
+JOB_STATES = ('pending', 'extracting', 'downloading', 'post-processing', 'paused', 'done', 'failed', 'cancelled')
+# Jobs left in one of these states were interrupted and are picked up again on resume.
+UNFINISHED_STATES = ('pending', 'extracting', 'downloading', 'post-processing', 'paused')
+
+
+class JobQueue:
+    """Durable record of download batches and the state of each of their jobs.
+
+    Every state change is committed straight away (SQLite WAL, synchronous=FULL), so after a crash or
+    reboot the unfinished jobs of a batch, and the partial files they left behind, can be picked up again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS batches ('
+            '  id INTEGER PRIMARY KEY, settings TEXT NOT NULL, status TEXT NOT NULL, created REAL NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            '  id INTEGER PRIMARY KEY, batch_id INTEGER NOT NULL REFERENCES batches (id), '
+            '  position INTEGER NOT NULL, url TEXT NOT NULL, video_key TEXT, title TEXT, '
+            '  state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, part_path TEXT, error TEXT, '
+            '  updated REAL NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS jobs_batch_state ON jobs (batch_id, state);')
+        self._conn.commit()
+
+    def create_batch(self, settings):
+        """Store the settings of a new batch and return its id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO batches (settings, status, created) VALUES (?, ?, ?)',
+                (json.dumps(settings, ensure_ascii=False), 'active', time.time()))
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def batch_settings(self, batch_id):
+        with self._lock:
+            row = self._conn.execute('SELECT settings FROM batches WHERE id = ?', (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def unfinished_batches(self):
+        """Return the ids of batches that were interrupted before all their jobs finished, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM batches WHERE status = 'active' ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def finish_batch(self, batch_id, status='done'):
+        with self._lock:
+            self._conn.execute('UPDATE batches SET status = ? WHERE id = ?', (status, batch_id))
+            self._conn.commit()
+
+    def add_jobs(self, batch_id, jobs):
+        """Persist the planned jobs of a batch and set their queue_id."""
+        now = time.time()
+        with self._lock:
+            for job in jobs:
+                cursor = self._conn.execute(
+                    'INSERT INTO jobs (batch_id, position, url, video_key, title, state, updated) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (batch_id, job.job_id, job.url, job.video_key, job.title, 'pending', now))
+                job.queue_id = cursor.lastrowid
+            self._conn.commit()
+
+    def load_jobs(self, batch_id):
+        """Return the unfinished jobs of a batch in their original order; None if it was never planned."""
+        with self._lock:
+            planned = self._conn.execute('SELECT 1 FROM jobs WHERE batch_id = ? LIMIT 1', (batch_id,)).fetchone()
+            if planned is None:
+                return None
+            rows = self._conn.execute(
+                'SELECT id, position, url, video_key, title, state, attempts, part_path FROM jobs '
+                f"WHERE batch_id = ? AND state IN ({', '.join('?' * len(UNFINISHED_STATES))}) ORDER BY position",
+                (batch_id, *UNFINISHED_STATES)).fetchall()
+        jobs = []
+        for queue_id, position, url, video_key, title, state, attempts, part_path in rows:
+            job = DownloadJob(position, url)
+            job.queue_id = queue_id
+            job.video_key = video_key
+            job.title = title
+            job.attempts = attempts
+            job.part_path = part_path
+            job.state = 'pending'
+            jobs.append(job)
+        return jobs
+
+    def update(self, job, state, part_path=None, error=None):
+        """Record a job's new state; starting extraction counts as a new attempt."""
+        job.state = state
+        if part_path:
+            job.part_path = part_path
+        if state == 'extracting':
+            job.attempts += 1
+        if job.queue_id is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, attempts = ?, part_path = ?, error = ?, updated = ? WHERE id = ?',
+                (state, job.attempts, job.part_path, error, time.time(), job.queue_id))
+            self._conn.commit()
+
+    def counts(self, batch_id):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT state, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY state', (batch_id,)).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,226 @@
+import threading
+from urllib.parse import urlsplit
+
+
+def url_host(url):
+    """Return the host a URL points at, used to group jobs per site."""
+    host = (urlsplit(url.strip()).hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+
+class DownloadJob:
+    """A single URL queued for download."""
+
+    def __init__(self, job_id, url):
+        self.job_id = job_id
+        self.url = url
+        self.host = url_host(url)
+        # Filled in by the pre-flight stage when it is known.
+        self.title = None
+        self.video_key = None
+        self.duration = None
+        self.filesize = None
+        # Maintained by the job queue.
+        self.queue_id = None
+        self.state = 'pending'
+        self.attempts = 0
+        self.part_path = None
+        self.error = None
+
+    def __repr__(self):
+        return f'DownloadJob({self.job_id!r}, {self.url!r})'
+
+
+class CancelToken:
+    """Cancel or pause request for one job, checked by the engine at every progress update.
+
+    Callbacks registered with on_cancel() (e.g. terminating an ffmpeg process) run when the job is
+    cancelled, right away if it already is; a pause only takes effect at the next check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = None
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self.state == 'cancelled'
+
+    @property
+    def paused(self):
+        return self.state == 'paused'
+
+    @property
+    def interrupted(self):
+        return self.state is not None
+
+    def cancel(self):
+        with self._lock:
+            self.state = 'cancelled'
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def pause(self):
+        with self._lock:
+            if self.state is None:
+                self.state = 'paused'
+
+    def resume(self):
+        with self._lock:
+            if self.state == 'paused':
+                self.state = None
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class JobScheduler:
+    """Run jobs on a fixed number of worker threads, optionally capping concurrent jobs per host.
+
+    Paused jobs are held back (hold(), hold_pending()) until release() queues them again; the batch is not over
+    while any are held. on_change(), if given, is called (outside the lock) whenever a job starts or finishes.
+    """
+
+    def __init__(self, worker_count=1, per_host_limit=0, on_change=None):
+        self.worker_count = max(1, int(worker_count or 1))
+        self.per_host_limit = max(0, int(per_host_limit or 0))
+        self.on_change = on_change
+        self._cond = threading.Condition()
+        self._pending = []
+        self._held = {}
+        self._active_hosts = {}
+        self._active = 0
+        self._stopped = False
+
+    def stop(self):
+        """Stop handing out new jobs; jobs already running are left to the handler."""
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._held.clear()
+            self._cond.notify_all()
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def queue_depth(self):
+        """Return (running, waiting) job counts."""
+        with self._cond:
+            return self._active, len(self._pending)
+
+    def _pop_pending(self, job_id):
+        for i, job in enumerate(self._pending):
+            if job.job_id == job_id:
+                return self._pending.pop(i)
+        return None
+
+    def remove(self, job_id):
+        """Drop a job that has not started yet or is held; return it, or None if it is not waiting."""
+        with self._cond:
+            job = self._pop_pending(job_id) or self._held.pop(job_id, None)
+            self._cond.notify_all()
+        if job is not None:
+            self._changed()
+        return job
+
+    def hold(self, job, token):
+        """Keep a job that was paused while it ran until it is released; return False if it was resumed instead.
+
+        A job whose token was resumed in the meantime (before release() could find it here) is queued again,
+        ahead of the others.
+        """
+        with self._cond:
+            if token.paused:
+                if not self._stopped:
+                    self._held[job.job_id] = job
+                return True
+            if not self._stopped:
+                self._pending.insert(0, job)
+                self._cond.notify_all()
+        self._changed()
+        return False
+
+    def hold_pending(self, job_id):
+        """Hold back a job that has not started yet; return whether it was waiting."""
+        with self._cond:
+            job = self._pop_pending(job_id)
+            if job is not None:
+                self._held[job_id] = job
+        if job is not None:
+            self._changed()
+        return job is not None
+
+    def release(self, job_id):
+        """Queue a held job again, ahead of the others; return whether it was held."""
+        with self._cond:
+            job = self._held.pop(job_id, None)
+            if job is not None:
+                self._pending.insert(0, job)
+                self._cond.notify_all()
+        if job is not None:
+            self._changed()
+        return job is not None
+
+    def run(self, jobs, handler):
+        """Call handler(job) for every job and block until all of them are done or stop() is called."""
+        with self._cond:
+            self._pending = list(jobs)
+            if not self._pending:
+                return
+            worker_count = min(self.worker_count, len(self._pending))
+        workers = [
+            threading.Thread(target=self._work, args=(handler,), name=f'download-worker-{i}', daemon=True)
+            for i in range(worker_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def _host_available(self, host):
+        return not self.per_host_limit or self._active_hosts.get(host, 0) < self.per_host_limit
+
+    def _take_job(self):
+        """Pop the first pending job whose host is below its cap, or None. Caller holds the lock."""
+        for i, job in enumerate(self._pending):
+            if self._host_available(job.host):
+                return self._pending.pop(i)
+        return None
+
+    def _work(self, handler):
+        while True:
+            with self._cond:
+                job = None
+                while job is None:
+                    if self._stopped or not (self._pending or self._held):
+                        return
+                    job = self._take_job()
+                    if job is None:
+                        # Every pending job targets a host that is at its cap, or the rest are paused.
+                        self._cond.wait()
+                self._active += 1
+                self._active_hosts[job.host] = self._active_hosts.get(job.host, 0) + 1
+            self._changed()
+            try:
+                handler(job)
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._active_hosts[job.host] -= 1
+                    if not self._active_hosts[job.host]:
+                        del self._active_hosts[job.host]
+                    self._cond.notify_all()
+                self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
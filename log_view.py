@@ -0,0 +1,71 @@
+import logging
+import logging.handlers
+import time
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QPlainTextEdit
+
+
+class LogView(QPlainTextEdit):
+    """Read-only log widget that keeps only the newest max_lines lines and appends in batches once per frame.
+
+    Every line is also written to a rotating log file, so lines that scroll out of the widget are not lost.
+    """
+
+    def __init__(self, max_lines=5000, log_file=None, flush_interval=16, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.max_lines = max_lines
+        self.setMaximumBlockCount(max_lines)
+        self._pending = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_interval)
+        self._flush_timer.timeout.connect(self.flush)
+        self._file_log = None
+        if log_file:
+            self._file_log = _rotating_logger(log_file)
+
+    def set_max_lines(self, max_lines):
+        self.max_lines = max(100, int(max_lines))
+        self.setMaximumBlockCount(self.max_lines)
+
+    def append(self, text):
+        """Queue a line; queued lines are added together on the next flush."""
+        self._pending.append(text)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        if self._file_log:
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._file_log.info('\n'.join(f'{stamp} {line}' for line in lines))
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        # Lines beyond the cap would be evicted straight away, so don't lay them out at all.
+        self.appendPlainText('\n'.join(lines[-self.max_lines:]))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def clear(self):
+        self.flush()
+        super().clear()
+
+
+def _rotating_logger(log_file, max_bytes=5 * 1024 * 1024, backup_count=3):
+    logger = logging.getLogger(f'{__name__}.{log_file}')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        try:
+            handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        except OSError as e:
+            print(f"Error opening log file {log_file}: {e}")
+            return None
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    return logger
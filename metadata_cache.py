@@ -0,0 +1,140 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qs, urlsplit
+
+from url_intake import canonical_url
+
+
+def normalize_url(url):
+    """Normalise a URL for use as a cache key, so that equivalent links (see url_intake) share one entry."""
+    return canonical_url(url)
+
+
+def video_key(info):
+    """Return 'extractor:id' for an info dict, or None when the extractor did not report an id."""
+    extractor = info.get('extractor_key') or info.get('ie_key') or info.get('extractor')
+    if extractor and info.get('id'):
+        return f"{extractor.lower()}:{info['id']}"
+    return None
+
+
+def is_cacheable(info):
+    """Only plain, finished videos are cached; playlists, live streams and lazily built fragment lists are not."""
+    if not isinstance(info, dict) or info.get('_type', 'video') != 'video':
+        return False
+    if info.get('is_live') or info.get('live_status') in ('is_live', 'is_upcoming'):
+        return False
+    return not any(callable(f.get('fragments')) for f in info.get('formats') or [])
+
+
+def formats_expire_at(info):
+    """Return the earliest expiry time announced by the format URLs (e.g. '?expire=...'), or None."""
+    expires = []
+    for fmt in info.get('formats') or []:
+        url = fmt.get('url')
+        if not url:
+            continue
+        value = parse_qs(urlsplit(url).query).get('expire')
+        if value and value[0].isdigit():
+            expires.append(int(value[0]))
+    return min(expires) if expires else None
+
+
+class MetadataCache:
+    """On-disk cache of extracted info dicts, keyed by normalised URL and by extractor + video id.
+
+    Entries expire after `ttl` seconds, or earlier when their format URLs are about to expire. When the
+    stored data grows beyond `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_bytes=200 * 1024 * 1024, expiry_margin=300):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.expiry_margin = expiry_margin
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS info ('
+            'url TEXT PRIMARY KEY, video_key TEXT, data BLOB NOT NULL, size INTEGER NOT NULL, '
+            'expires REAL NOT NULL, accessed REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS info_video_key ON info (video_key)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS info_accessed ON info (accessed)')
+        self._conn.commit()
+
+    def get(self, url, key=None):
+        """Return the cached info dict for url (or for the 'extractor:id' key), or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, data, expires FROM info WHERE url = ?', (normalize_url(url),)).fetchone()
+            if row is None and key:
+                row = self._conn.execute(
+                    'SELECT url, data, expires FROM info WHERE video_key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[2] <= now:
+                self._conn.execute('DELETE FROM info WHERE url = ?', (row[0],))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE info SET accessed = ? WHERE url = ?', (now, row[0]))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[1]))
+
+    def put(self, url, info):
+        """Store a sanitised (JSON serialisable) info dict for url."""
+        if not is_cacheable(info):
+            return
+        now = time.time()
+        expires = now + self.ttl
+        formats_expire = formats_expire_at(info)
+        if formats_expire is not None:
+            expires = min(expires, formats_expire - self.expiry_margin)
+        if expires <= now:
+            return
+        data = zlib.compress(json.dumps(info, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO info (url, video_key, data, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (normalize_url(url), video_key(info), data, len(data), expires, now))
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, url):
+        with self._lock:
+            self._conn.execute('DELETE FROM info WHERE url = ?', (normalize_url(url),))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes."""
+        self._conn.execute('DELETE FROM info WHERE expires <= ?', (time.time(),))
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM info').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for url, size in self._conn.execute('SELECT url, size FROM info ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+            victims.append((url,))
+            total -= size
+        self._conn.executemany('DELETE FROM info WHERE url = ?', victims)
@@ -0,0 +1,225 @@
+import json
+import os
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+PHASES = ('extract', 'ttfb', 'download', 'postprocess')
+# metrics.jsonl is renamed to metrics.jsonl.1 once it grows beyond this size.
+MAX_JSONL_BYTES = 5 * 1024 * 1024
+
+
+@dataclass
+class JobMetrics:
+    """Timings (seconds) and counters of one job; ttfb is measured from the start of the download."""
+    job_id: int
+    url: str
+    state: str = 'pending'
+    extract: Optional[float] = None
+    ttfb: Optional[float] = None
+    download: Optional[float] = None
+    postprocess: Optional[float] = None
+    bytes: int = 0
+    peak_speed: Optional[float] = None
+    retries: int = 0
+    proxy: Optional[str] = None
+
+    @property
+    def average_speed(self):
+        return self.bytes / self.download if self.download else None
+
+    def to_dict(self):
+        return {**asdict(self), 'average_speed': self.average_speed}
+
+
+class MetricsRecorder:
+    """Collect JobMetrics for a batch from the engine's worker threads, and export them.
+
+    The engine calls the *_started/*_finished pairs around each phase and progress() with yt-dlp's progress
+    hook dicts; summary() aggregates the batch.
+    """
+
+    def __init__(self, batch_id=None):
+        self.batch_id = batch_id
+        self.yt_dlp_version = None
+        self.started = time.time()
+        self.finished = None
+        self.preflight = None
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._marks = {}
+
+    def job(self, job_id, url=''):
+        with self._lock:
+            metrics = self._jobs.get(job_id)
+            if metrics is None:
+                metrics = self._jobs[job_id] = JobMetrics(job_id, url)
+            return metrics
+
+    def jobs(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda m: m.job_id)
+
+    def _start(self, job_id, phase):
+        with self._lock:
+            self._marks[job_id, phase] = time.monotonic()
+
+    def _finish(self, job_id, phase, end=None):
+        """Add the time since the matching _start to the phase; repeated phases (e.g. video, then audio) add up."""
+        with self._lock:
+            start = self._marks.pop((job_id, phase), None)
+            metrics = self._jobs.get(job_id)
+            if start is None or metrics is None:
+                return
+            setattr(metrics, phase, (getattr(metrics, phase) or 0.0) + (end or time.monotonic()) - start)
+
+    def extraction_started(self, job_id):
+        self._start(job_id, 'extract')
+
+    def extraction_finished(self, job_id):
+        self._finish(job_id, 'extract')
+
+    def download_started(self, job_id):
+        now = time.monotonic()
+        with self._lock:
+            self._marks[job_id, 'download'] = now
+            self._marks[job_id, 'ttfb'] = now
+
+    def download_finished(self, job_id):
+        # yt-dlp's own post-processing runs before process_ie_result() returns; it is not download time.
+        with self._lock:
+            end = self._marks.pop((job_id, 'download_end'), None)
+            self._marks.pop((job_id, 'ttfb'), None)
+        self._finish(job_id, 'download', end)
+
+    def progress(self, job_id, d):
+        status = d.get('status')
+        with self._lock:
+            metrics = self._jobs.get(job_id)
+            if metrics is None:
+                return
+            if status == 'downloading':
+                if d.get('speed') and (metrics.peak_speed is None or d['speed'] > metrics.peak_speed):
+                    metrics.peak_speed = d['speed']
+                start = self._marks.get((job_id, 'ttfb'))
+                if start is not None and d.get('downloaded_bytes') and metrics.ttfb is None:
+                    metrics.ttfb = time.monotonic() - start
+            elif status == 'finished':
+                metrics.bytes += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                self._marks[job_id, 'download_end'] = time.monotonic()
+
+    def postprocess_started(self, job_id):
+        self._start(job_id, 'postprocess')
+
+    def postprocess_finished(self, job_id):
+        self._finish(job_id, 'postprocess')
+
+    def add_postprocess(self, job_id, seconds):
+        with self._lock:
+            metrics = self._jobs.get(job_id)
+            if metrics is not None:
+                metrics.postprocess = (metrics.postprocess or 0.0) + seconds
+
+    def retry(self, job_id):
+        with self._lock:
+            metrics = self._jobs.get(job_id)
+            if metrics is not None:
+                metrics.retries += 1
+
+    def proxy_used(self, job_id, proxy):
+        with self._lock:
+            metrics = self._jobs.get(job_id)
+            if metrics is not None:
+                metrics.proxy = proxy
+
+    def job_finished(self, job_id, state):
+        with self._lock:
+            metrics = self._jobs.get(job_id)
+            if metrics is not None:
+                metrics.state = state
+
+    def finish(self):
+        self.finished = time.time()
+
+    def summary(self):
+        """Aggregate the batch: job counts per state, totals and, per phase, the total, median and maximum."""
+        jobs = self.jobs()
+        end = self.finished or time.time()
+        states = {}
+        for metrics in jobs:
+            states[metrics.state] = states.get(metrics.state, 0) + 1
+        total_bytes = sum(m.bytes for m in jobs)
+        download_seconds = sum(m.download or 0.0 for m in jobs)
+        phases = {}
+        for phase in PHASES:
+            values = [getattr(m, phase) for m in jobs if getattr(m, phase) is not None]
+            phases[phase] = {
+                'count': len(values), 'total': sum(values),
+                'median': statistics.median(values) if values else None, 'max': max(values) if values else None,
+            }
+        peaks = [m.peak_speed for m in jobs if m.peak_speed]
+        return {
+            'batch_id': self.batch_id, 'yt_dlp_version': self.yt_dlp_version, 'started': self.started,
+            'seconds': end - self.started, 'preflight': self.preflight, 'jobs': len(jobs), 'states': states,
+            'bytes': total_bytes, 'retries': sum(m.retries for m in jobs), 'phases': phases,
+            'average_speed': total_bytes / download_seconds if download_seconds else None,
+            'peak_speed': max(peaks) if peaks else None,
+        }
+
+    def jsonl_lines(self):
+        """One JSON object per job, then one for the whole batch."""
+        lines = [json.dumps({'type': 'job', 'batch_id': self.batch_id, 'started': self.started, **m.to_dict()},
+                            ensure_ascii=False) for m in self.jobs()]
+        lines.append(json.dumps({'type': 'batch', **self.summary()}, ensure_ascii=False))
+        return lines
+
+    def write_jsonl(self, path, append=True, max_bytes=0):
+        if append and max_bytes and os.path.exists(path) and os.path.getsize(path) > max_bytes:
+            os.replace(path, path + '.1')
+        with open(path, 'a' if append else 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.jsonl_lines()) + '\n')
+
+    def prometheus_text(self):
+        """The batch summary in the Prometheus text exposition format (e.g. for node_exporter's textfile collector)."""
+        summary = self.summary()
+        labels = f'batch="{summary["batch_id"] or ""}",yt_dlp_version="{summary["yt_dlp_version"] or ""}"'
+        lines = [
+            '# HELP ytdlp_gui_batch_info Batch the metrics below belong to.',
+            '# TYPE ytdlp_gui_batch_info gauge',
+            f'ytdlp_gui_batch_info{{{labels}}} 1',
+            '# HELP ytdlp_gui_batch_duration_seconds Wall time of the batch.',
+            '# TYPE ytdlp_gui_batch_duration_seconds gauge',
+            f'ytdlp_gui_batch_duration_seconds {summary["seconds"]:.3f}',
+            '# HELP ytdlp_gui_jobs Jobs of the batch by final state.',
+            '# TYPE ytdlp_gui_jobs gauge',
+        ]
+        lines += [f'ytdlp_gui_jobs{{state="{state}"}} {count}' for state, count in sorted(summary['states'].items())]
+        lines += [
+            '# HELP ytdlp_gui_downloaded_bytes Bytes downloaded by the batch.',
+            '# TYPE ytdlp_gui_downloaded_bytes gauge',
+            f'ytdlp_gui_downloaded_bytes {summary["bytes"]}',
+            '# HELP ytdlp_gui_retries Retries reported by yt-dlp during the batch.',
+            '# TYPE ytdlp_gui_retries gauge',
+            f'ytdlp_gui_retries {summary["retries"]}',
+            '# HELP ytdlp_gui_speed_bytes_per_second Average and peak download speed of the batch.',
+            '# TYPE ytdlp_gui_speed_bytes_per_second gauge',
+            f'ytdlp_gui_speed_bytes_per_second{{kind="average"}} {summary["average_speed"] or 0:.1f}',
+            f'ytdlp_gui_speed_bytes_per_second{{kind="peak"}} {summary["peak_speed"] or 0:.1f}',
+            '# HELP ytdlp_gui_phase_seconds Time the jobs spent in each phase.',
+            '# TYPE ytdlp_gui_phase_seconds summary',
+        ]
+        for phase, values in summary['phases'].items():
+            if values['count']:
+                lines.append(f'ytdlp_gui_phase_seconds{{phase="{phase}",quantile="0.5"}} {values["median"]:.3f}')
+                lines.append(f'ytdlp_gui_phase_seconds{{phase="{phase}",quantile="1"}} {values["max"]:.3f}')
+            lines.append(f'ytdlp_gui_phase_seconds_sum{{phase="{phase}"}} {values["total"]:.3f}')
+            lines.append(f'ytdlp_gui_phase_seconds_count{{phase="{phase}"}} {values["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
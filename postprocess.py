@@ -0,0 +1,256 @@
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ffmpeg audio encoder and file extension for every audio format the GUI offers.
+AUDIO_CODECS = {
+    'mp3': ('libmp3lame', 'mp3'),
+    'aac': ('aac', 'm4a'),
+    'm4a': ('aac', 'm4a'),
+    'opus': ('libopus', 'opus'),
+    'vorbis': ('libvorbis', 'ogg'),
+    'flac': ('flac', 'flac'),
+    'wav': ('pcm_s16le', 'wav'),
+}
+LOSSLESS_AUDIO = ('flac', 'wav')
+# Audio encoder to fall back to when a container cannot take the downloaded audio stream as it is.
+CONTAINER_AUDIO = {'webm': 'libopus', 'mkv': 'copy', 'mp4': 'aac', 'mov': 'aac', 'flv': 'aac'}
+# Video encoder to fall back to when a container cannot take the downloaded video stream either.
+CONTAINER_VIDEO = {'webm': 'libvpx-vp9', 'mkv': 'copy', 'mp4': 'libx264', 'mov': 'libx264', 'flv': 'libx264'}
+
+
+def find_ffmpeg(ffmpeg_path=''):
+    """Return the ffmpeg executable to use (ffmpeg_path may be the program or its directory), or None."""
+    if ffmpeg_path:
+        if os.path.isdir(ffmpeg_path):
+            ffmpeg_path = os.path.join(ffmpeg_path, 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg')
+        return ffmpeg_path if os.path.isfile(ffmpeg_path) else None
+    return shutil.which('ffmpeg')
+
+
+def audio_quality_args(codec, quality):
+    """Turn '192', '192 kbps' or a VBR level such as '5' into ffmpeg quality options."""
+    match = re.match(r'\s*(\d+(?:\.\d+)?)', quality or '')
+    if codec in LOSSLESS_AUDIO or not match:
+        return []
+    value = float(match.group(1))
+    if value <= 10:
+        return ['-q:a', f'{value:g}']
+    return ['-b:a', f'{int(value)}k']
+
+
+def temp_path(path):
+    base, ext = os.path.splitext(path)
+    return f'{base}.temp{ext}'
+
+
+class PostProcessTask:
+    """Turn downloaded files into the final output file with ffmpeg.
+
+    commands are alternatives, tried in order until one succeeds (e.g. stream copy first, then re-encoding the
+    audio). Each writes to a temporary file that replaces `output` once it is complete; the inputs are
+    deleted afterwards. cancel() terminates the running ffmpeg process from another thread.
+    """
+
+    def __init__(self, job_id, output, inputs, commands):
+        self.job_id = job_id
+        self.output = output
+        self.inputs = inputs
+        self.commands = commands
+        # How long run() took.
+        self.seconds = 0.0
+        self.cancelled = False
+        self._process = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def extract_audio(cls, ffmpeg, job_id, source, audio_format, quality, copy=False):
+        """Convert the audio of source to audio_format; with copy, the stream already is and is only remuxed."""
+        codec, ext = AUDIO_CODECS.get(audio_format, (audio_format, audio_format))
+        output = os.path.splitext(source)[0] + '.' + ext
+        if output == source:
+            output = os.path.splitext(source)[0] + '.audio.' + ext
+        base = [ffmpeg, '-y', '-loglevel', 'error', '-i', source, '-vn']
+        encode = base + ['-c:a', codec, *audio_quality_args(audio_format, quality), temp_path(output)]
+        # Should the container not take the stream after all, it is encoded as usual.
+        commands = [base + ['-c:a', 'copy', temp_path(output)], encode] if copy else [encode]
+        return cls(job_id, output, [source], commands)
+
+    @classmethod
+    def merge(cls, ffmpeg, job_id, sources, output):
+        """Mux the video of the first source with the audio of the last one, without re-encoding if possible."""
+        ext = os.path.splitext(output)[1][1:].lower()
+        if len(sources) == 1:
+            inputs = ['-i', sources[0]]
+            maps = ['-map', '0']
+        else:
+            inputs = ['-i', sources[0], '-i', sources[-1]]
+            maps = ['-map', '0:v:0', '-map', f'{len(sources) - 1}:a:0?']
+        base = [ffmpeg, '-y', '-loglevel', 'error', *inputs, *maps]
+        commands = [base + ['-c', 'copy', temp_path(output)]]
+        fallback_audio = CONTAINER_AUDIO.get(ext, 'aac')
+        if fallback_audio != 'copy':
+            commands.append(base + ['-c:v', 'copy', '-c:a', fallback_audio, temp_path(output)])
+        fallback_video = CONTAINER_VIDEO.get(ext, 'libx264')
+        if fallback_video != 'copy':
+            commands.append(base + ['-c:v', fallback_video, '-c:a', fallback_audio, temp_path(output)])
+        return cls(job_id, output, list(sources), commands)
+
+    def run(self):
+        """Run the commands; return None on success or the error message of the last attempt."""
+        error = None
+        creationflags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        for command in self.commands:
+            with self._lock:
+                if self.cancelled:
+                    break
+                try:
+                    # In a session of its own, so cancel() can also end anything ffmpeg (or a wrapper script) starts.
+                    process = self._process = subprocess.Popen(
+                        command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                        creationflags=creationflags, start_new_session=sys.platform != 'win32')
+                except OSError as e:
+                    return str(e)
+            _, stderr = process.communicate()
+            with self._lock:
+                self._process = None
+            if process.returncode == 0 or self.cancelled:
+                break
+            lines = stderr.decode('utf-8', 'replace').strip().splitlines()
+            error = lines[-1] if lines else f'ffmpeg exited with {process.returncode}'
+        else:
+            self.remove(temp_path(self.output))
+            return error
+        if self.cancelled:
+            self.remove(temp_path(self.output))
+            return 'cancelled'
+        os.replace(temp_path(self.output), self.output)
+        for path in self.inputs:
+            if path != self.output:
+                self.remove(path)
+        return None
+
+    def cancel(self):
+        """Stop the task: terminate ffmpeg if it is running, and do not start any further command."""
+        with self._lock:
+            self.cancelled = True
+            if self._process is not None and self._process.poll() is None:
+                if sys.platform == 'win32':
+                    self._process.terminate()
+                else:
+                    try:
+                        os.killpg(self._process.pid, signal.SIGTERM)
+                    except OSError:
+                        pass
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class PostProcessStage:
+    """Second pipeline stage: convert and merge finished downloads while the next ones are downloading.
+
+    Up to `workers` tasks (one ffmpeg process each, by default one per CPU) run at a time; the rest wait in
+    the queue. on_change(), if given, is called whenever the queue depth changes.
+    """
+
+    def __init__(self, workers=None, on_change=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.on_change = on_change
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='postprocess')
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = 0
+        self._futures = {}
+        self._tasks = set()
+
+    def depth(self):
+        """Return (running, waiting) task counts."""
+        with self._lock:
+            return self._running, self._waiting
+
+    def submit(self, task, done):
+        """Queue task; done(task, error) is called from the worker thread when it has finished."""
+        with self._lock:
+            self._waiting += 1
+        self._changed()
+        future = self._executor.submit(self._run, task, done)
+        with self._lock:
+            self._futures[future] = (task, done)
+        future.add_done_callback(self._discard)
+
+    def cancel_pending(self):
+        """Drop the tasks that have not started yet; their done() callbacks are called right away."""
+        with self._lock:
+            queued = list(self._futures.items())
+        cancelled = [(task, done) for future, (task, done) in queued if future.cancel()]
+        if not cancelled:
+            return
+        with self._lock:
+            self._waiting -= len(cancelled)
+        self._changed()
+        for task, done in cancelled:
+            task.cancel()
+            done(task, 'cancelled')
+
+    def cancel(self, task):
+        """Cancel one task: drop it if it has not started (done() is called right away), else stop its ffmpeg."""
+        task.cancel()
+        with self._lock:
+            found = [(future, done) for future, (queued, done) in self._futures.items() if queued is task]
+        for future, done in found:
+            if future.cancel():
+                with self._lock:
+                    self._waiting -= 1
+                self._changed()
+                done(task, 'cancelled')
+
+    def terminate(self):
+        """Drop the waiting tasks and stop the running ones; their done() callbacks still run."""
+        self.cancel_pending()
+        with self._lock:
+            tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+
+    def shutdown(self):
+        """Wait for the queued and running tasks to finish."""
+        self._executor.shutdown(wait=True)
+
+    def _run(self, task, done):
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+            self._tasks.add(task)
+        self._changed()
+        error = None
+        start = time.monotonic()
+        try:
+            error = task.run()
+        except Exception as e:
+            error = str(e)
+        finally:
+            task.seconds = time.monotonic() - start
+            with self._lock:
+                self._running -= 1
+                self._tasks.discard(task)
+            self._changed()
+            done(task, error)
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.pop(future, None)
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from job_scheduler import DownloadJob
+from metadata_cache import normalize_url, video_key
+
+PLAYLIST_TYPES = ('playlist', 'multi_video')
+MAX_DEPTH = 3
+ARCHIVED = object()
+
+
+class PreflightResult:
+    """The deduplicated job list produced by run_preflight, plus what is known about its size."""
+
+    def __init__(self):
+        self.jobs = []
+        self.duplicates = 0
+        self.archived = 0
+        self.errors = []
+        self.total_bytes = 0
+        self.total_duration = 0
+        self.unknown_size = 0
+
+
+def entry_url(entry, fallback):
+    url = entry.get('webpage_url') or entry.get('url') or ''
+    return url if url.startswith(('http://', 'https://')) else fallback
+
+
+def estimate_size(info):
+    """Best-effort size of an entry: its own filesize, or the largest format with a known size."""
+    size = info.get('filesize') or info.get('filesize_approx')
+    if size:
+        return int(size)
+    sizes = [f.get('filesize') or f.get('filesize_approx') or 0 for f in info.get('formats') or []]
+    return int(max(sizes)) if sizes and max(sizes) else None
+
+
+def flatten(url, info, extract, should_stop, depth=0):
+    """Yield (url, info) for every video behind an extraction result, expanding playlists and channels."""
+    if info is None:
+        return
+    result_type = info.get('_type', 'video')
+    if result_type in PLAYLIST_TYPES:
+        for entry in info.get('entries') or []:
+            if should_stop():
+                return
+            if not entry:
+                continue
+            nested = entry.get('_type') in PLAYLIST_TYPES or (
+                entry.get('_type') in ('url', 'url_transparent') and 'Tab' in (entry.get('ie_key') or ''))
+            if nested and depth < MAX_DEPTH:
+                sub_url = entry_url(entry, None)
+                sub_info = entry if entry.get('_type') in PLAYLIST_TYPES else (sub_url and extract(sub_url))
+                yield from flatten(sub_url or url, sub_info, extract, should_stop, depth + 1)
+            else:
+                yield entry_url(entry, url), entry
+    elif result_type == 'url' and depth < MAX_DEPTH and info.get('url') and info['url'] != url:
+        yield from flatten(info['url'], extract(info['url']), extract, should_stop, depth + 1)
+    else:
+        yield url, info
+
+
+def run_preflight(urls, extract, max_workers=4, should_stop=lambda: False, archived=None):
+    """Extract every input URL in parallel without downloading and build an ordered, deduplicated job list.
+
+    extract(url) must return yt-dlp's unprocessed extraction result (extract_info(..., process=False)).
+    archived(url, key), if given, tells whether a URL or 'extractor:id' key was already downloaded; such
+    items are dropped, and input URLs are checked before they are extracted.
+    URLs that fail to extract are kept as plain jobs so the download stage reports the error.
+    """
+    def safe_extract(url):
+        if should_stop():
+            return None, None
+        if archived and archived(url, None):
+            return ARCHIVED, None
+        try:
+            return extract(url), None
+        except Exception as e:
+            return None, e
+
+    result = PreflightResult()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='preflight') as executor:
+        extracted = list(executor.map(safe_extract, urls))
+
+    seen = set()
+    for url, (info, error) in zip(urls, extracted):
+        if info is ARCHIVED:
+            result.archived += 1
+            continue
+        if error is not None:
+            result.errors.append((url, error))
+        entries = flatten(url, info, extract, should_stop) if info is not None else [(url, {})]
+        for job_url, entry in entries:
+            key = video_key(entry) or normalize_url(job_url)
+            if key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            if archived and archived(job_url, video_key(entry)):
+                result.archived += 1
+                continue
+            job = DownloadJob(len(result.jobs) + 1, job_url)
+            job.title = entry.get('title')
+            job.video_key = video_key(entry)
+            job.duration = entry.get('duration')
+            job.filesize = estimate_size(entry)
+            result.jobs.append(job)
+            result.total_duration += job.duration or 0
+            if job.filesize:
+                result.total_bytes += job.filesize
+            else:
+                result.unknown_size += 1
+    return result
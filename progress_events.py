@@ -0,0 +1,82 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ProgressEvent:
+    """A raw progress update for one job; formatting is left to whoever displays it."""
+    job_id: int
+    status: str
+    downloaded_bytes: int = 0
+    total_bytes: Optional[int] = None
+    speed: Optional[float] = None
+    eta: Optional[float] = None
+    filename: str = ''
+
+    @classmethod
+    def from_hook(cls, job_id, d):
+        """Build an event from a yt-dlp progress hook dict."""
+        return cls(
+            job_id=job_id,
+            status=d.get('status', ''),
+            downloaded_bytes=d.get('downloaded_bytes') or 0,
+            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+            speed=d.get('speed'),
+            eta=d.get('eta'),
+            filename=d.get('filename') or '',
+        )
+
+    @property
+    def percent(self):
+        if not self.total_bytes:
+            return None
+        return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+
+
+class ProgressCoalescer:
+    """Forward at most `rate` 'downloading' events per second per job; other statuses pass straight through."""
+
+    def __init__(self, emit, rate=10):
+        self.emit = emit
+        self.interval = 1.0 / rate if rate else 0.0
+        self._last_emit = {}
+        self._lock = threading.Lock()
+
+    def submit(self, event):
+        if event.status != 'downloading':
+            with self._lock:
+                self._last_emit.pop(event.job_id, None)
+            self.emit(event)
+            return
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_emit.get(event.job_id)
+            if last is not None and now - last < self.interval:
+                return
+            self._last_emit[event.job_id] = now
+        self.emit(event)
+
+
+def format_bytes(num):
+    """Format a byte count as a short human readable string, e.g. '12.3MiB'."""
+    if num is None:
+        return '?'
+    num = float(num)
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(num) < 1024.0:
+            return f'{num:.1f}{unit}'
+        num /= 1024.0
+    return f'{num:.1f}TiB'
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{seconds:02d}'
+    return f'{minutes:02d}:{seconds:02d}'
@@ -0,0 +1,220 @@
+"""Spread the downloads of a batch over several proxies, preferring the fast ones and avoiding the dead ones.
+
+The proxy setting may list several proxies, separated by commas, semicolons or white space. A background
+thread checks every one of them each `interval` seconds by fetching a small URL through it, which measures its
+latency; the throughput of the downloads made through a proxy is measured as they finish. Each job takes the
+proxy with the lowest expected cost (see ProxyStats.cost), and a proxy that fails its check, or `max_failures`
+downloads in a row, is left out until a check succeeds again.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CHECK_URL = 'https://www.youtube.com/generate_204'
+DEFAULT_CHECK_INTERVAL = 30
+# Weight of the newest measurement in the moving averages of latency and throughput.
+SMOOTHING = 0.3
+# The cost of a proxy is the expected time (seconds) to fetch this much through it.
+REFERENCE_BYTES = 4 * 1024 * 1024
+
+
+def parse_proxies(text):
+    """'http://a:1, socks5://b:2' -> ['http://a:1', 'socks5://b:2'], without duplicates."""
+    proxies = []
+    for proxy in re.split(r'[,;\s]+', text or ''):
+        if proxy and proxy not in proxies:
+            proxies.append(proxy)
+    return proxies
+
+
+def _average(old, new):
+    return new if old is None else old + SMOOTHING * (new - old)
+
+
+class ProxyStats:
+    """What is known about one proxy of a ProxyPool; read and changed under the pool's lock."""
+
+    def __init__(self, proxy, index):
+        self.proxy = proxy
+        self.index = index
+        # Proxies are assumed to work until their first check or download says otherwise.
+        self.healthy = True
+        self.checked = None
+        self.latency = None
+        self.throughput = None
+        self.active = 0
+        self.jobs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.bytes = 0
+        self.error = None
+
+    def cost(self, default_latency, default_throughput):
+        """Expected seconds to fetch REFERENCE_BYTES, multiplied by the downloads that would share the proxy."""
+        latency = self.latency if self.latency is not None else default_latency
+        throughput = self.throughput or default_throughput
+        transfer = REFERENCE_BYTES / throughput if throughput else 0.0
+        return (latency + transfer) * (self.active + 1)
+
+    def to_dict(self):
+        return {
+            'proxy': self.proxy, 'healthy': self.healthy, 'latency': self.latency, 'throughput': self.throughput,
+            'active': self.active, 'jobs': self.jobs, 'failures': self.failures, 'bytes': self.bytes,
+            'error': self.error,
+        }
+
+
+class ProxyPool:
+    """Assign the best working proxy to every download and keep checking all of them in the background.
+
+    probe(proxy) fetches a small URL through proxy and raises if that fails; the time it takes is the latency.
+    on_change(stats), if given, is called (from the checking thread or a worker) whenever a proxy goes down or
+    comes back up.
+    """
+
+    def __init__(self, proxies, probe, interval=DEFAULT_CHECK_INTERVAL, max_failures=2, on_change=None):
+        self.probe = probe
+        self.interval = interval
+        self.max_failures = max_failures
+        self.on_change = on_change
+        self._stats = [ProxyStats(proxy, i) for i, proxy in enumerate(proxies)]
+        self._by_proxy = {stats.proxy: stats for stats in self._stats}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._urgent = set()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._stats)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='proxy-check', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop checking; returns once no check is running any more, so probe() may be torn down afterwards."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def check_soon(self, proxy):
+        """Have the checking thread probe proxy now rather than at its next round, without waiting for it."""
+        with self._lock:
+            self._urgent.add(proxy)
+        self._wake.set()
+
+    def _run(self):
+        next_round = 0.0
+        with ThreadPoolExecutor(max_workers=min(8, len(self._stats)), thread_name_prefix='proxy-probe') as executor:
+            while not self._stop.is_set():
+                with self._lock:
+                    urgent, self._urgent = self._urgent, set()
+                if time.monotonic() >= next_round:
+                    next_round = time.monotonic() + self.interval
+                    proxies = [stats.proxy for stats in self._stats]
+                else:
+                    proxies = [stats.proxy for stats in self._stats if stats.proxy in urgent]
+                list(executor.map(self._scheduled_check, proxies))
+                self._wake.wait(max(0.0, next_round - time.monotonic()))
+                self._wake.clear()
+
+    def _scheduled_check(self, proxy):
+        # Checks still queued when the pool is closed are skipped.
+        if not self._stop.is_set():
+            self.check(proxy)
+
+    def check(self, proxy):
+        """Probe one proxy now and record the result; return whether it works."""
+        start = time.monotonic()
+        try:
+            self.probe(proxy)
+        except Exception as e:
+            self._update(proxy, error=str(e) or type(e).__name__, checked=True)
+            return False
+        self._update(proxy, latency=time.monotonic() - start, checked=True)
+        return True
+
+    def _update(self, proxy, latency=None, error=None, checked=False):
+        with self._lock:
+            stats = self._by_proxy[proxy]
+            was_healthy = stats.healthy
+            if checked:
+                stats.checked = time.time()
+            if latency is not None:
+                stats.latency = _average(stats.latency, latency)
+            if error is None:
+                stats.consecutive_failures = 0
+                stats.error = None
+                stats.healthy = True
+            else:
+                stats.consecutive_failures += 1
+                stats.error = error
+                # A failed check means the proxy is down; a failed download may also be the site's fault.
+                if checked or stats.consecutive_failures >= self.max_failures:
+                    stats.healthy = False
+            changed = stats.healthy != was_healthy
+        if changed and self.on_change is not None:
+            self.on_change(stats)
+
+    def healthy(self, proxy):
+        """Whether proxy passed its last check (and has not failed `max_failures` downloads in a row since)."""
+        with self._lock:
+            return self._by_proxy[proxy].healthy
+
+    def available(self, exclude=()):
+        """Whether a working proxy other than those in exclude is left."""
+        with self._lock:
+            return any(stats.healthy and stats.proxy not in exclude for stats in self._stats)
+
+    def acquire(self, exclude=(), job=True):
+        """Return the proxy for the next download, preferring working proxies not in exclude; release() it after.
+
+        When every proxy is down, the one that failed least recently in a row is tried anyway rather than none.
+        Requests that are not downloads (such as pre-flight extractions) pass job=False, so they are not counted.
+        """
+        with self._lock:
+            candidates = ([s for s in self._stats if s.healthy and s.proxy not in exclude] or
+                          [s for s in self._stats if s.healthy] or
+                          sorted(self._stats, key=lambda s: s.consecutive_failures)[:1])
+            latencies = sorted(s.latency for s in self._stats if s.latency is not None)
+            throughputs = sorted(s.throughput for s in self._stats if s.throughput)
+            # Proxies not measured yet are assumed to be as good as the median one.
+            default_latency = latencies[len(latencies) // 2] if latencies else 0.0
+            default_throughput = throughputs[len(throughputs) // 2] if throughputs else None
+            best = min(candidates, key=lambda s: (s.cost(default_latency, default_throughput), s.index))
+            best.active += 1
+            best.jobs += job
+            return best.proxy
+
+    def release(self, proxy, error=None, succeeded=False):
+        """End a download through proxy.
+
+        error is the connection error it ended with, if any; succeeded tells that it did fetch what it had to
+        through proxy. Any other outcome, such as an error of the site, tells nothing about the proxy and leaves
+        its health as it is.
+        """
+        with self._lock:
+            stats = self._by_proxy[proxy]
+            stats.active = max(0, stats.active - 1)
+            if error is not None:
+                stats.failures += 1
+        if error is not None or succeeded:
+            self._update(proxy, error=error)
+
+    def record_transfer(self, proxy, nbytes, seconds):
+        """Add the throughput of a finished download (or part of one) through proxy."""
+        if proxy not in self._by_proxy or not nbytes:
+            return
+        with self._lock:
+            stats = self._by_proxy[proxy]
+            stats.bytes += nbytes
+            if seconds > 0:
+                stats.throughput = _average(stats.throughput, nbytes / seconds)
+
+    def stats(self):
+        """A dict per proxy (see ProxyStats.to_dict), in the order they were given."""
+        with self._lock:
+            return [stats.to_dict() for stats in self._stats]
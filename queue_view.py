@@ -0,0 +1,145 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtWidgets import QAbstractItemView, QHeaderView, QTableView
+
+STATES = ('queued', 'pending', 'extracting', 'downloading', 'post-processing', 'paused', 'done', 'failed', 'cancelled')
+
+
+class QueueModel(QAbstractTableModel):
+    """The jobs of a batch as a table model: number, URL, state and download progress.
+
+    Rows are kept in flat lists and only the rows a view asks for are formatted, so a batch of tens of
+    thousands of URLs costs a few lists rather than a widget per row. Before a batch is planned the rows are
+    its input URLs ('queued'); set_jobs() replaces them with the planned jobs, which update_job() and
+    set_progress() then keep up to date by job id.
+    """
+
+    def __init__(self, get_translation, parent=None):
+        super().__init__(parent)
+        self.get_translation = get_translation
+        self._ids = []
+        self._urls = []
+        self._states = []
+        self._rows = {}
+        self._progress = {}
+        self._errors = {}
+        self._headers = []
+        self._state_names = {}
+        self.retranslate()
+
+    def retranslate(self):
+        self._headers = self.get_translation('queue_headers')
+        self._state_names = {state: self.get_translation(f'queue_state_{state}') for state in STATES}
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(self._headers) - 1)
+        if self._urls:
+            self.dataChanged.emit(self.index(0, 2), self.index(len(self._urls) - 1, 2))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._urls)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 4
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._headers[section] if section < len(self._headers) else None
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row, column = index.row(), index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return str(self._ids[row])
+            if column == 1:
+                return self._urls[row]
+            if column == 2:
+                state = self._states[row]
+                return self._state_names.get(state, state)
+            percent = self._progress.get(row)
+            if percent is not None:
+                return f'{percent:.1f}%'
+            return '100%' if self._states[row] == 'done' else ''
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if column == 1:
+                return self._urls[row]
+            if column == 2:
+                return self._errors.get(row)
+        return None
+
+    def clear(self):
+        self.set_urls([])
+
+    def set_urls(self, urls):
+        """Show the input URLs of a batch that has not been planned yet."""
+        self.beginResetModel()
+        self._urls = list(urls)
+        self._ids = list(range(1, len(self._urls) + 1))
+        self._states = ['queued'] * len(self._urls)
+        self._rows = {}
+        self._progress = {}
+        self._errors = {}
+        self.endResetModel()
+
+    def append_urls(self, urls):
+        if not urls:
+            return
+        start = len(self._urls)
+        self.beginInsertRows(QModelIndex(), start, start + len(urls) - 1)
+        self._urls.extend(urls)
+        self._ids.extend(range(start + 1, start + len(urls) + 1))
+        self._states.extend(['queued'] * len(urls))
+        self.endInsertRows()
+
+    def job_id(self, row):
+        """The job id of a row, or None while the rows are still the input URLs."""
+        return self._ids[row] if self._rows and 0 <= row < len(self._ids) else None
+
+    def set_jobs(self, jobs):
+        """Replace the rows with the planned jobs, a list of (job id, URL)."""
+        self.beginResetModel()
+        self._ids = [job_id for job_id, _ in jobs]
+        self._urls = [url for _, url in jobs]
+        self._states = ['pending'] * len(jobs)
+        self._rows = {job_id: row for row, job_id in enumerate(self._ids)}
+        self._progress = {}
+        self._errors = {}
+        self.endResetModel()
+
+    def update_job(self, job_id, state, error=None):
+        row = self._rows.get(job_id)
+        if row is None:
+            return
+        self._states[row] = state
+        if state != 'downloading':
+            self._progress.pop(row, None)
+        if error:
+            self._errors[row] = error
+        else:
+            self._errors.pop(row, None)
+        self.dataChanged.emit(self.index(row, 2), self.index(row, 3))
+
+    def set_progress(self, job_id, percent):
+        row = self._rows.get(job_id)
+        if row is None or percent is None:
+            return
+        self._progress[row] = percent
+        self.dataChanged.emit(self.index(row, 3), self.index(row, 3))
+
+
+class QueueView(QTableView):
+    """A table for a QueueModel, with fixed row heights so that scrolling never measures rows."""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setWordWrap(False)
+        self.verticalHeader().setVisible(False)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 6)
+        header = self.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        header.resizeSection(0, 60)
+        header.resizeSection(2, 110)
+        header.resizeSection(3, 80)
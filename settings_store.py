@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class SettingsStore:
+    """Keep a settings dict in a JSON file.
+
+    save() only records the new settings; a background thread writes them once no further change has come in
+    for `debounce` seconds. Writes go to a temporary file that then replaces the real one, so a crash never
+    leaves a truncated file behind, and settings identical to what is on disk are not written at all.
+    """
+
+    def __init__(self, path, debounce=0.5):
+        self.path = path
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._pending_seq = 0
+        self._deadline = 0.0
+        self._seq = 0
+        self._written_seq = 0
+        # The text of the last save() (or load()), whether it is still pending, being written or on disk; read and
+        # changed under _cond. _last_written is what is on disk, under _write_lock.
+        self._last_saved = None
+        self._last_written = None
+        self._thread = None
+
+    def load(self, legacy_paths=()):
+        """Return the stored settings, falling back to the first readable legacy file, or {}."""
+        for candidate in (self.path, *legacy_paths):
+            if not os.path.exists(candidate):
+                continue
+            try:
+                with open(candidate, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading configuration from {candidate}: {e}")
+                continue
+            if candidate == self.path:
+                self._last_saved = self._last_written = _serialize(settings)
+            return settings
+        return {}
+
+    def save(self, settings):
+        """Schedule settings to be written after the debounce delay."""
+        text = _serialize(settings)
+        with self._cond:
+            if text == self._last_saved:
+                # Same as the last save, which is pending, being written or already on disk.
+                return
+            self._seq += 1
+            self._last_saved = text
+            self._pending = text
+            self._pending_seq = self._seq
+            self._deadline = time.monotonic() + self.debounce
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='settings-writer', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """Write any pending settings now, on the calling thread."""
+        with self._cond:
+            text, seq = self._pending, self._pending_seq
+            self._pending = None
+        if text is not None:
+            self._write(text, seq)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                text, seq = self._pending, self._pending_seq
+                self._pending = None
+            self._write(text, seq)
+
+    def _write(self, text, seq):
+        with self._write_lock:
+            if seq <= self._written_seq:
+                return
+            if text == self._last_written:
+                # Changed and changed back before the write: already on disk.
+                self._written_seq = seq
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            tmp_path = None
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Error saving configuration: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._cond:
+                    # Not on disk after all: saving the same settings again must try again.
+                    if self._last_saved == text:
+                        self._last_saved = self._last_written
+                return
+            self._written_seq = seq
+            self._last_written = text
+
+
+def _serialize(settings):
+    return json.dumps(settings, ensure_ascii=False, indent=4)
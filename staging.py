@@ -0,0 +1,120 @@
+"""A local staging directory for the files of a batch that are still being downloaded or converted.
+
+With a staging directory, yt-dlp's .part files and fragments, and the intermediate files of a merge, are written
+to it rather than to the save path (which may be a network share); finished files are then moved to the save
+path, under a temporary name that is renamed once the copy is complete, so the save path only ever holds
+complete files.
+"""
+import hashlib
+import os
+import shutil
+
+# Files of a video in the staging directory that are not finished yet.
+UNFINISHED_SUFFIXES = ('.part', '.ytdl', '.temp')
+# Files yt-dlp may write next to a video without reporting their names in the info dict.
+SIDECAR_EXTENSIONS = ('description', 'info.json', 'annotations.xml', 'url', 'webloc', 'desktop')
+
+
+def staging_path(staging_dir, path):
+    """The directory in staging_dir for downloads to path; the same one every time, so partial files resume."""
+    name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(staging_dir, name)
+
+
+def existing_parent(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def free_space(path):
+    """Free bytes on the filesystem of path (which need not exist yet), or None if that cannot be told."""
+    try:
+        return shutil.disk_usage(existing_parent(path)).free
+    except OSError:
+        return None
+
+
+def same_filesystem(a, b):
+    try:
+        return os.stat(existing_parent(a)).st_dev == os.stat(existing_parent(b)).st_dev
+    except OSError:
+        return False
+
+
+def space_shortfalls(needed, paths):
+    """Return [(path, free bytes)] for the paths whose filesystem has less than `needed` bytes free.
+
+    Paths on the same filesystem share its free space, so each filesystem is checked once, for `needed` bytes
+    per path on it: files staged on the filesystem of the save path are moved there without taking more room.
+    """
+    shortfalls = []
+    checked = []
+    for path in paths:
+        if any(same_filesystem(path, other) for other in checked):
+            continue
+        checked.append(path)
+        free = free_space(path)
+        if free is not None and free < needed:
+            shortfalls.append((path, free))
+    return shortfalls
+
+
+def is_inside(path, directory):
+    directory = os.path.abspath(directory)
+    return os.path.commonpath([os.path.abspath(path), directory]) == directory
+
+
+def is_unfinished(path):
+    name = os.path.basename(path)
+    return name.endswith(UNFINISHED_SUFFIXES) or '.part-Frag' in name or '.temp.' in name
+
+
+def move_into_place(source, target):
+    """Move source to target atomically: a reader of target's directory never sees a half-written file.
+
+    Within one filesystem this is a rename. Across filesystems the file is copied to a hidden temporary file
+    next to target, which is renamed to target once complete, and source is removed afterwards.
+    """
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    try:
+        os.replace(source, target)
+        return
+    except OSError:
+        if same_filesystem(source, target):
+            raise
+    directory, name = os.path.split(target)
+    temp = os.path.join(directory, f'.{name}.part')
+    try:
+        with open(source, 'rb') as src, open(temp, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source, temp)
+        os.replace(temp, target)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    os.remove(source)
+
+
+def deliver(source, work_path, path, related=()):
+    """Move a finished file, and the files yt-dlp wrote next to it, from work_path to the same place in path.
+
+    Returns the new path of source. The files next to it are those in related (the thumbnails, subtitles and the
+    like that yt-dlp reported for it) and those named like source but for one of SIDECAR_EXTENSIONS. Other files
+    are left alone even when their names start the same: next to 'Song.mp4' may be the parts of 'Song.remix'
+    that another job has yet to merge.
+    """
+    target = os.path.join(path, os.path.relpath(source, work_path))
+    stem = os.path.splitext(source)[0]
+    for sidecar in dict.fromkeys([*related, *(f'{stem}.{ext}' for ext in SIDECAR_EXTENSIONS)]):
+        if (sidecar != source and is_inside(sidecar, work_path) and os.path.isfile(sidecar) and
+                not is_unfinished(sidecar)):
+            move_into_place(sidecar, os.path.join(path, os.path.relpath(sidecar, work_path)))
+    move_into_place(source, target)
+    return target
@@ -0,0 +1,121 @@
+from PyQt6.QtWidgets import (QDialog, QFileDialog, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                             QTableWidgetItem, QVBoxLayout)
+
+from progress_events import format_bytes
+
+
+def format_seconds(seconds):
+    return '' if seconds is None else f'{seconds:.2f}s'
+
+
+def format_speed(speed):
+    return '' if speed is None else format_bytes(speed) + '/s'
+
+
+class StatsDialog(QDialog):
+    """Per-job timings of a batch (a MetricsRecorder), with export to JSON lines and Prometheus text.
+
+    proxy_stats(), if given, returns the per-proxy statistics of the batch (DownloadEngine.proxy_stats); they are
+    shown in a second table when the batch used several proxies.
+    """
+
+    def __init__(self, metrics, get_translation, parent=None, proxy_stats=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.proxy_stats = proxy_stats
+        self.get_translation = get_translation
+        self.setWindowTitle(get_translation('stats_title'))
+        self.resize(900, 400)
+
+        layout = QVBoxLayout()
+        self.summary_label = QLabel('')
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        self.table = QTableWidget(0, 0)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+        self.proxy_table = QTableWidget(0, 0)
+        self.proxy_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.proxy_table.verticalHeader().setVisible(False)
+        self.proxy_table.setVisible(False)
+        layout.addWidget(self.proxy_table)
+
+        buttons = QHBoxLayout()
+        refresh_btn = QPushButton(get_translation('stats_refresh_button'))
+        refresh_btn.clicked.connect(self.refresh)
+        buttons.addWidget(refresh_btn)
+        buttons.addStretch()
+        jsonl_btn = QPushButton(get_translation('stats_export_jsonl_button'))
+        jsonl_btn.clicked.connect(self.export_jsonl)
+        buttons.addWidget(jsonl_btn)
+        prometheus_btn = QPushButton(get_translation('stats_export_prometheus_button'))
+        prometheus_btn.clicked.connect(self.export_prometheus)
+        buttons.addWidget(prometheus_btn)
+        close_btn = QPushButton(get_translation('stats_close_button'))
+        close_btn.clicked.connect(self.accept)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        summary = self.metrics.summary()
+        phases = {phase: format_seconds(values['total']) for phase, values in summary['phases'].items()}
+        self.summary_label.setText(self.get_translation(
+            'metrics_summary', jobs=summary['jobs'], seconds=format_seconds(summary['seconds']),
+            size=format_bytes(summary['bytes']), speed=format_speed(summary['average_speed']),
+            retries=summary['retries'], **phases))
+
+        headers = self.get_translation('stats_headers')
+        jobs = self.metrics.jobs()
+        self.table.setColumnCount(len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            values = (str(job.job_id), job.url, job.state, format_seconds(job.extract), format_seconds(job.ttfb),
+                      format_seconds(job.download), format_seconds(job.postprocess), format_bytes(job.bytes),
+                      format_speed(job.average_speed), format_speed(job.peak_speed), str(job.retries), job.proxy or '')
+            for column, value in enumerate(values[:len(headers)]):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        self.table.resizeColumnsToContents()
+        self.refresh_proxies()
+
+    def refresh_proxies(self):
+        proxies = self.proxy_stats() if self.proxy_stats is not None else []
+        self.proxy_table.setVisible(bool(proxies))
+        if not proxies:
+            return
+        headers = self.get_translation('proxy_stats_headers')
+        self.proxy_table.setColumnCount(len(headers))
+        self.proxy_table.setHorizontalHeaderLabels(headers)
+        self.proxy_table.setRowCount(len(proxies))
+        for row, stats in enumerate(proxies):
+            state = self.get_translation('proxy_state_up' if stats['healthy'] else 'proxy_state_down')
+            latency = '' if stats['latency'] is None else f"{stats['latency'] * 1000:.0f} ms"
+            values = (stats['proxy'], state, latency, format_speed(stats['throughput']), str(stats['jobs']),
+                      str(stats['failures']), format_bytes(stats['bytes']))
+            for column, value in enumerate(values[:len(headers)]):
+                item = QTableWidgetItem(value)
+                if column == 1 and stats['error']:
+                    item.setToolTip(stats['error'])
+                self.proxy_table.setItem(row, column, item)
+        self.proxy_table.resizeColumnsToContents()
+
+    def export_jsonl(self):
+        path, _ = QFileDialog.getSaveFileName(self, self.get_translation('stats_export_jsonl_button'),
+                                              'metrics.jsonl', 'JSON lines (*.jsonl)')
+        if path:
+            self._export(self.metrics.write_jsonl, path)
+
+    def export_prometheus(self):
+        path, _ = QFileDialog.getSaveFileName(self, self.get_translation('stats_export_prometheus_button'),
+                                              'metrics.prom', 'Prometheus (*.prom)')
+        if path:
+            self._export(self.metrics.write_prometheus, path)
+
+    def _export(self, write, path):
+        try:
+            write(path)
+        except OSError as e:
+            self.summary_label.setText(self.get_translation('stats_export_error', error=str(e)))
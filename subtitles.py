@@ -0,0 +1,115 @@
+"""Subtitle-only downloads: pick the wanted tracks of a video and fetch them without resolving any formats.
+
+Languages are given in priority order, e.g. 'en, zh-Hans|zh-CN|zh': every comma-separated entry is one
+language to fetch, and '|' separates alternatives of which only the first one the video has is taken. An
+entry may also be a regular expression, as in yt-dlp's --sub-langs ('en.*'). Uploaded tracks are preferred
+to automatic captions, which are only used for a language that has no uploaded track.
+"""
+import os
+import re
+
+from postprocess import PostProcessTask, temp_path
+
+DEFAULT_LANGUAGES = 'en'
+# Formats a batch can convert its subtitles to; '' keeps them as the site serves them.
+SUBTITLE_FORMATS = ('srt', 'vtt', 'ass', 'lrc')
+# Track formats to take when a site offers several, best first.
+PREFERRED_EXTS = ('vtt', 'srt', 'ass', 'ssa', 'ttml', 'srv3', 'srv2', 'srv1', 'json3')
+# Track formats ffmpeg can read.
+CONVERTIBLE_EXTS = ('vtt', 'srt', 'ass', 'ssa')
+# Tracks yt-dlp lists among the subtitles that are not subtitles.
+IGNORED_LANGUAGES = ('live_chat', 'rechat', 'danmaku')
+
+
+def parse_languages(text):
+    """'en, zh-Hans | zh' -> [['en'], ['zh-Hans', 'zh']]."""
+    text = re.sub(r'\s*\|\s*', '|', text or '')
+    return [[language for language in entry.split('|') if language]
+            for entry in re.split(r'[,\s]+', text) if entry.strip('|')]
+
+
+def has_subtitle_info(info):
+    """Whether an extraction result lists its tracks; some extractors only do when subtitles were asked for."""
+    return info.get('_type', 'video') != 'video' or 'subtitles' in info or 'automatic_captions' in info
+
+
+def _matches(pattern, language):
+    if pattern.lower() == language.lower():
+        return True
+    try:
+        return re.fullmatch(pattern, language, re.IGNORECASE) is not None
+    except re.error:
+        return False
+
+
+def _pick_format(formats, target=''):
+    """The best format of a track: the target format if the site has it, otherwise by PREFERRED_EXTS."""
+    formats = [f for f in formats or [] if f.get('data') is not None or (
+        (f.get('url') or '').startswith(('http://', 'https://')) and 'm3u8' not in (f.get('protocol') or ''))]
+    by_ext = {f.get('ext'): f for f in formats}
+    for ext in (target, *PREFERRED_EXTS):
+        if ext and ext in by_ext:
+            return by_ext[ext]
+    # yt-dlp lists the formats of a track worst first.
+    return formats[-1] if formats else None
+
+
+def select_tracks(info, languages, automatic=True, target=''):
+    """Return [(language, track, is_automatic), ...]: the best track of every wanted language the video has."""
+    sources = [(info.get('subtitles') or {}, False)]
+    if automatic:
+        sources.append((info.get('automatic_captions') or {}, True))
+    selected = []
+    taken = set()
+    for alternatives in languages:
+        found = False
+        for tracks, is_automatic in sources:
+            for pattern in alternatives:
+                for language, formats in tracks.items():
+                    if language in taken or language in IGNORED_LANGUAGES or not _matches(pattern, language):
+                        continue
+                    track = _pick_format(formats, target)
+                    if track is not None:
+                        selected.append((language, track, is_automatic))
+                        taken.add(language)
+                        found = True
+                if found:
+                    break
+            if found:
+                break
+    return selected
+
+
+class SubtitleTask(PostProcessTask):
+    """Fetch one subtitle track to `path` + '.<ext>' and, if ffmpeg and a target format are given, convert it.
+
+    fetch(track) returns the bytes of a track; tracks that come with their text ('data') are not fetched.
+    Runs in a PostProcessStage like the ffmpeg tasks, and is cancelled the same way.
+    """
+
+    def __init__(self, job_id, fetch, language, track, path, is_automatic=False, ffmpeg=None, target=''):
+        ext = track.get('ext') or 'vtt'
+        source = f'{path}.{ext}'
+        output, commands = source, []
+        if ffmpeg and target and target != ext and ext in CONVERTIBLE_EXTS:
+            output = f'{path}.{target}'
+            commands = [[ffmpeg, '-y', '-loglevel', 'error', '-i', source, temp_path(output)]]
+        super().__init__(job_id, output, [source] if commands else [], commands)
+        self.fetch = fetch
+        self.language = language
+        self.track = track
+        self.source = source
+        self.is_automatic = is_automatic
+
+    def run(self):
+        data = self.track.get('data')
+        data = data.encode('utf-8') if data is not None else self.fetch(self.track)
+        if self.cancelled:
+            return 'cancelled'
+        os.makedirs(os.path.dirname(self.source) or '.', exist_ok=True)
+        with open(temp_path(self.source), 'wb') as f:
+            f.write(data)
+        os.replace(temp_path(self.source), self.source)
+        if not self.commands:
+            return None
+        return super().run()
@@ -1,17 +1,24 @@
+import argparse
 import json
 import asyncio
+import sqlite3
+import string
+import time
 
-import googletrans
-from googletrans import Translator
 import os
 
+from app_paths import data_file_path
+
+DEFAULT_TARGETS = ["en", "ja", "fr", "de", "ru", "pt", "es", "ar", "bg", "is", "da", "nl", "it", "pl", "ro"]
+SOURCE_FILE = "lang/lang_zh-CN.json"
+
 
 def set_proxy(proxy_str):
     if proxy_str:
         # set environment variables ,for proxy in some cases
-        os.environ['HTTP_PROXY'] = 'http://127.0.0.1:7890'  # 设置 HTTP 代理
-        os.environ['HTTPS_PROXY'] = 'http://127.0.0.1:7890'  # 设置 HTTPS 代理
-        os.environ['ALL_PROXY'] = 'http://127.0.0.1:7890'
+        os.environ['HTTP_PROXY'] = proxy_str
+        os.environ['HTTPS_PROXY'] = proxy_str
+        os.environ['ALL_PROXY'] = proxy_str
         print(f"Proxy set to: {proxy_str}")
     else:
         os.environ.pop("HTTP_PROXY", None)
@@ -20,6 +27,101 @@ def set_proxy(proxy_str):
         print("Proxy cleared.")
 
 
+class GoogleBackend:
+    """Translate with googletrans (Google Translate web API)."""
+
+    def __init__(self):
+        import googletrans
+        self.languages = googletrans.LANGUAGES
+        self.translator = googletrans.Translator()
+
+    def translate(self, text, src, dest):
+        result = self.translator.translate(text, src=src, dest=dest)
+        return result.text if hasattr(result, 'text') else result
+
+
+class StubBackend:
+    """Offline stand-in that tags the text with the target language; `delay` simulates a network round trip."""
+
+    def __init__(self, delay=0.0):
+        self.languages = {}
+        self.delay = delay
+        self.calls = 0
+
+    def translate(self, text, src, dest):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return f"[{dest}] {text}"
+
+
+BACKENDS = {'google': GoogleBackend, 'stub': StubBackend}
+
+
+def placeholders(text):
+    try:
+        return {field for _, field, _, _ in string.Formatter().parse(text) if field is not None}
+    except ValueError:
+        return set()
+
+
+class TranslationMemory:
+    """Translations done before, keyed by (source text, source language, target language).
+
+    Also keeps, for every target language, the source file it was last translated from, so an incremental run
+    can tell which keys changed for it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS memory ('
+            '  text TEXT NOT NULL, src TEXT NOT NULL, dest TEXT NOT NULL, translation TEXT NOT NULL, '
+            '  PRIMARY KEY (text, src, dest)) WITHOUT ROWID;'
+            # Snapshots used to be kept per source language only; those cannot tell which target they were for.
+            'DROP TABLE IF EXISTS source;'
+            'CREATE TABLE IF NOT EXISTS source_snapshot ('
+            '  src TEXT NOT NULL, dest TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+            '  PRIMARY KEY (src, dest, key)) WITHOUT ROWID;')
+        self._conn.commit()
+
+    def get(self, text, src, dest):
+        row = self._conn.execute(
+            'SELECT translation FROM memory WHERE text = ? AND src = ? AND dest = ?', (text, src, dest)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, text, src, dest, translation):
+        self._conn.execute('INSERT OR REPLACE INTO memory (text, src, dest, translation) VALUES (?, ?, ?, ?)',
+                           (text, src, dest, translation))
+
+    def source_snapshot(self, src, dest):
+        """Return the source file content the last run translated into dest, or None."""
+        rows = self._conn.execute('SELECT key, value FROM source_snapshot WHERE src = ? AND dest = ?',
+                                  (src, dest)).fetchall()
+        return {key: json.loads(value) for key, value in rows} if rows else None
+
+    def save_source_snapshot(self, src, dest, content):
+        self._conn.execute('DELETE FROM source_snapshot WHERE src = ? AND dest = ?', (src, dest))
+        self._conn.executemany('INSERT INTO source_snapshot (src, dest, key, value) VALUES (?, ?, ?, ?)',
+                               [(src, dest, key, json.dumps(value, ensure_ascii=False))
+                                for key, value in content.items()])
+        self._conn.commit()
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
 def read_language_file(file_path):
     """Read a JSON language file and return its content."""
     try:
@@ -31,60 +133,114 @@ def read_language_file(file_path):
         raise
 
 
-async def translate_text(text, src_lang, dest_lang, translator):
-    """Translate a single text string asynchronously using a thread pool."""
+def language_file_path(lang):
+    return f"lang/lang_{lang}.json"
+
+
+async def translate_text(text, src_lang, dest_lang, translator, semaphore=None, memory=None):
+    """Translate a single text string in a worker thread, at most `semaphore` calls at a time; None if it failed."""
     if not text:
         return text
+    if memory is not None:
+        cached = memory.get(text, src_lang, dest_lang)
+        if cached is not None:
+            return cached
     try:
-        # Run synchronous translate in a thread
-        result = await asyncio.to_thread(translator.translate, text, src=src_lang, dest=dest_lang)
-        return result.text if hasattr(result, 'text') else result
+        if semaphore is None:
+            translated = await asyncio.to_thread(translator.translate, text, src_lang, dest_lang)
+        else:
+            async with semaphore:
+                translated = await asyncio.to_thread(translator.translate, text, src_lang, dest_lang)
     except Exception as e:
         print(f"Error translating '{text}' to '{dest_lang}': {e}")
-        return text
+        return None
+    if placeholders(translated) != placeholders(text):
+        print(f"Warning: placeholders changed translating '{text}' to '{dest_lang}': {translated}")
+    if memory is not None:
+        memory.put(text, src_lang, dest_lang, translated)
+    return translated
 
 
-async def translate_language_file(language_file, src_lang, target_langs, translater, all_languages):
-    """Translate the language file content into multiple target languages."""
-    translated_files_temp = {}
+def changed_keys(language_file, previous):
+    """Keys that are new or different compared to the previous source file; None means everything."""
+    if previous is None:
+        return None
+    return {key for key, value in language_file.items() if previous.get(key) != value}
+
+
+async def translate_language_file(language_file, src_lang, target_langs, translater, all_languages,
+                                  concurrency=8, memory=None, changed=None):
+    """Translate the language file content into multiple target languages.
+
+    Returns (files, failed): the content of every target file, and {language: keys whose translation failed}.
+    Every distinct string of every target language is translated concurrently, at most `concurrency` at a time.
+    With `changed` ({language: set of keys, or None for all}), the other keys of a language are copied from its
+    existing file where it has them. A key whose translation failed keeps its existing translation, or the source
+    text if it has none.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
     if isinstance(target_langs, dict):
         target_langs_temp = target_langs.keys()
     else:
         target_langs_temp = target_langs
+
+    plans = {}
+    texts = set()
     for lang in target_langs_temp:
         if src_lang == lang:
             continue
+        existing = {}
+        lang_changed = changed.get(lang) if changed is not None else None
+        if lang_changed is not None and os.path.exists(language_file_path(lang)):
+            existing = read_language_file(language_file_path(lang))
+        keys = [key for key, value in language_file.items()
+                if isinstance(value, (str, list)) and key not in ('language_simple', 'language_name')
+                and (lang_changed is None or key in lang_changed or key not in existing)]
+        plans[lang] = (existing, keys)
+        for key in keys:
+            value = language_file[key]
+            for item in (value if isinstance(value, list) else [value]):
+                if isinstance(item, str) and item:
+                    texts.add((item, lang))
+        print(f"Translating {len(keys)} keys from '{src_lang}' to '{lang}'...")
+
+    pairs = sorted(texts)
+    results = await asyncio.gather(*(translate_text(text, src_lang, lang, translater, semaphore, memory)
+                                     for text, lang in pairs))
+    translations = dict(zip(pairs, results))
+    if memory is not None:
+        memory.commit()
+
+    translated_files_temp = {}
+    failed = {}
+    for lang, (existing, keys) in plans.items():
+        keys = set(keys)
+        failed[lang] = set()
         translated_content = {}
-        if isinstance(target_langs, dict):
-            print(f"Translating from '{target_langs[src_lang]}' to '{target_langs[lang]}'...")
-        else:
-            print(f"Translating from '{src_lang}' to '{lang}'...")
         for key, value in language_file.items():
             if key == 'language_simple':
                 translated_content[key] = lang
-                continue
-            if key == "language_name":
-                translated_content[key] = str.capitalize(all_languages[lang])
-                continue
-            if isinstance(value, str):
-                translated_content[key] = await translate_text(value, src_lang, lang, translater)
-                print(f"Translated '{key}' to '{lang}': {translated_content[key]}")
+            elif key == "language_name":
+                translated_content[key] = str.capitalize(all_languages.get(lang, lang))
+            elif key not in keys:
+                translated_content[key] = existing.get(key, value)
+            elif any(isinstance(item, str) and item and translations[(item, lang)] is None
+                     for item in (value if isinstance(value, list) else [value])):
+                failed[lang].add(key)
+                translated_content[key] = existing.get(key, value)
+            elif isinstance(value, str):
+                translated_content[key] = translations.get((value, lang), value)
             elif isinstance(value, list):
-                translated_content[key] = [
-                    await translate_text(item, src_lang, lang, translater) for item in value
-                ]
-                print(f"Translated '{key}' to '{lang}': {translated_content[key]}")
-            else:
-                translated_content[key] = value
-                # print(f"Warning: Key '{key}' has non-string/list value '{value}', copied as-is.")
+                translated_content[key] = [translations.get((item, lang), item) if isinstance(item, str) else item
+                                           for item in value]
         translated_files_temp[lang] = translated_content
-    return translated_files_temp
+    return translated_files_temp, failed
 
 
 def save_to_json_files(translated_files_temp):
     """Save translated content to JSON files."""
     for lang, content in translated_files_temp.items():
-        file_name = f"lang/language_{lang}.json"
+        file_name = language_file_path(lang)
         os.makedirs(os.path.dirname(file_name), exist_ok=True)
         try:
             with open(file_name, "w", encoding="utf-8") as json_file:
@@ -94,30 +250,67 @@ def save_to_json_files(translated_files_temp):
             print(f"Error saving '{file_name}': {e}")
 
 
-async def main(target_langs_t=None, src_lang_content=None):
-    all_languages = googletrans.LANGUAGES
+async def main(target_langs_t=None, src_lang_content=None, backend='google', concurrency=8, memory_path=None,
+               incremental=False):
+    translater = backend if not isinstance(backend, str) else BACKENDS[backend]()
+    all_languages = translater.languages
+    if target_langs_t is None:
+        target_langs_t = all_languages
+    src_lang = src_lang_content.get("language_simple")
+    memory = TranslationMemory(memory_path) if memory_path else None
+
     try:
-        # Test proxy connectivity
-        if target_langs_t is None:
-            target_langs_t = all_languages
-        translater = Translator()
-        # test_translation = translater.translate("你好", dest='en', src='auto')
-        src_lang = src_lang_content.get("language_simple")
-    except FileNotFoundError:
-        print("Error: 'lang/lang_fr.json' not found.")
+        changed = None
+        if incremental and memory is not None:
+            changed = {lang: changed_keys(src_lang_content, memory.source_snapshot(src_lang, lang))
+                       for lang in target_langs_t if lang != src_lang}
+            for lang, keys in changed.items():
+                if keys is not None:
+                    print(f"{len(keys)} keys changed since the last run into '{lang}'.")
+
+        # Translate the file
+        start = time.perf_counter()
+        translated_files, failed = await translate_language_file(src_lang_content, src_lang, target_langs_t,
+                                                                 translater, all_languages, concurrency, memory,
+                                                                 changed)
+
+        # Save translated content to files
+        save_to_json_files(translated_files)
+        for lang, keys in failed.items():
+            if keys:
+                print(f"{len(keys)} keys could not be translated to '{lang}' and are tried again on the next run.")
+        if memory is not None:
+            # Each target has its own snapshot, so translating into one language does not hide changes from the
+            # others. Keys that failed are left out, so an incremental run takes them as changed.
+            for lang in translated_files:
+                memory.save_source_snapshot(src_lang, lang, {key: value for key, value in src_lang_content.items()
+                                                             if key not in failed[lang]})
+            print(f"Translation memory: {memory.hits} hits, {memory.misses} misses")
+        print(f"Translation completed in {time.perf_counter() - start:.1f}s!")
+    finally:
+        if memory is not None:
+            memory.close()
 
-    # Translate the file
-    translated_files = await translate_language_file(src_lang_content, src_lang, target_langs_t, translater,
-                                                     all_languages)
 
-    # Save translated content to files
-    save_to_json_files(translated_files)
-    print("Translation completed!")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate lang/*.json files by machine translation.')
+    parser.add_argument('targets', nargs='*', help='target language codes (default: a built-in list)')
+    parser.add_argument('--source', default=SOURCE_FILE, help='source language file')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='google')
+    parser.add_argument('--stub-delay', type=float, default=0.0, help='seconds per call of the stub backend')
+    parser.add_argument('-j', '--concurrency', type=int, default=8, help='translations in flight at once')
+    parser.add_argument('--memory', default=data_file_path('translation_memory.sqlite3'),
+                        help="translation memory database ('' to disable)")
+    parser.add_argument('--incremental', action='store_true',
+                        help='only translate keys that changed in the source file since the last run')
+    parser.add_argument('--proxy', default='http://127.0.0.1:7890', help="proxy URL ('' for none)")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    set_proxy("http://127.0.0.1:7890")
-    # set some languages code
-    target_langs = ["en", "ja", "fr", "de", "ru", "pt", "es", "ar", "bg", "is", "da", "nl", "it", "pl", "ro",]
-    srclang_file = read_language_file("lang/lang_zh-CN.json")
-    asyncio.run(main(target_langs, srclang_file))
+    args = parse_args()
+    set_proxy(args.proxy)
+    backend = StubBackend(args.stub_delay) if args.backend == 'stub' else args.backend
+    srclang_file = read_language_file(args.source)
+    asyncio.run(main(args.targets or DEFAULT_TARGETS, srclang_file, backend, args.concurrency, args.memory or None,
+                     args.incremental))
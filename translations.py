@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import pickle
+import string
+import threading
+
+# Translation files live next to the program, so it finds them whatever the working directory.
+LANG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lang')
+# Bump when the compiled form changes, so stale caches are rebuilt.
+CACHE_VERSION = 1
+
+DEFAULT_TRANSLATIONS = {
+    'en': {
+        'language_name': 'English',
+        "language_simple": "en",
+        'window_title': 'YT-DLP Visual Batch Downloader',
+        'url_label': 'Video URL (supports multiple lines, auto-reads clipboard):',
+        'path_label': 'Save Path:',
+        'browse_button': 'Browse',
+        'prefix_label': 'File Prefix (optional):',
+        'prefix_none': 'None',
+        'prefix_date': 'Date: {date}',
+        'prefix_datetime': 'DateTime: {datetime}',
+        'download_type_label': 'Download Type:',
+        'file_format_label': 'File Format:',
+        'video_quality_label': 'Video Quality (select or custom):',
+        'audio_quality_label': 'Audio Quality (select or custom):',
+        'proxy_label': 'Proxy Settings (optional, e.g., http://127.0.0.1:7890; separate several with commas):',
+        'ffmpeg_label': 'FFmpeg Path (optional):',
+        'ffmpeg_placeholder': 'Optional, e.g., /usr/bin/ffmpeg or ffmpeg.exe',
+        'extra_params_label': 'Extra yt-dlp Parameters (optional, space-separated):',
+        'extra_params_placeholder': 'e.g., --no-playlist --embed-subs',
+        'concurrency_label': 'Concurrent downloads:',
+        'per_host_limit_label': 'Max downloads per site (0 = unlimited):',
+        'rate_limit_label': 'Speed limit in KiB/s (0 = unlimited):',
+        'download_button': 'Start Download',
+        'stop_button': 'Stop Download',
+        'exit_button': 'Exit',
+        'log_group_title': 'Download Log',
+        'error_no_url_path': '❗ Please provide URL and save path.',
+        'download_start': '🚀 Starting download of {count} videos...',
+        'download_stopped': '🛑 Download stopped',
+        'download_start_single': '[{index}] Starting download: {url}',
+        'download_progress': '⬇ Downloading: {percent} Speed: {speed} ETA: {eta}',
+        'download_completed': '✅ Download completed: {filename}',
+        'extra_params_applied': 'Applied extra parameters: {params}',
+        'extra_params_error': '❌ Error parsing extra parameters: {error}',
+        'download_error': '❌ Download error: {error}',
+        'metadata_cache_stats': 'Metadata cache: {hits} hits, {misses} misses',
+        'archive_skipped': '⏭ {count} items were already downloaded and are skipped',
+        'archive_skipped_single': '⏭ Already downloaded: {url}',
+        'resume_batch': '♻ Resuming an unfinished batch of {count} URLs',
+        'resume_jobs': '♻ {count} unfinished items left in this batch',
+        'resume_partial': 'Continuing partial download {filename} ({size})',
+        'postprocess_completed': '🎬 Converted: {filename}',
+        'postprocess_error': '❌ Conversion failed: {error}',
+        'video_transcode': '⚠️ No video stream fits {target} as it is; the {codec} video will be re-encoded',
+        'audio_transcode': '⚠️ No audio stream fits {target} as it is; the {codec} audio will be re-encoded',
+        'disk_space_error': '❌ Not enough disk space in {path}: the batch needs about {needed}, {free} is free',
+        'move_error': 'Could not move {filename} to the save path: {error}',
+        'bandwidth_status': '📶 Bandwidth: {achieved} of {target}',
+        'bandwidth_summary': '📶 Average speed {average} (limit {target})',
+        'fragment_tuning': '🧩 {fragments} fragments over {concurrency} connections at {speed}; '
+                           'next download from this site uses {next}',
+        'metrics_summary': '⏱ {jobs} jobs in {seconds}: extraction {extract}, first byte {ttfb}, '
+                           'download {download}, post-processing {postprocess}; {size} at {speed}, {retries} retries',
+        'proxy_down': '🌐 Proxy {proxy} is down, jobs go through the other proxies: {error}',
+        'proxy_up': '🌐 Proxy {proxy} is up ({latency} ms)',
+        'proxy_failover': '🌐 Connection through {proxy} failed, trying another proxy: {error}',
+        'proxy_summary': '🌐 {proxy}: {jobs} jobs, {failures} failed, {size} at {speed}, latency {latency} ms',
+        'stats_button': 'Statistics',
+        'stats_title': 'Download Statistics',
+        'stats_headers': ['#', 'URL', 'State', 'Extraction', 'First byte', 'Download', 'Post-processing', 'Size',
+                          'Average speed', 'Peak speed', 'Retries', 'Proxy'],
+        'proxy_stats_headers': ['Proxy', 'State', 'Latency', 'Throughput', 'Jobs', 'Failures', 'Downloaded'],
+        'proxy_state_up': 'Up',
+        'proxy_state_down': 'Down',
+        'stats_refresh_button': 'Refresh',
+        'stats_export_jsonl_button': 'Export JSON Lines',
+        'stats_export_prometheus_button': 'Export Prometheus',
+        'stats_close_button': 'Close',
+        'stats_export_error': '❌ Export failed: {error}',
+        'url_tab': 'URLs',
+        'queue_tab': 'Queue',
+        'import_button': 'Import...',
+        'clear_queue_button': 'Clear Queue',
+        'import_file_filter': 'URL lists ({patterns});;All files (*)',
+        'import_progress': 'Importing... {count} URLs ({duplicates} duplicates skipped)',
+        'import_finished': 'Imported {count} URLs ({duplicates} duplicates skipped); '
+                           '{total} waiting for the next download.',
+        'import_error': '❌ Import failed: {error}',
+        'queue_headers': ['#', 'URL', 'Status', 'Progress'],
+        'queue_state_queued': 'Queued',
+        'queue_state_pending': 'Waiting',
+        'queue_state_extracting': 'Extracting',
+        'queue_state_downloading': 'Downloading',
+        'queue_state_post-processing': 'Post-processing',
+        'queue_state_done': 'Done',
+        'queue_state_failed': 'Failed',
+        'keep_partial_label': 'Keep the partial files of stopped and cancelled downloads, to resume them later',
+        'staging_label': 'Staging Directory (optional, unfinished files are kept there):',
+        'staging_placeholder': 'e.g., a local disk when the save path is a network share',
+        'cancel_job_action': 'Cancel',
+        'pause_job_action': 'Pause',
+        'resume_job_action': 'Resume',
+        'priority_menu': 'Bandwidth priority',
+        'priority_low': 'Low',
+        'priority_normal': 'Normal',
+        'priority_high': 'High',
+        'job_priority': 'Bandwidth priority: {priority}',
+        'stopping': '⏳ Stopping...',
+        'job_cancelled': '⏹ Cancelled',
+        'job_paused': '⏸ Paused',
+        'job_resumed': '▶ Resumed',
+        'queue_state_paused': 'Paused',
+        'queue_state_cancelled': 'Cancelled',
+        'stage_depths': 'Downloading {downloading} ({download_waiting} waiting) · '
+                        'Converting {converting} ({convert_waiting} waiting)',
+        'preflight_start': '🔎 Checking {count} URLs...',
+        'preflight_error': '❌ Could not read {url}: {error}',
+        'preflight_summary': '📋 {count} items queued ({duplicates} duplicates skipped), '
+                             'about {size} ({unknown} items of unknown size), total duration {duration}',
+        'download_types': ['Video + Audio', 'Video Only', 'Audio Only', 'Subtitles Only'],
+        'video_formats': ['mp4', 'webm', 'mkv', 'flv'],
+        'audio_formats': ['mp3', 'wav', 'aac', 'flac', 'opus'],
+        'combined_formats': ['mp4', 'mkv', 'webm'],
+        'no_format': 'None',
+        'subtitle_formats': ['Original', 'srt', 'vtt', 'ass', 'lrc'],
+        'subtitle_languages_label': 'Subtitle languages:',
+        'subtitle_languages_placeholder': 'e.g. en, zh-Hans|zh (| separates alternatives)',
+        'auto_subtitles_label': 'Use automatic captions when there are no uploaded subtitles',
+        'subtitle_saved': '📝 Subtitles ({language}): {filename}',
+        'subtitle_saved_automatic': '📝 Automatic captions ({language}): {filename}',
+        'subtitle_error': '❌ Subtitles ({language}) failed: {error}',
+        'subtitles_not_found': 'ℹ️ No subtitles in the requested languages: {url}',
+        'subtitle_no_ffmpeg': '⚠️ ffmpeg not found, subtitles are saved as they are instead of as {format}',
+        'video_qualities': ['Auto', '8K', '4K', '1080p', '720p', '480p', '360p', '240p'],
+        'audio_qualities': ['Auto', '320 kbps', '256 kbps', '192 kbps', '128 kbps', '96 kbps'],
+        'video_quality_placeholder': 'Custom format',
+        'audio_quality_placeholder': 'Custom quality',
+        'language_label': 'Language:'
+    }
+}
+
+class _Placeholders(dict):
+    """Format mapping that leaves unknown placeholders in the text instead of raising KeyError."""
+
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+def compile_template(text):
+    """Return text itself when it needs no formatting, else (text, names of its placeholders)."""
+    if '{' not in text and '}' not in text:
+        return text
+    try:
+        fields = frozenset(field.split('.')[0].split('[')[0]
+                           for _, field, _, _ in string.Formatter().parse(text) if field is not None)
+    except ValueError:
+        # Unbalanced braces: show the text as it is.
+        return text
+    return text, fields
+
+
+def compile_translations(data):
+    """Turn the contents of a language file into its catalog form.
+
+    Strings are pre-parsed with compile_template, null values become '' and entries whose type does not match
+    the English default (e.g. a 'download_types' that is not a list) are dropped, so English is used instead.
+    """
+    compiled = {}
+    defaults = DEFAULT_TRANSLATIONS['en']
+    for key, value in data.items():
+        if value is None:
+            value = ''
+        if key in defaults and isinstance(defaults[key], list) != isinstance(value, list):
+            continue
+        compiled[key] = compile_template(value) if isinstance(value, str) else value
+    return compiled
+
+
+def format_translation(entry, fallbacks, kwargs):
+    """Fill in a compiled entry; fallbacks are the same entry in English, used when its placeholders do not fit."""
+    if entry.__class__ is not tuple:
+        return entry
+    text, fields = entry
+    if not fields <= kwargs.keys():
+        # The translation uses placeholders the caller does not pass (e.g. a translated '{Error}'): take the
+        # English text if that fits, otherwise keep the unknown placeholders as they are.
+        for fallback in fallbacks:
+            if fallback.__class__ is tuple and fallback[1] <= kwargs.keys():
+                text = fallback[0]
+                break
+        else:
+            try:
+                return text.format_map(_Placeholders(kwargs))
+            except (ValueError, IndexError, TypeError):
+                return text
+    try:
+        return text.format(**kwargs)
+    except (ValueError, IndexError, KeyError, TypeError, AttributeError):
+        return text
+
+
+BUILTIN = compile_translations(DEFAULT_TRANSLATIONS['en'])
+# Caches are named after the compiled form and the built-in strings they were made with; the language files
+# they come from are checked by modification time and size.
+CACHE_KEY = f'v{CACHE_VERSION}.' + hashlib.sha1(
+    json.dumps(DEFAULT_TRANSLATIONS, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+class TranslationCatalog:
+    """Translations of the active language, with English as the fallback for anything it lacks.
+
+    Only these two languages are loaded, when first needed. With a cache_dir, the compiled form of every
+    language file is pickled there and reused as long as the file's modification time and size are unchanged,
+    as is the list of available languages.
+    """
+
+    def __init__(self, lang='en', translation_dir=LANG_DIR, cache_dir=None):
+        self.translation_dir = translation_dir
+        self.cache_dir = cache_dir
+        self.lang = lang
+        self._lock = threading.Lock()
+        self._index = None
+        self._compiled = {}
+        self._active = None
+        self._fallback = None
+
+    def languages(self):
+        """Return {display name: language code} for English and every language file."""
+        languages = {'English': 'en'}
+        for code, name, _ in self._files().values():
+            languages.setdefault(name, code)
+        return languages
+
+    def set_language(self, lang):
+        self.lang = lang
+        self._active = None
+
+    def get(self, key, **kwargs):
+        """Translate key into the active language and fill in its placeholders; lists are returned as they are."""
+        active = self._active
+        if active is None:
+            active = self._load_active()
+        fallback = self._fallback
+        entry = active.get(key)
+        if entry is None:
+            entry = fallback.get(key)
+        if entry is None:
+            entry = BUILTIN.get(key, '')
+        return format_translation(entry, (fallback.get(key), BUILTIN.get(key)), kwargs)
+
+    def lookup(self, lang, key, default=None):
+        """Return the raw (unformatted) value of key in lang, falling back to English."""
+        value = self._language(lang).get(key)
+        if value is None:
+            value = self._language('en').get(key, default)
+        return value[0] if value.__class__ is tuple else value
+
+    def _load_active(self):
+        self._fallback = self._language('en')
+        self._active = self._language(self.lang)
+        return self._active
+
+    def _files(self):
+        """Return {file name: (language code, display name, (mtime, size))} for the lang directory."""
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            cached = self._read_cache('index') or {}
+            index = {}
+            try:
+                entries = sorted((entry for entry in os.scandir(self.translation_dir)
+                                  if entry.name.endswith('.json') and entry.is_file()), key=lambda e: e.name)
+            except OSError:
+                print(f"Translation directory '{self.translation_dir}' not found. Using default translations.")
+                entries = []
+            for entry in entries:
+                stat = entry.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if entry.name in cached and cached[entry.name][2] == signature:
+                    index[entry.name] = cached[entry.name]
+                    continue
+                data = self._read_file(entry.path)
+                if data is not None and data.get('language_simple'):
+                    code = data['language_simple']
+                    index[entry.name] = (code, data.get('language_name') or code.capitalize(), signature)
+            if index != cached:
+                self._write_cache('index', index)
+            self._index = index
+            return index
+
+    def _language(self, lang):
+        compiled = self._compiled.get(lang)
+        if compiled is not None:
+            return compiled
+        file_name = next((name for name, (code, _, _) in self._files().items() if code == lang), None)
+        with self._lock:
+            if lang in self._compiled:
+                return self._compiled[lang]
+            compiled = dict(BUILTIN) if lang == 'en' else {}
+            if file_name is not None:
+                signature = self._index[file_name][2]
+                cached = self._read_cache(lang)
+                if cached is not None and cached[0] == signature:
+                    compiled = cached[1]
+                else:
+                    data = self._read_file(os.path.join(self.translation_dir, file_name))
+                    if data is not None:
+                        compiled.update(compile_translations(data))
+                        self._write_cache(lang, (signature, compiled))
+            self._compiled[lang] = compiled
+            return compiled
+
+    @staticmethod
+    def _read_file(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else None
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error loading translation file {path}: {e}")
+            return None
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, f'{name}.{CACHE_KEY}.pickle')
+
+    def _read_cache(self, name):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(name), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError):
+            return None
+
+    def _write_cache(self, name, value):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(name)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Error writing translation cache {path}: {e}")
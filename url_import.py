@@ -0,0 +1,79 @@
+"""Read URLs from the files people keep them in, one at a time, so large files need not fit in memory.
+
+    .txt and anything else   one URL per line ('#' comments are skipped); URLs inside other text are found too
+    .csv, .tsv               every URL in every cell
+    .html, .htm              the links of a page, e.g. bookmarks exported from a browser
+    .m3u, .m3u8, .pls        the URLs of a playlist (local file entries are skipped)
+"""
+import csv
+import os
+from html.parser import HTMLParser
+
+from url_intake import extract_urls
+
+IMPORT_FILE_FILTER = '*.txt *.csv *.tsv *.html *.htm *.m3u *.m3u8 *.pls'
+READ_CHUNK = 64 * 1024
+
+
+def iter_text_urls(lines):
+    """Yield the URLs of text lines; a line without an http(s) URL (e.g. 'ytsearch:...') is passed on as it is."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield from extract_urls(line) or [line]
+
+
+def iter_playlist_urls(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith(('#', '[')):
+            yield from extract_urls(line)
+
+
+def iter_csv_urls(f, delimiter=','):
+    for row in csv.reader(f, delimiter=delimiter):
+        for cell in row:
+            yield from extract_urls(cell)
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href') or ''
+            if href.startswith(('http://', 'https://')):
+                self.links.append(href)
+
+
+def iter_html_urls(f):
+    parser = _LinkParser()
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.links
+        parser.links.clear()
+    parser.close()
+    yield from parser.links
+
+
+def iter_file_urls(path, should_stop=None):
+    """Yield the URLs of a file, choosing the parser by its extension; stops early once should_stop() is true."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        if extension in ('.csv', '.tsv'):
+            urls = iter_csv_urls(f, '\t' if extension == '.tsv' else ',')
+        elif extension in ('.html', '.htm'):
+            urls = iter_html_urls(f)
+        elif extension in ('.m3u', '.m3u8', '.pls'):
+            urls = iter_playlist_urls(f)
+        else:
+            urls = iter_text_urls(f)
+        for url in urls:
+            if should_stop is not None and should_stop():
+                return
+            yield url
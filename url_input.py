@@ -0,0 +1,75 @@
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QTextEdit
+
+from download_archive import site_archive_key
+from download_engine import yt_dlp_loaded
+from url_intake import UrlIndex, extract_urls
+
+# Pastes of more lines than this are not put into the text box but passed on through bulk_paste.
+BULK_PASTE_LINES = 1000
+
+
+class UrlInput(QTextEdit):
+    """The URL box: one URL per line, with new URLs appended only when no equivalent URL is in it yet.
+
+    The URLs are kept in a UrlIndex, so checking a copied or pasted URL does not scan the text, and new lines
+    are inserted at the end of the document instead of replacing all of it. The index is rebuilt from the text
+    only after the user has edited it.
+    """
+    bulk_paste = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAcceptRichText(False)
+        self.index = UrlIndex(key_for=site_archive_key, ready=yt_dlp_loaded)
+        self._edited = False
+        self._appending = False
+        self.textChanged.connect(self._on_text_changed)
+
+    def _on_text_changed(self):
+        if not self._appending:
+            self._edited = True
+
+    def lines(self):
+        return [line.strip() for line in self.toPlainText().splitlines() if line.strip()]
+
+    def _sync(self):
+        if self._edited:
+            self.index.rebuild(self.lines())
+            self._edited = False
+
+    def add_urls(self, urls):
+        """Append the URLs that are not in the box yet, in their canonical form; return how many were added."""
+        self._sync()
+        new = [canonical for canonical in map(self.index.add, urls) if canonical]
+        if new:
+            cursor = QTextCursor(self.document())
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            text = '\n'.join(new)
+            if not self.document().isEmpty() and self.document().lastBlock().text().strip():
+                text = '\n' + text
+            self._appending = True
+            try:
+                cursor.insertText(text)
+            finally:
+                self._appending = False
+        return len(new)
+
+    def urls(self):
+        """The URLs of the box without duplicates, in their canonical form."""
+        self._sync()
+        return self.index.urls()
+
+    def insertFromMimeData(self, source):
+        # Pasting nothing but URLs goes through the index; anything else is pasted as it is.
+        if source.hasText():
+            text = source.text()
+            if text.count('\n') >= BULK_PASTE_LINES:
+                self.bulk_paste.emit(text)
+                return
+            urls = extract_urls(text)
+            if urls and not ''.join(text.split()).replace(''.join(urls), ''):
+                self.add_urls(urls)
+                return
+        super().insertFromMimeData(source)
@@ -0,0 +1,166 @@
+import re
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"\']+')
+# Query parameters that only tell a site where a link was shared from, on every site...
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', 'igshid', 'igsh', '_hsenc', '_hsmi',
+    'ref_src', 'ref_url',
+})
+TRACKING_PREFIXES = ('utm_',)
+# ...and on particular sites, where the same names may mean something elsewhere.
+SITE_TRACKING_PARAMS = {
+    'youtube.com': frozenset({'si', 'feature', 'pp', 'ab_channel', 't', 'start', 'index', 'app',
+                              'embeds_referring_euri'}),
+    'twitter.com': frozenset({'s', 't', 'ref_src'}),
+    'x.com': frozenset({'s', 't'}),
+    'instagram.com': frozenset({'img_index'}),
+    'tiktok.com': frozenset({'is_from_webapp', 'sender_device', 'is_copy_url', 'web_id', '_r', '_t'}),
+    'bilibili.com': frozenset({'spm_id_from', 'vd_source', 'from_spmid', 'share_source', 'share_medium',
+                               'share_plat', 'share_session_id', 'share_tag', 'share_from', 'unique_k',
+                               'timestamp', 'bbid', 'ts'}),
+}
+YOUTUBE_HOSTS = frozenset({'youtube.com', 'youtu.be', 'youtube-nocookie.com', 'music.youtube.com'})
+YOUTUBE_PATH_PATTERN = re.compile(r'/(?:shorts|embed|live|v|e)/([\w-]{11})(?:[/?]|$)')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def extract_urls(text):
+    """Return the http(s) URLs in a piece of text (one per line, or mixed with other words)."""
+    return [url.rstrip('.,;)]') for url in URL_PATTERN.findall(text)]
+
+
+def site_of(host):
+    """'www.youtube.com' and 'm.youtube.com' -> 'youtube.com'."""
+    for prefix in ('www.', 'm.', 'mobile.'):
+        if host.startswith(prefix):
+            return host[len(prefix):]
+    return host
+
+
+def _query_pairs(query):
+    for pair in query.split('&'):
+        if pair:
+            key, _, value = pair.partition('=')
+            yield unquote_plus(key), pair, unquote_plus(value)
+
+
+def _youtube_url(path, pairs):
+    """The watch?v= form of a YouTube video URL (keeping a playlist), or None for other YouTube pages."""
+    params = {key: value for key, _, value in pairs}
+    video_id = params.get('v') if path in ('/watch', '/watch/') else None
+    if not video_id:
+        match = YOUTUBE_PATH_PATTERN.match(path)
+        video_id = match.group(1) if match else None
+    if video_id:
+        query = f'v={video_id}' + (f"&list={params['list']}" if params.get('list') else '')
+        return f'https://www.youtube.com/watch?{query}'
+    if path.rstrip('/') == '/playlist' and params.get('list'):
+        return f"https://www.youtube.com/playlist?list={params['list']}"
+    return None
+
+
+def canonical_url(url):
+    """Normalise a URL so that equivalent links compare equal.
+
+    Lower-cases scheme and host, drops default ports, the fragment and tracking parameters (keeping the other
+    parameters as they were written), and rewrites youtu.be, shorts, embed and mobile YouTube links to
+    https://www.youtube.com/watch?v=ID.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    site = site_of(host)
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    pairs = list(_query_pairs(parts.query))
+
+    if site in YOUTUBE_HOSTS:
+        path = parts.path
+        if site == 'youtu.be':
+            path = f'/shorts{path}'
+        youtube = _youtube_url(path, pairs)
+        if youtube:
+            return youtube
+
+    site_params = SITE_TRACKING_PARAMS.get(site, ())
+    query = '&'.join(raw for key, raw, _ in pairs if key not in TRACKING_PARAMS and key not in site_params
+                     and not key.startswith(TRACKING_PREFIXES))
+    netloc = host
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{host}:{port}'
+    if parts.username:
+        netloc = f'{parts.username}{":" + parts.password if parts.password else ""}@{netloc}'
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+class UrlIndex:
+    """Hash index of the URLs of a batch, to tell in O(1) whether a URL is already in it.
+
+    A URL is known under its canonical_url() and, when `key_for` gives one, under an extractor key such as
+    'youtube:ID' (download_archive.site_archive_key), so every form a site accepts for the same video
+    matches. `ready` tells whether key_for can be used yet: it needs yt-dlp, which is loaded in the
+    background, and URLs added before that are given their extractor key once it is.
+    """
+
+    def __init__(self, urls=(), key_for=None, ready=None):
+        self.key_for = key_for
+        self.ready = ready or (lambda: True)
+        self._keys = {}
+        self._urls = []
+        self._unresolved = []
+        for url in urls:
+            self.add(url)
+
+    def __len__(self):
+        return len(self._urls)
+
+    def __contains__(self, url):
+        canonical = canonical_url(url)
+        if canonical in self._keys:
+            return True
+        key = self._extractor_key(canonical)
+        return key is not None and key in self._keys
+
+    def urls(self):
+        """The canonical URLs in the order they were added."""
+        return list(self._urls)
+
+    def _extractor_key(self, canonical):
+        if self.key_for is None or not self.ready():
+            return None
+        if self._unresolved:
+            unresolved, self._unresolved = self._unresolved, []
+            for url in unresolved:
+                key = self.key_for(url)
+                if key is not None:
+                    self._keys.setdefault(key, url)
+        return self.key_for(canonical)
+
+    def add(self, url):
+        """Add a URL; return its canonical form if it was new, or None if an equivalent URL is already known."""
+        canonical = canonical_url(url)
+        if canonical in self._keys:
+            return None
+        key = self._extractor_key(canonical)
+        if key is not None and key in self._keys:
+            return None
+        self._keys[canonical] = canonical
+        if key is not None:
+            self._keys[key] = canonical
+        elif self.key_for is not None and not self.ready():
+            self._unresolved.append(canonical)
+        self._urls.append(canonical)
+        return canonical
+
+    def clear(self):
+        self._keys.clear()
+        self._urls.clear()
+        self._unresolved.clear()
+
+    def rebuild(self, urls):
+        self.clear()
+        for url in urls:
+            self.add(url)
@@ -0,0 +1,363 @@
+"""Download a batch of URLs without the GUI, using the settings saved by yt_dlp_gui.py.
+
+    python yt_dlp_cli.py https://www.youtube.com/watch?v=... https://...
+    python yt_dlp_cli.py -i urls.txt --mode audio --format mp3
+    python yt_dlp_cli.py -i urls.txt -o /mnt/share/videos --staging-dir /tmp/yt-dlp-staging
+    python yt_dlp_cli.py -i urls.txt --proxy 'http://127.0.0.1:7890, socks5://127.0.0.1:1080'
+    python yt_dlp_cli.py -i urls.txt --mode subtitles --sub-langs 'en, zh-Hans|zh' --format srt
+    cat urls.txt | python yt_dlp_cli.py --json > progress.jsonl
+    python yt_dlp_cli.py --resume
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+
+from app_paths import config_file_path, data_file_path, legacy_config_paths
+from bandwidth import config_weights, parse_rate, parse_weight
+from download_engine import DOWNLOAD_MODES, DownloadEngine, open_job_queue
+from progress_events import format_bytes, format_eta
+from proxy_pool import DEFAULT_CHECK_INTERVAL, DEFAULT_CHECK_URL
+from settings_store import SettingsStore
+from subtitles import DEFAULT_LANGUAGES, SUBTITLE_FORMATS
+from translations import TranslationCatalog
+from url_import import iter_file_urls, iter_text_urls
+from url_intake import UrlIndex
+
+DEFAULT_CONFIG = {
+    'path': '.',
+    'prefix': '',
+    'video_format': 'mp4',
+    'audio_format': 'mp3',
+    'video_quality': '',
+    'audio_quality': '',
+    'proxy': '',
+    'ffmpeg_path': '',
+    'staging_dir': '',
+    'language': 'en',
+    'extra_params': '',
+    'max_workers': 3,
+    'per_host_limit': 0,
+    'rate_limit': 0,
+    'metadata_cache_ttl': 24 * 3600,
+    'preflight': True,
+    'adaptive_fragments': True,
+    'use_archive': True,
+    'proxy_check_url': DEFAULT_CHECK_URL,
+    'proxy_check_interval': DEFAULT_CHECK_INTERVAL,
+    'host_weights': {},
+    'keep_partial': True,
+    'subtitle_languages': DEFAULT_LANGUAGES,
+    'auto_subtitles': True
+}
+
+
+def read_urls(args):
+    urls = list(args.urls)
+    for name in args.input or []:
+        if name == '-':
+            urls.extend(iter_text_urls(sys.stdin))
+            continue
+        urls.extend(iter_file_urls(name))
+    if not urls and not args.input and not args.resume and not sys.stdin.isatty():
+        urls.extend(iter_text_urls(sys.stdin))
+    # Links to the same video in other forms (youtu.be, tracking parameters, ...) are downloaded once.
+    return UrlIndex(urls).urls()
+
+
+def config_download_mode(config, catalog):
+    """Return the internal download mode of a saved config.
+
+    The GUI saves 'download_mode'; older configs only have the combo box text, in the GUI's language.
+    """
+    if config.get('download_mode') in DOWNLOAD_MODES:
+        return config['download_mode']
+    for lang in (config['language'], 'en'):
+        download_types = catalog.lookup(lang, 'download_types')
+        if isinstance(download_types, list) and config.get('download_type') in download_types[:len(DOWNLOAD_MODES)]:
+            return DOWNLOAD_MODES[download_types.index(config['download_type'])]
+    return DOWNLOAD_MODES[0]
+
+
+def config_quality(value, key, config, catalog):
+    """Map the first ('Auto') entry of a quality list, as saved by the GUI, to '' so yt-dlp picks the best."""
+    value = (value or '').strip()
+    for lang in (config['language'], 'en'):
+        qualities = catalog.lookup(lang, key)
+        if isinstance(qualities, list) and qualities and value == qualities[0]:
+            return ''
+    return value
+
+
+def build_settings(args, config, catalog):
+    """Combine config.json and the command line into the batch settings the engine (and job queue) take."""
+    download_mode = args.mode or config_download_mode(config, catalog)
+    if download_mode == 'audio':
+        file_format = (args.format or config.get('audio_format') or 'mp3').lower()
+    else:
+        file_format = (args.format or config.get('video_format') or 'mp4').lower()
+    return {
+        'urls': [], 'path': args.path or config['path'], 'download_mode': download_mode,
+        'video_format': file_format if download_mode in ('video', 'video_audio') else '',
+        'audio_format': file_format if download_mode == 'audio' else '',
+        'prefix': config.get('prefix') or '',
+        'proxy': args.proxy if args.proxy is not None else config['proxy'],
+        'ffmpeg_path': config['ffmpeg_path'],
+        'staging_dir': args.staging_dir if args.staging_dir is not None else config['staging_dir'],
+        'video_quality': args.video_quality or config_quality(config['video_quality'], 'video_qualities', config,
+                                                              catalog),
+        'audio_quality': args.audio_quality or config_quality(config['audio_quality'], 'audio_qualities', config,
+                                                              catalog),
+        'extra_params': args.extra_params if args.extra_params is not None else config['extra_params'],
+        'max_workers': args.workers or int(config['max_workers']),
+        'per_host_limit': args.per_host_limit if args.per_host_limit is not None else int(config['per_host_limit']),
+        'metadata_cache_ttl': int(config['metadata_cache_ttl']),
+        'preflight': bool(config['preflight']),
+        'adaptive_fragments': bool(config['adaptive_fragments']),
+        'use_archive': bool(config['use_archive']),
+        'proxy_check_url': config['proxy_check_url'],
+        'proxy_check_interval': int(config['proxy_check_interval']),
+        'host_weights': {**config_weights(config['host_weights']), **dict(args.weight or [])},
+        'keep_partial': bool(config['keep_partial']) and not args.delete_partial,
+        'subtitle_languages': args.sub_langs or config['subtitle_languages'] or DEFAULT_LANGUAGES,
+        'subtitle_format': file_format if download_mode == 'subtitles' and file_format in SUBTITLE_FORMATS else '',
+        'auto_subtitles': bool(config['auto_subtitles']) and not args.no_auto_subs,
+        # config.json has the GUI's KiB/s.
+        'rate_limit': args.limit_rate if args.limit_rate is not None else int(config['rate_limit']) * 1024
+    }
+
+
+class Reporter:
+    """Print engine output: JSON lines on stdout with --json, otherwise readable lines on stderr."""
+
+    def __init__(self, as_json, get_translation):
+        self.as_json = as_json
+        self.get_translation = get_translation
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        with self._lock:
+            print(json.dumps({'event': event, **fields}, ensure_ascii=False), flush=True)
+
+    def text(self, message):
+        with self._lock:
+            print(message, file=sys.stderr, flush=True)
+
+    def log(self, message):
+        if self.as_json:
+            self.emit('log', message=message)
+        else:
+            self.text(message)
+
+    def progress(self, event):
+        if self.as_json:
+            self.emit('progress', job_id=event.job_id, status=event.status, downloaded_bytes=event.downloaded_bytes,
+                      total_bytes=event.total_bytes, percent=event.percent, speed=event.speed, eta=event.eta,
+                      filename=event.filename)
+        elif event.status == 'downloading':
+            percent = f'{event.percent:.1f}%' if event.percent is not None else format_bytes(event.downloaded_bytes)
+            self.text(f'[{event.job_id}] ' + self.get_translation(
+                'download_progress', percent=percent, speed=format_bytes(event.speed) + '/s',
+                eta=format_eta(event.eta)))
+        elif event.status == 'finished':
+            self.text(f'[{event.job_id}] ' + self.get_translation('download_completed', filename=event.filename))
+
+    def ytdlp(self, level, message):
+        if self.as_json:
+            self.emit('ytdlp', level=level, message=message)
+        else:
+            self.text(message)
+
+    def stages(self, depths):
+        if self.as_json:
+            self.emit('stages', **{stage: {'running': running, 'waiting': waiting}
+                                   for stage, (running, waiting) in depths.items()})
+
+    def job(self, job):
+        if self.as_json:
+            self.emit('job', job_id=job.job_id, url=job.url, title=job.title, state=job.state, error=job.error)
+
+
+class YtdlpLogger:
+    """yt-dlp's 'logger' option: keeps its console output off stdout; screen messages only with --verbose."""
+
+    def __init__(self, reporter, verbose=False):
+        self.reporter = reporter
+        self.verbose = verbose
+
+    def debug(self, message):
+        if self.verbose:
+            self.reporter.ytdlp('debug', message)
+
+    def info(self, message):
+        if self.verbose:
+            self.reporter.ytdlp('info', message)
+
+    def warning(self, message):
+        self.reporter.ytdlp('warning', message)
+
+    def error(self, message):
+        # Errors that fail a job are reported by the engine as well.
+        if self.verbose:
+            self.reporter.ytdlp('error', message)
+
+
+def run_batch(settings, batch_id, job_queue, reporter, get_translation, progress_rate, engines, logger,
+              metrics_path=None, prometheus_path=None):
+    """Run one batch to the end; return the final state of each of its jobs.
+
+    Its metrics are appended to metrics_path as JSON lines and written to prometheus_path, if given.
+    """
+    states = {}
+
+    def job_update(job):
+        states[job.job_id] = job.state
+        reporter.job(job)
+
+    engine = DownloadEngine(get_translation=get_translation, job_queue=job_queue, batch_id=batch_id,
+                            log=reporter.log, progress=reporter.progress, job_update=job_update,
+                            progress_rate=progress_rate, ydl_logger=logger, stage_update=reporter.stages,
+                            **settings)
+    engines.append(engine)
+    # An interrupted batch stays unfinished in the job queue, so --resume (or the GUI) can finish it later.
+    engine.run()
+    if engine.options_error is not None or engine.space_error is not None:
+        states[0] = 'failed'
+    try:
+        if metrics_path:
+            engine.metrics.write_jsonl(metrics_path)
+        if prometheus_path:
+            engine.metrics.write_prometheus(prometheus_path)
+    except OSError as e:
+        print(f"Error writing metrics: {e}", file=sys.stderr)
+    if reporter.as_json:
+        bandwidth = engine.governor.stats()
+        reporter.emit('batch', batch_id=batch_id, stopped=engine.stopped,
+                      counts={state: list(states.values()).count(state) for state in set(states.values())},
+                      bandwidth={'target': bandwidth['target'], 'average': bandwidth['average']},
+                      metrics=engine.metrics.summary(), proxies=engine.proxy_stats())
+    return states
+
+
+def rate_argument(text):
+    try:
+        return parse_rate(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def weight_argument(text):
+    try:
+        return parse_weight(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Download videos with yt-dlp using the settings saved by the yt-dlp GUI.')
+    parser.add_argument('urls', nargs='*', help='URLs to download; read from stdin when none are given')
+    parser.add_argument('-i', '--input', action='append', metavar='FILE',
+                        help="read URLs from FILE: a text file with one URL per line ('-' for stdin), CSV, "
+                             "exported bookmarks (HTML) or an M3U playlist; may be repeated")
+    parser.add_argument('-o', '--path', help='save path (default: the GUI setting)')
+    parser.add_argument('--staging-dir', metavar='DIR',
+                        help="download and convert in DIR and move finished files to the save path ('' for none)")
+    parser.add_argument('-m', '--mode', choices=DOWNLOAD_MODES, help='download type')
+    parser.add_argument('-f', '--format', help='output container, audio or subtitle format, e.g. mp4, mkv, mp3, srt')
+    parser.add_argument('--video-quality', help='yt-dlp format selector for the video stream')
+    parser.add_argument('--audio-quality', help='yt-dlp format selector, or bitrate in audio mode')
+    parser.add_argument('--sub-langs', metavar='LANGS',
+                        help="subtitle languages in order of priority, e.g. 'en, zh-Hans|zh' ('|' separates "
+                             "alternatives)")
+    parser.add_argument('--no-auto-subs', action='store_true',
+                        help='only fetch uploaded subtitles, never automatic captions')
+    parser.add_argument('--proxy', help="proxy URL ('' for none); several separated by commas are health-checked "
+                                        "and each download goes through the best working one")
+    parser.add_argument('--extra-params', help='extra yt-dlp command line parameters')
+    parser.add_argument('-w', '--workers', type=int, help='number of concurrent downloads')
+    parser.add_argument('--per-host-limit', type=int, help='max concurrent downloads per site (0 = unlimited)')
+    parser.add_argument('-r', '--limit-rate', type=rate_argument, metavar='RATE',
+                        help='total bandwidth of all downloads, e.g. 500K or 2M per second (0 = unlimited)')
+    parser.add_argument('--weight', action='append', type=weight_argument, metavar='SITE=WEIGHT',
+                        help='share of the bandwidth for the downloads from a site and its subdomains, e.g. '
+                             'youtube.com=2 (default 1); may be repeated')
+    parser.add_argument('--delete-partial', action='store_true',
+                        help='delete the partial files of interrupted downloads instead of keeping them for a resume')
+    parser.add_argument('--config', help='config.json to use instead of the GUI one')
+    parser.add_argument('--lang', help='language of the messages, e.g. en or zh-CN')
+    parser.add_argument('--json', action='store_true', help='print progress as JSON lines on stdout')
+    parser.add_argument('-v', '--verbose', action='store_true', help="also show yt-dlp's own messages")
+    parser.add_argument('--resume', action='store_true', help='first finish the batches that were interrupted')
+    parser.add_argument('--no-queue', action='store_true', help='do not record the batch in the job queue')
+    parser.add_argument('--metrics', metavar='FILE', help='append per-job timings of each batch to FILE (JSON lines)')
+    parser.add_argument('--prometheus', metavar='FILE', help='write the batch metrics to FILE in Prometheus text format')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = dict(DEFAULT_CONFIG)
+    if args.config:
+        config.update(SettingsStore(args.config).load())
+    else:
+        config.update(SettingsStore(config_file_path()).load(legacy_paths=legacy_config_paths()))
+    catalog = TranslationCatalog(args.lang or config['language'], cache_dir=data_file_path('lang_cache'))
+    get_translation = catalog.get
+    reporter = Reporter(args.json, get_translation)
+    logger = YtdlpLogger(reporter, args.verbose)
+    progress_rate = 10 if args.json else 1
+    urls = read_urls(args)
+    if not urls and not args.resume:
+        reporter.log(get_translation('error_no_url_path'))
+        return 2
+
+    job_queue = None if args.no_queue else open_job_queue()
+    engines = []
+
+    def stop(signum, frame):
+        for engine in engines:
+            engine.stop()
+
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, stop)
+
+    failed = False
+    try:
+        if args.resume and job_queue is not None:
+            for batch_id in job_queue.unfinished_batches():
+                settings = job_queue.batch_settings(batch_id)
+                current = build_settings(args, config, catalog)
+                settings['rate_limit'] = current['rate_limit']
+                settings['keep_partial'] = current['keep_partial']
+                try:
+                    reporter.log(get_translation('resume_batch', count=len(settings['urls'])))
+                    states = run_batch(settings, batch_id, job_queue, reporter, get_translation, progress_rate,
+                                       engines, logger, args.metrics, args.prometheus)
+                except (TypeError, KeyError) as e:
+                    print(f"Error resuming batch {batch_id}: {e}", file=sys.stderr)
+                    job_queue.finish_batch(batch_id, 'failed')
+                    continue
+                failed = failed or 'failed' in states.values()
+                if engines[-1].stopped:
+                    return 130
+        if urls:
+            settings = build_settings(args, config, catalog)
+            settings['urls'] = urls
+            reporter.log(get_translation('download_start', count=len(urls)))
+            batch_id = job_queue.create_batch(settings) if job_queue is not None else None
+            states = run_batch(settings, batch_id, job_queue, reporter, get_translation, progress_rate, engines, logger,
+                               args.metrics, args.prometheus)
+            failed = failed or 'failed' in states.values()
+            if engines[-1].stopped:
+                return 130
+    finally:
+        if job_queue is not None:
+            job_queue.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
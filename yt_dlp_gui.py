@@ -1,143 +1,120 @@
+import io
 import sys
 import os
-import pyperclip
-import json
-import glob
+import time
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton,
-    QFileDialog, QTextEdit, QComboBox, QHBoxLayout, QGroupBox, QGridLayout
+    QFileDialog, QComboBox, QHBoxLayout, QGroupBox, QGridLayout, QSpinBox, QTabWidget, QCheckBox, QMenu
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-import yt_dlp
-import re
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
+from app_paths import config_file_path, data_file_path, legacy_config_paths, log_file_path
+from bandwidth import config_weights
+from download_archive import site_archive_key
+from download_engine import DOWNLOAD_MODES, DownloadEngine, open_job_queue, warm_up, yt_dlp_loaded
+from log_view import LogView
+from progress_events import format_bytes, format_eta
+from proxy_pool import DEFAULT_CHECK_INTERVAL, DEFAULT_CHECK_URL
+from queue_view import QueueModel, QueueView
+from settings_store import SettingsStore
+from subtitles import DEFAULT_LANGUAGES
+from translations import TranslationCatalog
+from url_import import IMPORT_FILE_FILTER, iter_file_urls, iter_text_urls
+from url_input import UrlInput
+from url_intake import UrlIndex, extract_urls
+
+# yt-dlp is loaded in the background this long after the window is shown, once it has been painted.
+WARM_UP_DELAY_MS = 300
+# Imported URLs are handed to the queue view in chunks of this many, or every IMPORT_INTERVAL seconds.
+IMPORT_CHUNK = 2000
+IMPORT_INTERVAL = 0.1
+# Bandwidth weights of the priorities a job can be given from the queue's context menu.
+JOB_PRIORITIES = (('priority_low', 0.5), ('priority_normal', 1.0), ('priority_high', 2.0))
 
 
-def parse_string_to_dict(input_string):
-    pattern = r'--(\w+)\s(\S+)|-(\w)\s(\S+)'
-    matches = re.findall(pattern, input_string)
-    result = {}
-    for match in matches:
-        if match[0]:  # long option
-            result[match[0]] = match[1]
-        elif match[2]:  # short option
-            result[match[2]] = match[3]
-    return result
+class DownloadThread(QThread):
+    """Run a DownloadEngine in the background and forward its messages and progress as Qt signals."""
+    log_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(object)
+    stage_signal = pyqtSignal(object)
+    job_signal = pyqtSignal(object)
+    jobs_signal = pyqtSignal(object)
 
+    def __init__(self, get_translation, job_queue=None, batch_id=None, **settings):
+        super().__init__()
+        self.engine = DownloadEngine(get_translation=get_translation, job_queue=job_queue, batch_id=batch_id,
+                                     log=self.log_signal.emit, progress=self.progress_signal.emit,
+                                     stage_update=self.stage_signal.emit, job_update=self.emit_job_update,
+                                     jobs_planned=self.jobs_signal.emit, **settings)
 
-class StopDownloadException(Exception):
-    """Custom exception to signal download interruption."""
-    pass
+    def emit_job_update(self, job):
+        # The job object keeps changing in the worker threads; the GUI gets a snapshot.
+        self.job_signal.emit((job.job_id, job.state, job.error))
 
+    @property
+    def batch_id(self):
+        return self.engine.batch_id
 
-class DownloadThread(QThread):
-    log_signal = pyqtSignal(str)
+    def stop(self):
+        self.engine.stop()
+
+    def run(self):
+        self.engine.run()
 
-    def __init__(self, urls, path, download_type, video_format, audio_format, prefix, proxy, ffmpeg_path,
-                 video_quality, audio_quality, extra_params, get_translation):
+
+class ImportThread(QThread):
+    """Read URLs from a file (see url_import) or a pasted text in the background, dropping duplicates.
+
+    New URLs are added to `index` and sent in chunks through urls_signal; `index` must not be used elsewhere
+    until the thread has finished.
+    """
+    urls_signal = pyqtSignal(object)
+
+    def __init__(self, index, path=None, text=None):
         super().__init__()
-        self.urls = urls
+        self.index = index
         self.path = path
-        self.download_type = download_type
-        self.video_format = video_format
-        self.audio_format = audio_format
-        self.prefix = prefix
-        self.proxy = proxy
-        self.ffmpeg_path = ffmpeg_path
-        self.video_quality = video_quality
-        self.audio_quality = audio_quality
-        self.extra_params = extra_params
+        self.text = text
+        self.added = 0
+        self.duplicates = 0
+        self.error = None
         self._stop_flag = False
-        self.get_translation = get_translation
 
     def stop(self):
-        """Set the stop flag to signal the thread to stop."""
         self._stop_flag = True
 
     def run(self):
-        for i, url in enumerate(self.urls, 1):
-            if self._stop_flag:
-                self.log_signal.emit(self.get_translation('download_stopped'))
-                break
-            self.log_signal.emit(self.get_translation('download_start_single', index=i, url=url))
-            self.download_single(url)
-
-    def download_single(self, url):
-        def progress_hook(d):
-            if self._stop_flag:
-                raise StopDownloadException("Download interrupted by user")
-            if d['status'] == 'downloading':
-                percent = d.get('_percent_str', '').strip()
-                speed = d.get('_speed_str', '')
-                eta = d.get('_eta_str', '')
-                self.log_signal.emit(self.get_translation('download_progress', percent=percent, speed=speed, eta=eta))
-            elif d['status'] == 'finished':
-                self.log_signal.emit(self.get_translation('download_completed', filename=d['filename']))
-
-        ydl_opts = {
-            'outtmpl': os.path.join(self.path, f'{self.prefix}%(title)s.%(ext)s'),
-            'progress_hooks': [progress_hook],
-        }
-
-        if self.proxy:
-            ydl_opts['proxy'] = self.proxy
-
-        if self.ffmpeg_path:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_path
-
-        if self.download_type == '只下载音频':
-            ydl_opts.update({
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': self.audio_format,
-                    'preferredquality': self.audio_quality or '192',
-                }],
-            })
-            ydl_opts['outtmpl'] = os.path.join(self.path, f'{self.prefix}%(title)s.{self.audio_format}')
-            ydl_opts.pop('merge_output_format', None)
-        elif self.download_type == '只下载视频':
-            video_fmt = self.video_quality if self.video_quality else 'bestvideo'
-            ydl_opts['format'] = f'{video_fmt}'
-            ydl_opts['outtmpl'] = os.path.join(self.path, f'{self.prefix}%(title)s.{self.video_format}')
-            ydl_opts['merge_output_format'] = self.video_format
-        elif self.download_type == '音视频同时下载':
-            video_fmt = self.video_quality if self.video_quality else 'bestvideo'
-            audio_fmt = self.audio_quality if self.audio_quality else 'bestaudio'
-            ydl_opts['format'] = f'{video_fmt}+{audio_fmt}/best'
-            ydl_opts['merge_output_format'] = self.video_format
-        elif self.download_type == '字幕':
-            ydl_opts.update({
-                'skip_download': True,
-                'writesubtitles': True,
-                'subtitleslangs': ['all'],
-            })
-
-        # Apply extra parameters
-        if self.extra_params:
-            try:
-                extra_args = parse_string_to_dict(self.extra_params)
-                if extra_args:
-                    from yt_dlp import YoutubeDL
-                    temp_ydl = YoutubeDL()
-                    parsed_opts = temp_ydl.parse_options(extra_args)[0]
-                    for key, value in parsed_opts.items():
-                        if value is not None and value != '':
-                            ydl_opts[key] = value
-                    self.log_signal.emit(self.get_translation('extra_params_applied', params=str(extra_args)))
-            except Exception as e:
-                self.log_signal.emit(self.get_translation('extra_params_error', error=str(e)))
-
+        chunk = []
+        sent = time.monotonic()
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-        except StopDownloadException:
-            self.log_signal.emit(self.get_translation('download_stopped'))
-        except Exception as e:
-            self.log_signal.emit(self.get_translation('download_error', error=str(e)))
+            if self.path is not None:
+                urls = iter_file_urls(self.path, should_stop=lambda: self._stop_flag)
+            else:
+                urls = iter_text_urls(io.StringIO(self.text))
+                self.text = None
+            for url in urls:
+                if self._stop_flag:
+                    break
+                canonical = self.index.add(url)
+                if canonical is None:
+                    self.duplicates += 1
+                    continue
+                chunk.append(canonical)
+                if len(chunk) >= IMPORT_CHUNK or time.monotonic() - sent >= IMPORT_INTERVAL:
+                    self.added += len(chunk)
+                    self.urls_signal.emit(chunk)
+                    chunk = []
+                    sent = time.monotonic()
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+        finally:
+            if chunk:
+                self.added += len(chunk)
+                self.urls_signal.emit(chunk)
 
 
 def get_clipboard_url():
     try:
+        import pyperclip
         text = pyperclip.paste().strip()
         if text.startswith(('http://', 'https://')):
             return text
@@ -152,14 +129,33 @@ class YTDLPApp(QWidget):
         super().__init__()
         self.stop_btn = None
         self.worker = None
-        self.translations = {}
+        self.active_progress = {}
+        self.stage_depths = None
+        self.progress_label = None
+        self.progress_refresh_timer = None
+        self.metadata_cache_ttl = 24 * 3600
+        self.preflight = True
+        self.adaptive_fragments = True
+        self.use_archive = True
+        self.proxy_check_url = DEFAULT_CHECK_URL
+        self.proxy_check_interval = DEFAULT_CHECK_INTERVAL
+        self.host_weights = {}
+        self.catalog = TranslationCatalog(cache_dir=data_file_path('lang_cache'))
         self.lang_files = {}
         self.current_lang = 'en'
+        self.settings = SettingsStore(config_file_path())
+        self.job_queue = open_job_queue()
         self.load_translations()
+        self.config = self.read_configuration()
+        if self.config['language'] in self.lang_files.values():
+            # Build the widgets in the saved language straight away instead of translating them afterwards.
+            self.current_lang = self.config['language']
+            self.catalog.set_language(self.current_lang)
 
         self.exit_btn = None
         self.file_format_label = None
         self.ffmpeg_input = None
+        self.staging_input = None
         self.download_btn = None
         self.log_output = None
         self.proxy_input = None
@@ -174,11 +170,38 @@ class YTDLPApp(QWidget):
         self.file_format_combo = None
         self.language_combo = None
         self.extra_params_input = None
+        self.concurrency_label = None
+        self.concurrency_spin = None
+        self.per_host_limit_label = None
+        self.per_host_limit_spin = None
+        self.rate_limit_label = None
+        self.rate_limit_spin = None
+        self.stats_btn = None
+        self.last_metrics = None
+        self.last_proxy_stats = None
+        self.input_tabs = None
+        self.queue_model = None
+        self.queue_view = None
+        self.import_btn = None
+        self.clear_queue_btn = None
+        self.import_status = None
+        self.importer = None
+        self.stopping = False
+        self.keep_partial_check = None
+        self.subtitle_languages_label = None
+        self.subtitle_languages_input = None
+        self.auto_subtitles_check = None
+        # URLs imported from files or large pastes, waiting for the next batch.
+        self.import_index = UrlIndex(key_for=site_archive_key, ready=yt_dlp_loaded)
         self.setWindowTitle(self.get_translation('window_title'))
         self.setGeometry(200, 200, 800, 700)
         self.init_ui()
         self.load_configuration()
         self.url_input.installEventFilter(self)
+        # Reading the clipboard can take a while (pyperclip may run xclip), so it waits for the event loop.
+        QTimer.singleShot(0, self.update_url_from_clipboard)
+        QTimer.singleShot(0, self.resume_unfinished_batches)
+        QTimer.singleShot(WARM_UP_DELAY_MS, warm_up)
 
         # Connect clipboard change signal
         QApplication.clipboard().dataChanged.connect(self.update_url_from_clipboard)
@@ -186,15 +209,21 @@ class YTDLPApp(QWidget):
     def update_url_from_clipboard(self):
         clipboard_text = get_clipboard_url()
         if clipboard_text:
-            current_text = self.url_input.toPlainText().strip()
-            if clipboard_text not in current_text:
-                if current_text:
-                    self.url_input.setPlainText(current_text + '\n' + clipboard_text)
-                else:
-                    self.url_input.setPlainText(clipboard_text)
+            self.url_input.add_urls(extract_urls(clipboard_text))
 
     def closeEvent(self, event):
+        if self.importer:
+            self.importer.stop()
+            self.importer.wait()
+        if self.worker:
+            # The batch stays unfinished in the job queue and is resumed on the next start.
+            self.worker.stop()
+            self.worker.wait()
+        if self.job_queue:
+            self.job_queue.close()
         self.save_configuration()
+        self.settings.flush()
+        self.log_output.flush()
         event.accept()
 
     def save_configuration(self):
@@ -202,25 +231,38 @@ class YTDLPApp(QWidget):
             'path': self.path_input.text(),
             'prefix': self.prefix_input.text(),
             'download_type': self.format_combo.currentText(),
+            'download_mode': DOWNLOAD_MODES[max(0, self.format_combo.currentIndex())],
             'video_format': self.file_format_combo.currentText() if self.file_format_combo.isEnabled() else '',
             'audio_format': self.audio_quality_combo.currentText() if self.audio_quality_combo.isEnabled() else '',
             'video_quality': self.video_quality_combo.currentText() if self.video_quality_combo.isEnabled() else '',
             'audio_quality': self.audio_quality_combo.currentText() if self.audio_quality_combo.isEnabled() else '',
             'proxy': self.proxy_input.text(),
             'ffmpeg_path': self.ffmpeg_input.text(),
+            'staging_dir': self.staging_input.text(),
             'language': self.current_lang,
-            'extra_params': self.extra_params_input.text()
+            'extra_params': self.extra_params_input.text(),
+            'max_workers': self.concurrency_spin.value(),
+            'per_host_limit': self.per_host_limit_spin.value(),
+            'rate_limit': self.rate_limit_spin.value(),
+            'keep_partial': self.keep_partial_check.isChecked(),
+            'subtitle_languages': self.subtitle_languages_input.text(),
+            'auto_subtitles': self.auto_subtitles_check.isChecked(),
+            'log_max_lines': self.log_output.max_lines,
+            'metadata_cache_ttl': self.metadata_cache_ttl,
+            'preflight': self.preflight,
+            'adaptive_fragments': self.adaptive_fragments,
+            'use_archive': self.use_archive,
+            'proxy_check_url': self.proxy_check_url,
+            'proxy_check_interval': self.proxy_check_interval,
+            'host_weights': self.host_weights
         }
-        try:
-            with open('config.json', 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=4)
-        except IOError as e:
-            print(f"Error saving configuration: {e}")
+        self.settings.save(config)
 
-    def load_configuration(self):
+    def read_configuration(self):
+        """Return the saved settings, with defaults for anything missing."""
         default_config = {
             'path': os.path.expanduser("~/Downloads"),
-            'prefix': self.get_translation('prefix_none'),
+            'prefix': '',
             'download_type': self.get_translation('download_types')[0],
             'video_format': 'mp4',
             'audio_format': 'mp3',
@@ -228,130 +270,70 @@ class YTDLPApp(QWidget):
             'audio_quality': 'Auto',
             'proxy': 'http://127.0.0.1:7890',
             'ffmpeg_path': '',
+            'staging_dir': '',
             'language': 'en',
-            'extra_params': ''
+            'extra_params': '',
+            'max_workers': 3,
+            'per_host_limit': 0,
+            'rate_limit': 0,
+            'keep_partial': True,
+            'subtitle_languages': DEFAULT_LANGUAGES,
+            'auto_subtitles': True,
+            'log_max_lines': 5000,
+            'metadata_cache_ttl': 24 * 3600,
+            'preflight': True,
+            'adaptive_fragments': True,
+            'use_archive': True,
+            'proxy_check_url': DEFAULT_CHECK_URL,
+            'proxy_check_interval': DEFAULT_CHECK_INTERVAL,
+            'host_weights': {}
         }
-        if os.path.exists('config.json'):
-            try:
-                with open('config.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    default_config.update(config)
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"Error loading configuration: {e}. Using defaults.")
-
-        self.path_input.setText(default_config['path'])
-        self.prefix_input.setText(default_config['prefix'])
-        self.format_combo.setCurrentText(default_config['download_type'])
-        self.file_format_combo.setCurrentText(default_config['video_format'])
-        self.audio_quality_combo.setCurrentText(default_config['audio_format'])
-        self.video_quality_combo.setCurrentText(default_config['video_quality'])
-        self.audio_quality_combo.setCurrentText(default_config['audio_quality'])
-        self.proxy_input.setText(default_config['proxy'])
-        self.ffmpeg_input.setText(default_config['ffmpeg_path'])
-        self.extra_params_input.setText(default_config['extra_params'])
-        lang_code = default_config['language']
-        for lang_name, code in self.lang_files.items():
-            if code == lang_code:
-                self.language_combo.setCurrentText(lang_name)
-                self.current_lang = lang_code
-                self.update_ui_text()
-                break
+        default_config.update(self.settings.load(legacy_paths=legacy_config_paths()))
+        return default_config
+
+    def load_configuration(self):
+        config = self.config
+        # Settings without a widget go first: every widget change below saves the configuration.
+        self.log_output.set_max_lines(config['log_max_lines'])
+        self.metadata_cache_ttl = int(config['metadata_cache_ttl'])
+        self.preflight = bool(config['preflight'])
+        self.adaptive_fragments = bool(config['adaptive_fragments'])
+        self.use_archive = bool(config['use_archive'])
+        self.proxy_check_url = config['proxy_check_url']
+        self.proxy_check_interval = int(config['proxy_check_interval'])
+        self.host_weights = config_weights(config['host_weights'])
+        self.path_input.setText(config['path'])
+        self.prefix_input.setText(config['prefix'])
+        self.format_combo.setCurrentText(config['download_type'])
+        if config.get('download_mode') in DOWNLOAD_MODES:
+            self.format_combo.setCurrentIndex(DOWNLOAD_MODES.index(config['download_mode']))
+        self.file_format_combo.setCurrentText(config['video_format'])
+        self.audio_quality_combo.setCurrentText(config['audio_format'])
+        self.video_quality_combo.setCurrentText(config['video_quality'])
+        self.audio_quality_combo.setCurrentText(config['audio_quality'])
+        self.proxy_input.setText(config['proxy'])
+        self.ffmpeg_input.setText(config['ffmpeg_path'])
+        self.staging_input.setText(config['staging_dir'])
+        self.extra_params_input.setText(config['extra_params'])
+        self.concurrency_spin.setValue(int(config['max_workers']))
+        self.per_host_limit_spin.setValue(int(config['per_host_limit']))
+        self.rate_limit_spin.setValue(int(config['rate_limit']))
+        self.keep_partial_check.setChecked(bool(config['keep_partial']))
+        self.subtitle_languages_input.setText(config['subtitle_languages'])
+        self.auto_subtitles_check.setChecked(bool(config['auto_subtitles']))
 
     def load_translations(self):
-        translation_dir = 'lang'
-        default_translations = {
-            'en': {
-                'language_name': 'English',
-                "language_simple": "en",
-                'window_title': 'YT-DLP Visual Batch Downloader',
-                'url_label': 'Video URL (supports multiple lines, auto-reads clipboard):',
-                'path_label': 'Save Path:',
-                'browse_button': 'Browse',
-                'prefix_label': 'File Prefix (optional):',
-                'prefix_none': 'None',
-                'prefix_date': 'Date: {date}',
-                'prefix_datetime': 'DateTime: {datetime}',
-                'download_type_label': 'Download Type:',
-                'file_format_label': 'File Format:',
-                'video_quality_label': 'Video Quality (select or custom):',
-                'audio_quality_label': 'Audio Quality (select or custom):',
-                'proxy_label': 'Proxy Settings (optional, e.g., http://127.0.0.1:7890):',
-                'ffmpeg_label': 'FFmpeg Path (optional):',
-                'ffmpeg_placeholder': 'Optional, e.g., /usr/bin/ffmpeg or ffmpeg.exe',
-                'extra_params_label': 'Extra yt-dlp Parameters (optional, space-separated):',
-                'extra_params_placeholder': 'e.g., --no-playlist --embed-subs',
-                'download_button': 'Start Download',
-                'stop_button': 'Stop Download',
-                'exit_button': 'Exit',
-                'log_group_title': 'Download Log',
-                'error_no_url_path': '❗ Please provide URL and save path.',
-                'download_start': '🚀 Starting download of {count} videos...',
-                'download_stopped': '🛑 Download stopped',
-                'download_start_single': '[{index}] Starting download: {url}',
-                'download_progress': '⬇ Downloading: {percent} Speed: {speed} ETA: {eta}',
-                'download_completed': '✅ Download completed: {filename}',
-                'extra_params_applied': 'Applied extra parameters: {params}',
-                'extra_params_error': '❌ Error parsing extra parameters: {error}',
-                'download_error': '❌ Download error: {error}',
-                'download_types': ['Video + Audio', 'Video Only', 'Audio Only', 'Subtitles Only'],
-                'video_formats': ['mp4', 'webm', 'mkv', 'flv'],
-                'audio_formats': ['mp3', 'wav', 'aac', 'flac', 'opus'],
-                'combined_formats': ['mp4', 'mkv', 'webm'],
-                'no_format': 'None',
-                'video_qualities': ['Auto', '8K', '4K', '1080p', '720p', '480p', '360p', '240p'],
-                'audio_qualities': ['Auto', '320 kbps', '256 kbps', '192 kbps', '128 kbps', '96 kbps'],
-                'video_quality_placeholder': 'Custom format',
-                'audio_quality_placeholder': 'Custom quality',
-                'language_label': 'Language:'
-            }
-        }
-        self.translations = default_translations
-        self.lang_files = {'English': 'en'}
-        if os.path.exists(translation_dir):
-            json_files = glob.glob(os.path.join(translation_dir, '*.json'))
-            for file_path in json_files:
-                lang_code = os.path.splitext(os.path.basename(file_path))[0]
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        translation_data = json.load(f)
-                        lang_code=translation_data['language_simple']
-                        lang_name = translation_data.get('language_name', lang_code.capitalize())
-                        # Ensure download_types is a list
-                        if 'download_types' not in translation_data or not isinstance(translation_data['download_types'], list):
-                            translation_data['download_types'] = default_translations['en']['download_types']
-                        self.translations[lang_code] = translation_data
-                        self.lang_files[lang_name] = lang_code
-                except (json.JSONDecodeError, IOError) as e:
-                    print(f"Error loading translation file {file_path}: {e}")
-        else:
-            print(f"Translation directory '{translation_dir}' not found. Using default translations.")
+        self.lang_files = self.catalog.languages()
 
     def get_translation(self, key, **kwargs):
-        translation = self.translations.get(self.current_lang, {}).get(key, '')
-        if key == 'download_types' and not isinstance(translation, list):
-            # Fallback to default if download_types is not a list
-            translation = self.translations['en']['download_types']
-        if isinstance(translation, str):
-            try:
-                return translation.format(**kwargs)
-            except KeyError:
-                return kwargs['error']
-        elif isinstance(translation, list):
-            return translation
-        return translation
+        return self.catalog.get(key, **kwargs)
 
     def eventFilter(self, watched, event):
         from PyQt6.QtCore import QEvent
         if watched == self.url_input and event.type() == QEvent.Type.MouseButtonPress:
             clipboard_text = get_clipboard_url()
-            if clipboard_text:
-                current_text = self.url_input.toPlainText().strip()
-                if clipboard_text not in current_text:
-                    if current_text:
-                        self.url_input.setPlainText(current_text + '\n' + clipboard_text)
-                    else:
-                        self.url_input.setPlainText(clipboard_text)
-                    return True
+            if clipboard_text and self.url_input.add_urls(extract_urls(clipboard_text)):
+                return True
         return super().eventFilter(watched, event)
 
     def init_ui(self):
@@ -362,6 +344,9 @@ class YTDLPApp(QWidget):
         lang_label = QLabel(self.get_translation('language_label'))
         self.language_combo = QComboBox()
         self.language_combo.addItems(list(self.lang_files.keys()))
+        for lang_name, code in self.lang_files.items():
+            if code == self.current_lang:
+                self.language_combo.setCurrentText(lang_name)
         self.language_combo.currentIndexChanged.connect(self.change_language)
         lang_layout.addWidget(lang_label)
         lang_layout.addWidget(self.language_combo)
@@ -372,9 +357,26 @@ class YTDLPApp(QWidget):
         input_group = QGroupBox("")
         input_layout = QVBoxLayout()
         input_layout.addWidget(QLabel(self.get_translation('url_label')))
-        self.url_input = QTextEdit()
-        self.url_input.setPlainText(get_clipboard_url())
-        input_layout.addWidget(self.url_input)
+        self.url_input = UrlInput()
+        self.url_input.bulk_paste.connect(self.import_text)
+        self.queue_model = QueueModel(self.get_translation, self)
+        self.queue_view = QueueView(self.queue_model)
+        self.queue_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.queue_view.customContextMenuRequested.connect(self.show_queue_menu)
+        self.input_tabs = QTabWidget()
+        self.input_tabs.addTab(self.url_input, self.get_translation('url_tab'))
+        self.input_tabs.addTab(self.queue_view, self.get_translation('queue_tab'))
+        input_layout.addWidget(self.input_tabs)
+        import_layout = QHBoxLayout()
+        self.import_btn = QPushButton(self.get_translation('import_button'))
+        self.import_btn.clicked.connect(self.import_file)
+        import_layout.addWidget(self.import_btn)
+        self.clear_queue_btn = QPushButton(self.get_translation('clear_queue_button'))
+        self.clear_queue_btn.clicked.connect(self.clear_queue)
+        import_layout.addWidget(self.clear_queue_btn)
+        self.import_status = QLabel('')
+        import_layout.addWidget(self.import_status, 1)
+        input_layout.addLayout(import_layout)
         input_group.setLayout(input_layout)
         main_layout.addWidget(input_group)
 
@@ -434,6 +436,16 @@ class YTDLPApp(QWidget):
         audio_quality_layout.addWidget(self.audio_quality_combo)
         audio_quality_layout.addWidget(self.audio_quality_input)
         download_options_layout.addLayout(audio_quality_layout, 3, 1)
+        self.subtitle_languages_label = QLabel(self.get_translation('subtitle_languages_label'))
+        download_options_layout.addWidget(self.subtitle_languages_label, 4, 0)
+        self.subtitle_languages_input = QLineEdit()
+        self.subtitle_languages_input.setPlaceholderText(self.get_translation('subtitle_languages_placeholder'))
+        self.subtitle_languages_input.setEnabled(False)
+        download_options_layout.addWidget(self.subtitle_languages_input, 5, 0)
+        self.auto_subtitles_check = QCheckBox(self.get_translation('auto_subtitles_label'))
+        self.auto_subtitles_check.setChecked(True)
+        self.auto_subtitles_check.setEnabled(False)
+        download_options_layout.addWidget(self.auto_subtitles_check, 5, 1)
         download_options_group.setLayout(download_options_layout)
         main_layout.addWidget(download_options_group)
 
@@ -452,6 +464,35 @@ class YTDLPApp(QWidget):
         self.extra_params_input = QLineEdit()
         self.extra_params_input.setPlaceholderText(self.get_translation('extra_params_placeholder'))
         advanced_layout.addWidget(self.extra_params_input)
+        advanced_layout.addWidget(QLabel(self.get_translation('staging_label')))
+        self.staging_input = QLineEdit()
+        self.staging_input.setPlaceholderText(self.get_translation('staging_placeholder'))
+        advanced_layout.addWidget(self.staging_input)
+        concurrency_layout = QHBoxLayout()
+        self.concurrency_label = QLabel(self.get_translation('concurrency_label'))
+        concurrency_layout.addWidget(self.concurrency_label)
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, 16)
+        self.concurrency_spin.setValue(3)
+        concurrency_layout.addWidget(self.concurrency_spin)
+        concurrency_layout.addSpacing(20)
+        self.per_host_limit_label = QLabel(self.get_translation('per_host_limit_label'))
+        concurrency_layout.addWidget(self.per_host_limit_label)
+        self.per_host_limit_spin = QSpinBox()
+        self.per_host_limit_spin.setRange(0, 16)
+        concurrency_layout.addWidget(self.per_host_limit_spin)
+        concurrency_layout.addSpacing(20)
+        self.rate_limit_label = QLabel(self.get_translation('rate_limit_label'))
+        concurrency_layout.addWidget(self.rate_limit_label)
+        self.rate_limit_spin = QSpinBox()
+        self.rate_limit_spin.setRange(0, 1024 * 1024)
+        self.rate_limit_spin.setSingleStep(100)
+        concurrency_layout.addWidget(self.rate_limit_spin)
+        concurrency_layout.addStretch()
+        advanced_layout.addLayout(concurrency_layout)
+        self.keep_partial_check = QCheckBox(self.get_translation('keep_partial_label'))
+        self.keep_partial_check.setChecked(True)
+        advanced_layout.addWidget(self.keep_partial_check)
         advanced_group.setLayout(advanced_layout)
         main_layout.addWidget(advanced_group)
 
@@ -467,6 +508,11 @@ class YTDLPApp(QWidget):
         self.stop_btn.setEnabled(False)
         control_layout.addWidget(self.stop_btn)
         control_layout.addSpacing(20)
+        self.stats_btn = QPushButton(self.get_translation('stats_button'))
+        self.stats_btn.clicked.connect(self.show_stats)
+        self.stats_btn.setEnabled(False)
+        control_layout.addWidget(self.stats_btn)
+        control_layout.addSpacing(20)
         self.exit_btn = QPushButton(self.get_translation('exit_button'))
         self.exit_btn.clicked.connect(self.close)
         control_layout.addWidget(self.exit_btn)
@@ -475,9 +521,15 @@ class YTDLPApp(QWidget):
         # Log output area
         log_group = QGroupBox(self.get_translation('log_group_title'))
         log_layout = QVBoxLayout()
-        self.log_output = QTextEdit()
-        self.log_output.setReadOnly(True)
+        self.progress_label = QLabel('')
+        self.progress_label.setVisible(False)
+        log_layout.addWidget(self.progress_label)
+        self.log_output = LogView(log_file=log_file_path())
         log_layout.addWidget(self.log_output)
+        self.progress_refresh_timer = QTimer(self)
+        self.progress_refresh_timer.setSingleShot(True)
+        self.progress_refresh_timer.setInterval(100)
+        self.progress_refresh_timer.timeout.connect(self.refresh_progress_label)
         log_group.setLayout(log_layout)
         main_layout.addWidget(log_group)
 
@@ -493,12 +545,22 @@ class YTDLPApp(QWidget):
         self.audio_quality_input.textChanged.connect(self.save_configuration)
         self.proxy_input.textChanged.connect(self.save_configuration)
         self.ffmpeg_input.textChanged.connect(self.save_configuration)
+        self.staging_input.textChanged.connect(self.save_configuration)
         self.path_input.textChanged.connect(self.save_configuration)
         self.language_combo.currentIndexChanged.connect(self.save_configuration)
         self.extra_params_input.textChanged.connect(self.save_configuration)
+        self.concurrency_spin.valueChanged.connect(self.save_configuration)
+        self.per_host_limit_spin.valueChanged.connect(self.save_configuration)
+        self.rate_limit_spin.valueChanged.connect(self.save_configuration)
+        self.rate_limit_spin.valueChanged.connect(self.change_rate_limit)
+        self.keep_partial_check.toggled.connect(self.save_configuration)
+        self.keep_partial_check.toggled.connect(self.change_keep_partial)
+        self.subtitle_languages_input.textChanged.connect(self.save_configuration)
+        self.auto_subtitles_check.toggled.connect(self.save_configuration)
 
     def change_language(self):
         self.current_lang = self.lang_files[self.language_combo.currentText()]
+        self.catalog.set_language(self.current_lang)
         self.update_ui_text()
 
     def update_ui_text(self):
@@ -515,6 +577,12 @@ class YTDLPApp(QWidget):
         self.prefix_input.setPlaceholderText(self.get_translation('prefix_text'))
         self.download_btn.setText(self.get_translation('download_button'))
         self.stop_btn.setText(self.get_translation('stop_button'))
+        self.stats_btn.setText(self.get_translation('stats_button'))
+        self.import_btn.setText(self.get_translation('import_button'))
+        self.clear_queue_btn.setText(self.get_translation('clear_queue_button'))
+        self.input_tabs.setTabText(0, self.get_translation('url_tab'))
+        self.input_tabs.setTabText(1, self.get_translation('queue_tab'))
+        self.queue_model.retranslate()
         self.exit_btn.setText(self.get_translation('exit_button'))
         self.update_file_format_options(self.format_combo.currentIndex())
 
@@ -532,8 +600,23 @@ class YTDLPApp(QWidget):
         main_layout.itemAt(4).widget().layout().itemAt(0).widget().setText(self.get_translation('proxy_label'))
         main_layout.itemAt(4).widget().layout().itemAt(2).widget().setText(self.get_translation('ffmpeg_label'))
         main_layout.itemAt(4).widget().layout().itemAt(4).widget().setText(self.get_translation('extra_params_label'))
+        main_layout.itemAt(4).widget().layout().itemAt(6).widget().setText(self.get_translation('staging_label'))
+        self.staging_input.setPlaceholderText(self.get_translation('staging_placeholder'))
+        self.concurrency_label.setText(self.get_translation('concurrency_label'))
+        self.per_host_limit_label.setText(self.get_translation('per_host_limit_label'))
+        self.rate_limit_label.setText(self.get_translation('rate_limit_label'))
+        self.keep_partial_check.setText(self.get_translation('keep_partial_label'))
+        self.subtitle_languages_label.setText(self.get_translation('subtitle_languages_label'))
+        self.subtitle_languages_input.setPlaceholderText(self.get_translation('subtitle_languages_placeholder'))
+        self.auto_subtitles_check.setText(self.get_translation('auto_subtitles_label'))
         main_layout.itemAt(6).widget().setTitle(self.get_translation('log_group_title'))
 
+    def show_stats(self):
+        if self.last_metrics is None:
+            return
+        from stats_dialog import StatsDialog
+        StatsDialog(self.last_metrics, self.get_translation, self, proxy_stats=self.last_proxy_stats).exec()
+
     def browse_folder(self):
         folder = QFileDialog.getExistingDirectory(self, self.get_translation('browse_button'))
         if folder:
@@ -554,57 +637,260 @@ class YTDLPApp(QWidget):
             self.file_format_combo.addItems(self.get_translation('combined_formats'))
             self.file_format_combo.setCurrentText("mp4")
         elif selected_format == download_types[3]:
-            self.file_format_combo.setEnabled(False)
-            self.file_format_combo.addItem(self.get_translation('no_format'))
-            self.file_format_combo.setCurrentText(self.get_translation('no_format'))
+            # The first entry keeps the subtitles in the format the site serves them in.
+            self.file_format_combo.addItems(self.get_translation('subtitle_formats'))
+            self.file_format_combo.setCurrentIndex(0)
+        subtitles = selected_format == download_types[3]
+        self.subtitle_languages_input.setEnabled(subtitles)
+        self.auto_subtitles_check.setEnabled(subtitles)
+
+    def on_progress(self, event):
+        """Record a progress event; the label is redrawn at most once per refresh interval."""
+        if event.status == 'downloading':
+            self.active_progress[event.job_id] = event
+            self.queue_model.set_progress(event.job_id, event.percent)
+        else:
+            self.active_progress.pop(event.job_id, None)
+            if event.status == 'finished':
+                self.log_output.append(
+                    f'[{event.job_id}] ' + self.get_translation('download_completed', filename=event.filename))
+        if not self.progress_refresh_timer.isActive():
+            self.progress_refresh_timer.start()
+
+    def on_job_update(self, update):
+        self.queue_model.update_job(*update)
+
+    def on_stages(self, depths):
+        """Record the download and post-processing queue depths; shown only while conversions are pending."""
+        running, waiting = depths['postprocess']
+        self.stage_depths = depths if running or waiting else None
+        if not self.progress_refresh_timer.isActive():
+            self.progress_refresh_timer.start()
+
+    def change_keep_partial(self, checked):
+        if self.worker:
+            self.worker.engine.keep_partial = checked
 
-    def stop_download(self):
+    def show_queue_menu(self, position):
+        """Cancel, pause or resume the selected jobs of the running batch, or change their bandwidth priority."""
+        if not self.worker or self.stopping:
+            return
+        job_ids = [job_id for job_id in (self.queue_model.job_id(index.row())
+                                         for index in self.queue_view.selectionModel().selectedRows())
+                   if job_id is not None]
+        if not job_ids:
+            return
+        engine = self.worker.engine
+        menu = QMenu(self)
+        for key, action in (('cancel_job_action', engine.cancel_job), ('pause_job_action', engine.pause_job),
+                            ('resume_job_action', engine.resume_job)):
+            menu.addAction(self.get_translation(key)).triggered.connect(
+                lambda checked=False, action=action: [action(job_id) for job_id in job_ids])
+        priority_menu = menu.addMenu(self.get_translation('priority_menu'))
+        weights = {engine.job_weight(job_id) for job_id in job_ids}
+        for key, weight in JOB_PRIORITIES:
+            action = priority_menu.addAction(self.get_translation(key))
+            action.setCheckable(True)
+            action.setChecked(weights == {weight})
+            action.triggered.connect(lambda checked=False, key=key, weight=weight: self.set_job_priority(
+                job_ids, key, weight))
+        menu.exec(self.queue_view.viewport().mapToGlobal(position))
+
+    def set_job_priority(self, job_ids, key, weight):
+        if not self.worker:
+            return
+        for job_id in job_ids:
+            self.worker.engine.set_job_weight(job_id, weight)
+            self.log_output.append(f'[{job_id}] ' + self.get_translation(
+                'job_priority', priority=self.get_translation(key)))
+
+    def change_rate_limit(self, value):
+        """Apply a new speed limit to the running batch right away."""
         if self.worker:
-            self.worker.stop()
-            self.worker.wait()
+            self.worker.engine.set_rate_limit(value * 1024)
+
+    def refresh_progress_label(self):
+        lines = [self.get_translation('stopping')] if self.stopping else []
+        if self.worker and self.active_progress:
+            stats = self.worker.engine.governor.stats()
+            if stats['target']:
+                lines.append(self.get_translation('bandwidth_status', achieved=format_bytes(stats['achieved']) + '/s',
+                                                  target=format_bytes(stats['target']) + '/s'))
+        if self.stage_depths:
+            (downloading, download_waiting), (converting, convert_waiting) = (self.stage_depths['download'],
+                                                                              self.stage_depths['postprocess'])
+            lines.append(self.get_translation('stage_depths', downloading=downloading,
+                                              download_waiting=download_waiting, converting=converting,
+                                              convert_waiting=convert_waiting))
+        for job_id, event in sorted(self.active_progress.items()):
+            percent = f'{event.percent:.1f}%' if event.percent is not None else format_bytes(event.downloaded_bytes)
+            lines.append(f'[{job_id}] ' + self.get_translation(
+                'download_progress', percent=percent, speed=format_bytes(event.speed) + '/s',
+                eta=format_eta(event.eta)))
+        self.progress_label.setText('\n'.join(lines))
+        self.progress_label.setVisible(bool(lines))
+
+    def download_finished(self):
+        stopped, self.stopping = self.stopping, False
+        self.active_progress.clear()
+        self.stage_depths = None
+        self.refresh_progress_label()
+        self.download_btn.setEnabled(self.importer is None)
+        self.stop_btn.setEnabled(False)
+        if self.worker and not self.worker.isRunning():
+            if stopped and self.job_queue and self.worker.batch_id is not None:
+                self.job_queue.finish_batch(self.worker.batch_id, 'stopped')
             self.worker = None
-            self.download_btn.setEnabled(True)
+            if not stopped:
+                # Continue with any other batch an earlier session left unfinished.
+                QTimer.singleShot(0, self.resume_unfinished_batches)
+
+    def stop_download(self):
+        """Ask the batch to stop without waiting for it; download_finished() tidies up once it has."""
+        if self.worker and not self.stopping:
+            self.stopping = True
+            self.worker.stop()
             self.stop_btn.setEnabled(False)
-            # self.log_output.append(self.get_translation('download_stopped'))
+            self.refresh_progress_label()
 
     def start_download(self):
         self.log_output.clear()
-        urls = self.url_input.toPlainText().strip().splitlines()
+        # The URLs of the text box come first, then the imported ones; each URL is downloaded once.
+        urls = [url for url in self.url_input.urls() if url not in self.import_index] + self.import_index.urls()
         path = self.path_input.text().strip()
-        download_types = self.get_translation('download_types')
-        download_type = self.format_combo.currentText()
+        download_mode = DOWNLOAD_MODES[max(0, self.format_combo.currentIndex())]
         video_format = ""
         audio_format = ""
+        subtitle_format = ""
 
-        if download_type == download_types[1] or download_type == download_types[0]:
+        if download_mode in ('video', 'video_audio'):
             video_format = self.file_format_combo.currentText()
-        elif download_type == download_types[2]:
+        elif download_mode == 'audio':
             audio_format = self.file_format_combo.currentText()
+        elif download_mode == 'subtitles' and self.file_format_combo.currentIndex() > 0:
+            subtitle_format = self.file_format_combo.currentText()
 
         prefix_text = self.prefix_input.text()
         proxy = self.proxy_input.text().strip()
         ffmpeg_path = self.ffmpeg_input.text().strip()
-        video_quality = self.video_quality_input.text().strip() or self.video_quality_combo.currentText().strip()
-        audio_quality = self.audio_quality_input.text().strip() or self.audio_quality_combo.currentText().strip()
+        staging_dir = self.staging_input.text().strip()
+        # The first entry of the quality lists is 'Auto': leave the choice to yt-dlp.
+        video_quality = self.video_quality_input.text().strip() or (
+            self.video_quality_combo.currentText().strip() if self.video_quality_combo.currentIndex() > 0 else '')
+        audio_quality = self.audio_quality_input.text().strip() or (
+            self.audio_quality_combo.currentText().strip() if self.audio_quality_combo.currentIndex() > 0 else '')
         extra_params = self.extra_params_input.text().strip()
 
         if not urls or not path:
             self.log_output.append(self.get_translation('error_no_url_path'))
             return
 
-        self.download_btn.setEnabled(False)
-        self.stop_btn.setEnabled(True)
         self.log_output.append(self.get_translation('download_start', count=len(urls)))
+        settings = {
+            'urls': urls, 'path': path, 'download_mode': download_mode, 'video_format': video_format,
+            'audio_format': audio_format, 'prefix': prefix_text, 'proxy': proxy, 'ffmpeg_path': ffmpeg_path,
+            'video_quality': video_quality, 'audio_quality': audio_quality, 'extra_params': extra_params,
+            'max_workers': self.concurrency_spin.value(), 'per_host_limit': self.per_host_limit_spin.value(),
+            'metadata_cache_ttl': self.metadata_cache_ttl, 'preflight': self.preflight,
+            'adaptive_fragments': self.adaptive_fragments, 'use_archive': self.use_archive,
+            'proxy_check_url': self.proxy_check_url, 'proxy_check_interval': self.proxy_check_interval,
+            'host_weights': self.host_weights,
+            'rate_limit': self.rate_limit_spin.value() * 1024, 'keep_partial': self.keep_partial_check.isChecked(),
+            'subtitle_languages': self.subtitle_languages_input.text().strip() or DEFAULT_LANGUAGES,
+            'subtitle_format': subtitle_format, 'auto_subtitles': self.auto_subtitles_check.isChecked(),
+            'staging_dir': staging_dir
+        }
+        batch_id = self.job_queue.create_batch(settings) if self.job_queue else None
+        # The imported URLs now belong to the batch, which the queue view shows from here on.
+        self.import_index.clear()
+        self.import_status.setText('')
+        self.start_worker(settings, batch_id)
 
-        self.worker = DownloadThread(
-            urls, path, download_type, video_format, audio_format, prefix_text, proxy, ffmpeg_path,
-            video_quality, audio_quality, extra_params, self.get_translation
-        )
+    def start_worker(self, settings, batch_id):
+        self.download_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.worker = DownloadThread(get_translation=self.get_translation, job_queue=self.job_queue,
+                                     batch_id=batch_id, **settings)
         self.worker.log_signal.connect(self.log_output.append)
-        self.worker.finished.connect(lambda: self.download_btn.setEnabled(True))
-        self.worker.finished.connect(lambda: self.stop_btn.setEnabled(False))
+        self.worker.progress_signal.connect(self.on_progress)
+        self.worker.stage_signal.connect(self.on_stages)
+        self.worker.job_signal.connect(self.on_job_update)
+        self.worker.jobs_signal.connect(self.queue_model.set_jobs)
+        self.queue_model.set_urls(settings['urls'])
+        self.last_metrics = self.worker.engine.metrics
+        self.last_proxy_stats = self.worker.engine.proxy_stats
+        self.stats_btn.setEnabled(True)
+        self.worker.finished.connect(self.download_finished)
         self.worker.start()
 
+    def import_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, self.get_translation('import_button'), '',
+                                              self.get_translation('import_file_filter', patterns=IMPORT_FILE_FILTER))
+        if path:
+            self.start_import(path=path)
+
+    def import_text(self, text):
+        self.start_import(text=text)
+
+    def start_import(self, path=None, text=None):
+        """Add the URLs of a file or text to the queue in the background; Start waits until they are all in."""
+        if self.importer:
+            return
+        if not self.worker and not self.import_index:
+            # Rows of a finished batch make way for the new imports.
+            self.queue_model.clear()
+        self.importer = ImportThread(self.import_index, path=path, text=text)
+        self.importer.urls_signal.connect(self.on_imported)
+        self.importer.finished.connect(self.import_finished)
+        self.download_btn.setEnabled(False)
+        self.import_btn.setEnabled(False)
+        self.clear_queue_btn.setEnabled(False)
+        self.input_tabs.setCurrentWidget(self.queue_view)
+        self.importer.start()
+
+    def on_imported(self, urls):
+        if not self.worker:
+            self.queue_model.append_urls(urls)
+        self.import_status.setText(self.get_translation(
+            'import_progress', count=len(self.import_index), duplicates=self.importer.duplicates))
+
+    def import_finished(self):
+        importer, self.importer = self.importer, None
+        if importer.error is not None:
+            self.log_output.append(self.get_translation('import_error', error=importer.error))
+        self.import_status.setText(self.get_translation(
+            'import_finished', count=importer.added, duplicates=importer.duplicates, total=len(self.import_index)))
+        self.import_btn.setEnabled(True)
+        self.clear_queue_btn.setEnabled(True)
+        self.download_btn.setEnabled(self.worker is None)
+
+    def clear_queue(self):
+        """Drop the imported URLs that are waiting for the next batch."""
+        if self.importer:
+            return
+        self.import_index.clear()
+        self.import_status.setText('')
+        if not self.worker:
+            self.queue_model.clear()
+
+    def resume_unfinished_batches(self):
+        """Pick up the oldest batch that was interrupted by a crash or by closing the app."""
+        if self.worker or not self.job_queue:
+            return
+        for batch_id in self.job_queue.unfinished_batches():
+            settings = self.job_queue.batch_settings(batch_id)
+            # The speed limit and partial file handling are settings of the app rather than of the batch.
+            settings['rate_limit'] = self.rate_limit_spin.value() * 1024
+            settings['keep_partial'] = self.keep_partial_check.isChecked()
+            try:
+                self.log_output.append(self.get_translation('resume_batch', count=len(settings['urls'])))
+                self.start_worker(settings, batch_id)
+                return
+            except (TypeError, KeyError) as e:
+                # Settings written by an incompatible version; give up on this batch.
+                print(f"Error resuming batch {batch_id}: {e}")
+                self.job_queue.finish_batch(batch_id, 'failed')
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)